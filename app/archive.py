@@ -0,0 +1,137 @@
+"""Перенос заданий прошлых периодов (и их вложений) в архивные таблицы.
+
+Запуск: python -m app.archive [дней] [DATABASE_URL]
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine, delete, func, insert, literal, select, union_all
+from sqlalchemy.orm import Session
+
+from app import group_stats
+from app.cache import invalidate
+from app.database import SQLALCHEMY_DATABASE_URL, tenant_of
+from app.models.archive import AttachmentArchiveModel, HomeworkArchiveModel
+from app.models.attachment import AttachmentModel
+from app.models.file import FileModel
+from app.models.homework import HomeworkModel
+from app.singleflight import reads
+
+# Задания со сроком сдачи старше ARCHIVE_AFTER_DAYS дней переносятся в архив
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "180"))
+# Заданий в одной транзакции; между транзакциями - пауза, чтобы не задерживать запросы
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "1000"))
+ARCHIVE_PAUSE_MS = float(os.getenv("ARCHIVE_PAUSE_MS", "10"))
+
+HOMEWORK_COLUMNS = ["id", "group_id", "assigned_by", "title", "description", "deadline", "created_at", "version"]
+ATTACHMENT_COLUMNS = ["id", "homework_id", "file_ref_id", "file_type", "file_name", "caption", "uploaded_at", "version"]
+
+
+def _batch_ids(session: Session, cutoff: datetime, batch_size: int) -> List[int]:
+    # Таблицы заданий и вложений объявлены с AUTOINCREMENT, поэтому id архивных строк
+    # не выдаются новым строкам, даже если перенесены строки с наибольшим id
+    return list(session.scalars(
+        select(HomeworkModel.id)
+        .where(HomeworkModel.deadline < cutoff)
+        .order_by(HomeworkModel.id)
+        .limit(batch_size)
+    ))
+
+
+def _copy(session: Session, source, target, columns: List[str], condition, now: datetime) -> int:
+    return session.execute(
+        insert(target).from_select(
+            columns + ["archived_at"],
+            select(*(source.c[name] for name in columns), literal(now)).where(condition),
+        )
+    ).rowcount
+
+
+def archive_batch(session: Session, cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE) -> Dict[str, int]:
+    """Переносит до batch_size заданий со сроком раньше cutoff в одной транзакции и фиксирует ее."""
+    ids = _batch_ids(session, cutoff, batch_size)
+    if not ids:
+        return {"homeworks": 0, "attachments": 0}
+    now = datetime.utcnow()
+    homeworks, attachments = HomeworkModel.__table__, AttachmentModel.__table__
+    groups = dict(session.execute(
+        select(homeworks.c.group_id, func.count())
+        .where(homeworks.c.id.in_(ids))
+        .group_by(homeworks.c.group_id)
+    ).all())
+
+    # Сначала архивные задания: на них ссылаются архивные вложения
+    moved = _copy(session, homeworks, HomeworkArchiveModel.__table__, HOMEWORK_COLUMNS, homeworks.c.id.in_(ids), now)
+    moved_attachments = _copy(
+        session, attachments, AttachmentArchiveModel.__table__, ATTACHMENT_COLUMNS,
+        attachments.c.homework_id.in_(ids), now,
+    )
+    session.execute(delete(attachments).where(attachments.c.homework_id.in_(ids)))
+    session.execute(delete(homeworks).where(homeworks.c.id.in_(ids)))
+    for group_id, count in groups.items():
+        group_stats.homeworks_archived(session, group_id, count)
+    session.commit()
+
+    reads.forget(("homeworks.group", tenant_of(session)))
+    reads.forget(("attachments.homework", tenant_of(session)))
+    invalidate(session, *(f"group:{group_id}" for group_id in groups))
+    return {"homeworks": moved, "attachments": moved_attachments}
+
+
+def archive(bind, older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE,
+            tenant: Optional[str] = None, pause_ms: float = ARCHIVE_PAUSE_MS) -> Dict[str, int]:
+    """Переносит в архив все задания со сроком старше older_than_days дней пачками."""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    info = {"tenant": tenant} if tenant is not None else {}
+    report = {"homeworks": 0, "attachments": 0, "batches": 0}
+    while True:
+        with Session(bind=bind, info=info) as session:
+            moved = archive_batch(session, cutoff, batch_size)
+        if not moved["homeworks"]:
+            return report
+        report["homeworks"] += moved["homeworks"]
+        report["attachments"] += moved["attachments"]
+        report["batches"] += 1
+        time.sleep(pause_ms / 1000)
+
+
+def homeworks_query(include_archived: bool):
+    """Задания для чтения; с include_archived - вместе с архивными (поле archived)."""
+    live = select(*(HomeworkModel.__table__.c[name] for name in HOMEWORK_COLUMNS), literal(False).label("archived"))
+    if not include_archived:
+        return live.subquery()
+    archived = select(
+        *(HomeworkArchiveModel.__table__.c[name] for name in HOMEWORK_COLUMNS), literal(True).label("archived")
+    )
+    return union_all(live, archived).subquery()
+
+
+def attachments_query(include_archived: bool):
+    """Вложения с полями файла; с include_archived - вместе с архивными."""
+    def part(table, archived: bool):
+        return (
+            select(
+                *(table.c[name] for name in ATTACHMENT_COLUMNS),
+                FileModel.file_id,
+                FileModel.file_unique_id,
+                literal(archived).label("archived"),
+            )
+            .join(FileModel, FileModel.id == table.c.file_ref_id)
+        )
+
+    live = part(AttachmentModel.__table__, False)
+    if not include_archived:
+        return live.subquery()
+    return union_all(live, part(AttachmentArchiveModel.__table__, True)).subquery()
+
+
+if __name__ == "__main__":
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else ARCHIVE_AFTER_DAYS
+    engine = create_engine(sys.argv[2] if len(sys.argv) > 2 else SQLALCHEMY_DATABASE_URL)
+    try:
+        print(archive(engine, days))
+    finally:
+        engine.dispose()
@@ -0,0 +1,249 @@
+"""Резервные копии базы SQLite во время работы API (sqlite3 backup API).
+
+Запуск: python -m app.backup create [--no-compress] [--no-verify] [DATABASE_URL]
+        python -m app.backup verify <файл>
+        python -m app.backup restore <файл> <путь новой базы>
+"""
+import argparse
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+from app import metrics
+
+BACKUP_DIR = os.getenv("BACKUP_DIR", "./backups")
+# Страниц за один шаг копирования; между шагами база свободна для записи
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+BACKUP_STEP_SLEEP_MS = float(os.getenv("BACKUP_STEP_SLEEP_MS", "5"))
+# После стольких перезапусков из-за записи копия снимается за один шаг
+BACKUP_MAX_RESTARTS = int(os.getenv("BACKUP_MAX_RESTARTS", "3"))
+
+
+class BackupUnsupported(Exception):
+    pass
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+class BackupStats:
+    def __init__(self):
+        self.backups = 0
+        self.failures = 0
+        self.last = None
+
+    def stats(self) -> dict:
+        return {"backups": self.backups, "failures": self.failures, "last": self.last}
+
+
+backup_stats = BackupStats()
+metrics.register("backup", backup_stats.stats)
+
+
+def copy_online(source: sqlite3.Connection, destination: str, pages: int = BACKUP_PAGES_PER_STEP,
+                sleep_ms: float = BACKUP_STEP_SLEEP_MS, max_restarts: int = BACKUP_MAX_RESTARTS) -> dict:
+    """Копирует базу шагами по pages страниц с паузой между шагами.
+
+    В режиме WAL все шаги читают один снимок в открытой транзакции чтения: запись
+    идет параллельно и не перезапускает копирование. В режиме журнала отката
+    блокировка берется только на время шага, а запись другим соединением между шагами
+    начинает копирование заново; после max_restarts перезапусков оставшаяся копия
+    снимается за один шаг.
+    """
+    progress = {"steps": 0, "restarts": 0, "remaining": None, "pages": 0, "single_step": False}
+
+    def on_step(status, remaining, total):
+        if progress["remaining"] is not None and remaining > progress["remaining"]:
+            progress["restarts"] += 1
+            if progress["restarts"] > max_restarts:
+                raise _TooManyRestarts()
+        progress["steps"] += 1
+        progress["remaining"] = remaining
+        progress["pages"] = total
+        if remaining and sleep_ms > 0:
+            time.sleep(sleep_ms / 1000)
+
+    snapshot = source.in_transaction is False and \
+        source.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+    if snapshot:
+        source.execute("BEGIN")
+        source.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+    target = sqlite3.connect(destination)
+    try:
+        try:
+            source.backup(target, pages=pages, progress=on_step)
+        except _TooManyRestarts:
+            progress["restarts"] -= 1
+            progress["single_step"] = True
+            progress["remaining"] = None
+            source.backup(target, pages=-1, progress=on_step)
+    finally:
+        target.close()
+        if snapshot:
+            source.rollback()
+    progress.pop("remaining")
+    return progress
+
+
+def compress(path: Path) -> Path:
+    compressed = path.with_name(path.name + ".gz")
+    with open(path, "rb") as source, gzip.open(compressed, "wb", compresslevel=6) as target:
+        shutil.copyfileobj(source, target, 1024 * 1024)
+    path.unlink()
+    return compressed
+
+
+@contextmanager
+def _restored(path: Path):
+    # Сжатая копия распаковывается во временный файл, как при восстановлении
+    if path.suffix != ".gz":
+        yield path
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        restored = Path(tmp) / path.stem
+        with gzip.open(path, "rb") as source, open(restored, "wb") as target:
+            shutil.copyfileobj(source, target, 1024 * 1024)
+        yield restored
+
+
+def verify(path) -> dict:
+    """Восстанавливает копию во временный файл и проверяет целостность и число строк."""
+    with _restored(Path(path)) as restored:
+        connection = sqlite3.connect(f"file:{restored}?mode=ro", uri=True)
+        try:
+            integrity = connection.execute("PRAGMA integrity_check").fetchone()[0]
+            tables = [
+                name for (name,) in connection.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+                    "AND sql NOT LIKE 'CREATE VIRTUAL TABLE%' ORDER BY name"
+                )
+            ]
+            rows = {name: connection.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0] for name in tables}
+        finally:
+            connection.close()
+    return {"integrity": integrity, "rows": rows}
+
+
+def restore(path, target) -> dict:
+    """Восстанавливает копию в новый файл базы (API при этом должен быть остановлен)."""
+    target = Path(target)
+    if target.exists():
+        raise FileExistsError(str(target))
+    with _restored(Path(path)) as restored:
+        source = sqlite3.connect(f"file:{restored}?mode=ro", uri=True)
+        try:
+            copy_online(source, str(target), pages=-1, sleep_ms=0)
+        finally:
+            source.close()
+    return verify(target)
+
+
+def timestamp() -> str:
+    return f"{datetime.utcnow():%Y%m%d-%H%M%S-%f}"
+
+
+def backup_dir(tenant: Optional[str] = None) -> Path:
+    # Копии школ хранятся отдельно: список и скачивание видят только копии своей базы
+    directory = Path(BACKUP_DIR)
+    return directory / "tenants" / tenant if tenant is not None else directory
+
+
+def create_backup(engine: Engine, directory: Optional[str] = None, name: Optional[str] = None,
+                  compressed: bool = True, check: bool = True, pages: int = BACKUP_PAGES_PER_STEP,
+                  sleep_ms: float = BACKUP_STEP_SLEEP_MS) -> dict:
+    """Создает копию базы движка в directory и возвращает отчет."""
+    if engine.dialect.name != "sqlite":
+        raise BackupUnsupported("Online backup requires SQLite")
+    directory = Path(directory or BACKUP_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    name = name or f"backup-{timestamp()}"
+    path = directory / f"{name}.db"
+    part = directory / f"{name}.db.part"
+
+    started = time.perf_counter()
+    # Соединение из пула движка: изменения через него не перезапускают копирование
+    raw = engine.raw_connection()
+    try:
+        progress = copy_online(raw.driver_connection, str(part), pages, sleep_ms)
+    except Exception:
+        backup_stats.failures += 1
+        part.unlink(missing_ok=True)
+        raise
+    finally:
+        raw.close()
+    os.replace(part, path)
+    if compressed:
+        path = compress(path)
+    report = {
+        "file": path.name,
+        "bytes": path.stat().st_size,
+        "seconds": round(time.perf_counter() - started, 3),
+        **progress,
+    }
+    if check:
+        report["verify"] = verify(path)
+    backup_stats.backups += 1
+    backup_stats.last = {"file": path.name, "created_at": datetime.utcnow().isoformat()}
+    return report
+
+
+def list_backups(directory: Optional[str] = None) -> list:
+    directory = Path(directory or BACKUP_DIR)
+    if not directory.is_dir():
+        return []
+    files = [p for p in directory.iterdir() if p.is_file() and p.name.endswith((".db", ".db.gz"))]
+    return [
+        {"file": p.name, "bytes": p.stat().st_size, "created_at": datetime.utcfromtimestamp(p.stat().st_mtime)}
+        for p in sorted(files, key=lambda p: p.stat().st_mtime, reverse=True)
+    ]
+
+
+def find_backup(name: str, directory: Optional[str] = None) -> Optional[Path]:
+    # Только файлы копий из самого каталога, без путей
+    path = Path(directory or BACKUP_DIR) / name
+    if Path(name).name != name or not name.endswith((".db", ".db.gz")) or not path.is_file():
+        return None
+    return path
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Резервные копии базы SQLite")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create = commands.add_parser("create")
+    create.add_argument("url", nargs="?")
+    create.add_argument("--dir", default=BACKUP_DIR)
+    create.add_argument("--no-compress", action="store_true")
+    create.add_argument("--no-verify", action="store_true")
+    check = commands.add_parser("verify")
+    check.add_argument("file")
+    back = commands.add_parser("restore")
+    back.add_argument("file")
+    back.add_argument("target")
+    args = parser.parse_args(argv)
+
+    if args.command == "create":
+        from app.database import SQLALCHEMY_DATABASE_URL
+        engine = create_engine(args.url or SQLALCHEMY_DATABASE_URL)
+        try:
+            print(create_backup(engine, args.dir, compressed=not args.no_compress, check=not args.no_verify))
+        finally:
+            engine.dispose()
+    elif args.command == "verify":
+        print(verify(args.file))
+    else:
+        print(restore(args.file, args.target))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+from urllib.parse import quote
+from urllib.request import urlopen
+
+from starlette.responses import FileResponse
+
+from app import metrics
+from app.singleflight import SingleFlight
+
+BLOB_CACHE_DIR = os.getenv("BLOB_CACHE_DIR", "./blob_cache")
+BLOB_CACHE_MAX_BYTES = int(os.getenv("BLOB_CACHE_MAX_BYTES", str(1024 ** 3)))
+# Локальный каталог с файлами вместо Telegram (для разработки и тестов)
+BLOB_SOURCE_DIR = os.getenv("BLOB_SOURCE_DIR")
+TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+# Таймаут соединения и чтения при загрузке файла из Telegram
+BLOB_FETCH_TIMEOUT_SECONDS = float(os.getenv("BLOB_FETCH_TIMEOUT_SECONDS", "30"))
+
+
+class BlobNotFound(Exception):
+    pass
+
+
+class BlobFetcher(ABC):
+    """Источник содержимого файлов по file_id."""
+
+    @abstractmethod
+    def fetch(self, file_id: str, destination: Path) -> None:
+        ...
+
+
+class LocalDirectoryFetcher(BlobFetcher):
+    def __init__(self, root: str):
+        self.root = Path(root).resolve()
+
+    def fetch(self, file_id: str, destination: Path) -> None:
+        # file_id приходит от клиента: пути вне каталога (../, абсолютные) не допускаются
+        source = (self.root / file_id).resolve()
+        inside = os.path.commonpath([self.root, source]) == str(self.root)
+        if not inside or not source.is_file():
+            raise BlobNotFound(file_id)
+        shutil.copyfile(source, destination)
+
+
+class TelegramFetcher(BlobFetcher):
+    API_URL = "https://api.telegram.org"
+
+    def __init__(self, token: str, timeout: float = BLOB_FETCH_TIMEOUT_SECONDS):
+        self.token = token
+        self.timeout = timeout
+
+    def fetch(self, file_id: str, destination: Path) -> None:
+        # Без таймаута зависший запрос к Telegram навсегда занимает поток обработчика
+        url = f"{self.API_URL}/bot{self.token}/getFile?file_id={quote(file_id)}"
+        with urlopen(url, timeout=self.timeout) as response:
+            payload = json.load(response)
+        if not payload.get("ok"):
+            raise BlobNotFound(file_id)
+        file_path = payload["result"]["file_path"]
+        with urlopen(f"{self.API_URL}/file/bot{self.token}/{file_path}", timeout=self.timeout) as response, \
+                open(destination, "wb") as target:
+            shutil.copyfileobj(response, target)
+
+
+class BlobCache:
+    """Дисковый кэш содержимого файлов с ограничением по объему и вытеснением LRU."""
+
+    def __init__(self, directory: str, max_bytes: int, fetcher: BlobFetcher):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.fetcher = fetcher
+        self._lock = threading.Lock()
+        self._fetches = SingleFlight(grace_ms=0)
+        self._entries = OrderedDict()
+        # Файлы, которые сейчас отдаются клиентам: они не вытесняются до release
+        self._pinned = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_served = 0
+        self._load_existing()
+
+    def _load_existing(self) -> None:
+        # После перезапуска восстанавливаем порядок по времени последнего доступа
+        files = sorted(
+            (path for path in self.directory.iterdir() if path.is_file() and not path.name.endswith(".part")),
+            key=lambda path: path.stat().st_mtime,
+        )
+        for path in files:
+            size = path.stat().st_size
+            self._entries[path.name] = size
+            self.size += size
+        self._evict()
+
+    def _name(self, key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def acquire(self, key: str, file_id: str) -> Path:
+        """Путь к закэшированному файлу; key - file_unique_id или file_id.
+
+        Файл закрепляется и не вытесняется, пока не вызван release(path).
+        """
+        name = self._name(key)
+        path = self.directory / name
+        fetched = False
+        while True:
+            with self._lock:
+                if name in self._entries:
+                    self._entries.move_to_end(name)
+                    self._pinned[name] = self._pinned.get(name, 0) + 1
+                    if not fetched:
+                        self.hits += 1
+                        os.utime(path)
+                    return path
+                if not fetched:
+                    self.misses += 1
+            # Одновременные промахи по одному файлу загружают его один раз; файл,
+            # вытесненный до закрепления, загружается снова
+            self._fetches.do((name,), lambda: self._fetch(name, file_id))
+            fetched = True
+
+    def release(self, path: Path) -> None:
+        with self._lock:
+            count = self._pinned.pop(path.name, 0) - 1
+            if count > 0:
+                self._pinned[path.name] = count
+            self._evict()
+
+    def get(self, key: str, file_id: str) -> Path:
+        """Путь к закэшированному файлу без закрепления."""
+        path = self.acquire(key, file_id)
+        self.release(path)
+        return path
+
+    def _fetch(self, name: str, file_id: str) -> None:
+        part = self.directory / f"{name}.{uuid.uuid4().hex}.part"
+        try:
+            self.fetcher.fetch(file_id, part)
+            os.replace(part, self.directory / name)
+        finally:
+            part.unlink(missing_ok=True)
+        size = (self.directory / name).stat().st_size
+        with self._lock:
+            self._entries[name] = size
+            self.size += size
+            self._evict()
+
+    def _evict(self) -> None:
+        # Последний загруженный файл и отдаваемые сейчас файлы не вытесняются,
+        # даже если объем больше бюджета; они вытесняются после release
+        if self.size <= self.max_bytes:
+            return
+        for name in list(self._entries)[:-1]:
+            if self.size <= self.max_bytes:
+                break
+            if name in self._pinned:
+                continue
+            size = self._entries.pop(name)
+            (self.directory / name).unlink(missing_ok=True)
+            self.size -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / requests if requests else 0.0,
+            "evictions": self.evictions,
+            "bytes_cached": self.size,
+            "bytes_served": self.bytes_served,
+        }
+
+
+class CachedFileResponse(FileResponse):
+    """FileResponse (поддерживает Range и http.response.pathsend), учитывающий отданные байты.
+
+    path должен быть получен через cache.acquire: после отправки файл освобождается.
+    """
+
+    def __init__(self, cache: BlobCache, path: Path, *args, **kwargs):
+        super().__init__(path, *args, **kwargs)
+        self.cache = cache
+        self.cached_path = Path(path)
+
+    async def __call__(self, scope, receive, send):
+        async def counting_send(message):
+            if message["type"] == "http.response.body":
+                self.cache.bytes_served += len(message.get("body", b""))
+            elif message["type"] == "http.response.pathsend":
+                self.cache.bytes_served += os.stat(message["path"]).st_size
+            await send(message)
+
+        try:
+            await super().__call__(scope, receive, counting_send)
+        finally:
+            self.cache.release(self.cached_path)
+
+
+_blob_cache: Optional[BlobCache] = None
+_blob_cache_lock = threading.Lock()
+
+
+def get_blob_cache() -> Optional[BlobCache]:
+    global _blob_cache
+    with _blob_cache_lock:
+        if _blob_cache is None:
+            if BLOB_SOURCE_DIR:
+                fetcher = LocalDirectoryFetcher(BLOB_SOURCE_DIR)
+            elif TELEGRAM_BOT_TOKEN:
+                fetcher = TelegramFetcher(TELEGRAM_BOT_TOKEN)
+            else:
+                return None
+            _blob_cache = BlobCache(BLOB_CACHE_DIR, BLOB_CACHE_MAX_BYTES, fetcher)
+            metrics.register("blob_cache", _blob_cache.stats)
+        return _blob_cache
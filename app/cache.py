@@ -0,0 +1,430 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from urllib.parse import urlparse
+
+from fastapi import Response
+from sqlalchemy.orm import Session
+
+from app import metrics
+from app.database import tenant_of
+from app.invalidation import bus
+from app.singleflight import SingleFlight, _adapter, coalesced_json
+
+# Хранилище кэша ответов: memory (в процессе), shared (файл SQLite в памяти, общий
+# для процессов), redis (сервер с протоколом Redis) или none (кэш выключен)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_SHARED_PATH = os.getenv("CACHE_SHARED_PATH", "./cache.db")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+# Тег, входящий в каждую запись: его смена сбрасывает весь кэш
+ALL_TAG = "*"
+CACHE_INVALIDATION = "cache"
+
+
+class CacheBackend(ABC):
+    """Хранилище записей и версий тегов.
+
+    Версии тегов не вытесняются и не истекают: запись с версией тега, которую
+    хранилище "забыло", могла бы снова стать видимой.
+    """
+
+    name = "backend"
+    # Общее для процессов хранилище не требует инвалидации через шину
+    shared = False
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    def versions(self, tags: Sequence[str]) -> List[int]:
+        ...
+
+    @abstractmethod
+    def bump(self, tag: str) -> int:
+        ...
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryBackend(CacheBackend):
+    """Кэш в памяти процесса с вытеснением LRU."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._tags: Dict[str, int] = {}
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def versions(self, tags: Sequence[str]) -> List[int]:
+        with self._lock:
+            return [self._tags.get(tag, 0) for tag in tags]
+
+    def bump(self, tag: str) -> int:
+        with self._lock:
+            version = self._tags.get(tag, 0) + 1
+            self._tags[tag] = version
+            if tag == ALL_TAG:
+                # Недоступные записи освобождают память сразу, а не по мере вытеснения
+                self._entries.clear()
+            return version
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "evictions": self.evictions}
+
+
+class SharedBackend(CacheBackend):
+    """Кэш в файле SQLite, отображаемом в память (mmap) всеми процессами на машине."""
+
+    name = "shared"
+    shared = True
+    SWEEP_EVERY = 1000
+
+    def __init__(self, path: str = CACHE_SHARED_PATH, max_entries: int = CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._sets = 0
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries "
+            "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        connection.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_expires ON cache_entries (expires_at)")
+        connection.execute("CREATE TABLE IF NOT EXISTS cache_tags (tag TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=1, isolation_level=None, check_same_thread=False)
+            # Кэш можно потерять при сбое питания, поэтому без fsync
+            connection.execute("PRAGMA synchronous = OFF")
+            connection.execute("PRAGMA mmap_size = 268435456")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._connection().execute(
+            "SELECT value FROM cache_entries WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl),
+        )
+        self._sets += 1
+        if self._sets % self.SWEEP_EVERY == 0:
+            self._sweep(connection)
+
+    def _sweep(self, connection: sqlite3.Connection) -> None:
+        connection.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),))
+        # Сверх лимита удаляются записи, которые истекут раньше других
+        connection.execute(
+            "DELETE FROM cache_entries WHERE key IN (SELECT key FROM cache_entries "
+            "ORDER BY expires_at LIMIT max(0, (SELECT COUNT(*) FROM cache_entries) - ?))",
+            (self.max_entries,),
+        )
+
+    def versions(self, tags: Sequence[str]) -> List[int]:
+        placeholders = ", ".join("?" for _ in tags)
+        rows = self._connection().execute(
+            f"SELECT tag, version FROM cache_tags WHERE tag IN ({placeholders})", list(tags)
+        ).fetchall()
+        found = dict(rows)
+        return [found.get(tag, 0) for tag in tags]
+
+    def bump(self, tag: str) -> int:
+        return self._connection().execute(
+            "INSERT INTO cache_tags (tag, version) VALUES (?, 1) "
+            "ON CONFLICT (tag) DO UPDATE SET version = version + 1 RETURNING version",
+            (tag,),
+        ).fetchone()[0]
+
+    def stats(self) -> dict:
+        return {"entries": self._connection().execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]}
+
+
+class RedisError(Exception):
+    pass
+
+
+class RedisBackend(CacheBackend):
+    """Кэш на сервере с протоколом Redis (RESP) без сторонних библиотек.
+
+    Соединения постоянные, по одному на поток. Версии тегов хранятся без срока
+    жизни; сервер должен быть настроен без вытеснения ключей без TTL (volatile-*).
+    """
+
+    name = "redis"
+    shared = True
+
+    def __init__(self, url: str = CACHE_REDIS_URL, prefix: str = "school_bot:", timeout: float = 1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.prefix = prefix
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.connection = (sock, sock.makefile("rb"))
+        if self.password:
+            self._command("AUTH", self.password)
+        if self.db:
+            self._command("SELECT", self.db)
+
+    def _close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        self._local.connection = None
+        if connection is not None:
+            connection[1].close()
+            connection[0].close()
+
+    def _command(self, *args) -> Any:
+        if getattr(self._local, "connection", None) is None:
+            self._connect()
+        sock, reader = self._local.connection
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        try:
+            sock.sendall(b"".join(parts))
+            return self._read(reader)
+        except (OSError, ValueError):
+            # Ответ мог быть прочитан не полностью: соединение больше не используется
+            self._close()
+            raise
+
+    def _read(self, reader) -> Any:
+        line = reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RedisError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            size = int(payload)
+            if size < 0:
+                return None
+            data = reader.read(size + 2)
+            if len(data) != size + 2:
+                raise ConnectionError("connection closed")
+            return data[:-2]
+        if kind == b"*":
+            size = int(payload)
+            return None if size < 0 else [self._read(reader) for _ in range(size)]
+        raise ValueError(f"unexpected reply {line!r}")
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._command("GET", self.prefix + key)
+
+    def set(self, key: str, value: bytes, ttl: float) -> None:
+        self._command("SET", self.prefix + key, value, "PX", max(1, int(ttl * 1000)))
+
+    def versions(self, tags: Sequence[str]) -> List[int]:
+        values = self._command("MGET", *(f"{self.prefix}tag:{tag}" for tag in tags))
+        return [int(value) if value is not None else 0 for value in values]
+
+    def bump(self, tag: str) -> int:
+        return self._command("INCR", f"{self.prefix}tag:{tag}")
+
+
+class _RouteStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+
+class Cache:
+    """Кэш сериализованных ответов с TTL и инвалидацией по тегам.
+
+    Ключ записи включает текущие версии ее тегов; инвалидация тега увеличивает его
+    версию, и старые записи становятся недоступны (и истекают по TTL). Версии читаются
+    до загрузки данных, поэтому результат, загруженный до записи, не попадет под новую
+    версию. Одновременные промахи по одному ключу загружают данные один раз.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float = CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+        self._loads = SingleFlight(grace_ms=0)
+        self._lock = threading.Lock()
+        self._routes: Dict[str, _RouteStats] = defaultdict(_RouteStats)
+        self._subscribed = set()
+        self.errors = 0
+
+    def _scoped(self, tenant: Optional[str], tags: Sequence[str]) -> List[str]:
+        namespace = tenant or ""
+        return [ALL_TAG] + [f"{namespace}/{tag}" for tag in tags]
+
+    def _invalidation_name(self, tenant: Optional[str]) -> str:
+        return CACHE_INVALIDATION if tenant is None else f"{CACHE_INVALIDATION}:{tenant}"
+
+    def _watch(self, tenant: Optional[str]) -> None:
+        # Кэш в памяти процесса узнает о записях других процессов через шину инвалидации
+        if self.backend.shared:
+            return
+        name = self._invalidation_name(tenant)
+        with self._lock:
+            if name in self._subscribed:
+                return
+            self._subscribed.add(name)
+        bus.subscribe(name, self.clear)
+
+    def get_or_load(self, route: str, key: tuple, tags: Sequence[str], load: Callable[[], bytes],
+                    tenant: Optional[str] = None, ttl: Optional[float] = None) -> bytes:
+        self._watch(tenant)
+        scoped = self._scoped(tenant, tags)
+        try:
+            versions = self.backend.versions(scoped)
+            entry_key = f"{route}:{tenant or ''}:{key!r}|{','.join(map(str, versions))}"
+            value = self.backend.get(entry_key)
+        except Exception:
+            # Недоступное хранилище не должно ломать чтение: данные загружаются напрямую
+            self.errors += 1
+            return load()
+
+        stats = self._routes[route]
+        if value is not None:
+            stats.hits += 1
+            return value
+        stats.misses += 1
+
+        def fill() -> bytes:
+            data = load()
+            try:
+                self.backend.set(entry_key, data, ttl or self.ttl)
+            except Exception:
+                self.errors += 1
+            return data
+
+        return self._loads.do((entry_key,), fill)
+
+    def invalidate(self, db: Session, *tags: str) -> None:
+        """Инвалидирует теги после фиксации изменений в базе сессии."""
+        tenant = tenant_of(db)
+        for tag in self._scoped(tenant, tags)[1:]:
+            try:
+                self.backend.bump(tag)
+            except Exception:
+                self.errors += 1
+        if not self.backend.shared and bus.poll_interval > 0:
+            name = self._invalidation_name(tenant)
+            version = bus.publish(db, name)
+            db.commit()
+            bus.acknowledge(name, version)
+
+    def clear(self) -> None:
+        try:
+            self.backend.bump(ALL_TAG)
+        except Exception:
+            self.errors += 1
+
+    def reset_stats(self) -> None:
+        self._routes.clear()
+
+    def stats(self) -> dict:
+        routes = {}
+        for route, stats in list(self._routes.items()):
+            requests = stats.hits + stats.misses
+            routes[route] = {
+                "hits": stats.hits,
+                "misses": stats.misses,
+                "hit_ratio": stats.hits / requests if requests else 0.0,
+            }
+        try:
+            backend = self.backend.stats()
+        except Exception:
+            backend = {}
+        return {"backend": self.backend.name, "errors": self.errors, "routes": routes, **backend}
+
+
+def create_backend(name: str = CACHE_BACKEND) -> Optional[CacheBackend]:
+    if name == "memory":
+        return MemoryBackend()
+    if name == "shared":
+        return SharedBackend()
+    if name == "redis":
+        return RedisBackend()
+    if name == "none":
+        return None
+    raise ValueError(f"Unknown CACHE_BACKEND: {name}")
+
+
+_backend = create_backend()
+cache: Optional[Cache] = Cache(_backend) if _backend is not None else None
+if cache is not None:
+    metrics.register("cache", cache.stats)
+
+
+def cached_json(db: Session, key: tuple, tags: Sequence[str], load: Callable[[], Any], schema: Any,
+                exclude: Any = None) -> Response:
+    """Ответ из кэша; без кэша (CACHE_BACKEND=none) - объединенный запрос (coalesced_json).
+    Одновременные промахи кэша объединяет сам кэш, поэтому при включенном кэше
+    app.singleflight.reads на таких маршрутах не используется.
+
+    key начинается с имени маршрута, по нему считается доля попаданий.
+    """
+    if cache is None:
+        return coalesced_json(key, load, schema, exclude)
+    adapter = _adapter(schema)
+
+    def run() -> bytes:
+        return adapter.dump_json(adapter.validate_python(load(), from_attributes=True), exclude=exclude)
+
+    content = cache.get_or_load(key[0], key, tags, run, tenant_of(db))
+    return Response(content=content, media_type="application/json")
+
+
+def invalidate(db: Session, *tags: str) -> None:
+    if cache is not None:
+        cache.invalidate(db, *tags)
@@ -0,0 +1,95 @@
+import os
+from typing import Dict
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app import group_stats
+from app.cache import invalidate
+from app.database import tenant_of
+from app.invalidation import bus
+from app.membership import membership_for
+from app.models.archive import AttachmentArchiveModel, HomeworkArchiveModel
+from app.models.attachment import AttachmentModel
+from app.models.group import GroupModel
+from app.models.homework import HomeworkModel
+from app.models.user import UserModel
+from app.models.user_group import UserGroupModel
+from app.singleflight import reads
+
+# Группы с большим числом заданий удаляются в фоне после ответа
+CASCADE_BACKGROUND_THRESHOLD = int(os.getenv("CASCADE_BACKGROUND_THRESHOLD", "5000"))
+
+
+def _delete(model):
+    # Объекты в сессии не синхронизируются: после фиксации они все равно устаревают
+    return delete(model).execution_options(synchronize_session=False)
+
+
+def delete_homework(session: Session, homework: HomeworkModel) -> Dict[str, int]:
+    """Удаляет задание вместе с вложениями в одной транзакции и фиксирует ее."""
+    homework_id, group_id = homework.id, homework.group_id
+    attachments = session.execute(
+        _delete(AttachmentModel).where(AttachmentModel.homework_id == homework_id)
+    ).rowcount
+    session.execute(_delete(HomeworkModel).where(HomeworkModel.id == homework_id))
+    group_stats.homework_removed(session, group_id, homework.deadline)
+    session.commit()
+
+    reads.forget(("homeworks.group", tenant_of(session), group_id))
+    reads.forget(("attachments.homework", tenant_of(session), homework_id))
+    invalidate(session, f"group:{group_id}")
+    return {"homeworks": 1, "attachments": attachments}
+
+
+def delete_group(session: Session, group_id: int) -> Dict[str, int]:
+    """Удаляет группу, ее задания (в том числе архивные), вложения заданий и членство
+    множественными DELETE в одной транзакции и фиксирует ее."""
+    homework_ids = select(HomeworkModel.id).where(HomeworkModel.group_id == group_id)
+    attachments = session.execute(
+        _delete(AttachmentModel).where(AttachmentModel.homework_id.in_(homework_ids))
+    ).rowcount
+    homeworks = session.execute(_delete(HomeworkModel).where(HomeworkModel.group_id == group_id)).rowcount
+    archived_ids = select(HomeworkArchiveModel.id).where(HomeworkArchiveModel.group_id == group_id)
+    attachments += session.execute(
+        _delete(AttachmentArchiveModel).where(AttachmentArchiveModel.homework_id.in_(archived_ids))
+    ).rowcount
+    homeworks += session.execute(
+        _delete(HomeworkArchiveModel).where(HomeworkArchiveModel.group_id == group_id)
+    ).rowcount
+    memberships = session.execute(_delete(UserGroupModel).where(UserGroupModel.group_id == group_id)).rowcount
+    group_stats.group_deleted(session, group_id)
+    session.execute(_delete(GroupModel).where(GroupModel.id == group_id))
+    membership = membership_for(session)
+    version = bus.publish(session, membership.cache_name)
+    session.commit()
+
+    membership.remove_group(group_id)
+    bus.acknowledge(membership.cache_name, version)
+    reads.forget(("homeworks.group", tenant_of(session), group_id))
+    reads.forget(("attachments.homework", tenant_of(session)))
+    invalidate(session, "groups", f"group:{group_id}")
+    return {"homeworks": homeworks, "attachments": attachments, "memberships": memberships}
+
+
+def delete_user(session: Session, user_id: int) -> Dict[str, int]:
+    """Удаляет пользователя вместе с его членством в группах и фиксирует транзакцию."""
+    group_ids = list(session.scalars(select(UserGroupModel.group_id).where(UserGroupModel.user_id == user_id)))
+    session.execute(_delete(UserGroupModel).where(UserGroupModel.user_id == user_id))
+    for group_id in group_ids:
+        group_stats.members_changed(session, group_id, -1)
+    session.execute(_delete(UserModel).where(UserModel.id == user_id))
+    membership = membership_for(session)
+    version = bus.publish(session, membership.cache_name)
+    session.commit()
+
+    membership.remove_user(user_id)
+    bus.acknowledge(membership.cache_name, version)
+    invalidate(session, "users", "groups", *(f"group:{group_id}" for group_id in group_ids))
+    return {"memberships": len(group_ids)}
+
+
+def delete_group_in_background(bind, group_id: int, tenant=None) -> None:
+    info = {"tenant": tenant} if tenant is not None else {}
+    with Session(bind=bind, info=info) as session:
+        delete_group(session, group_id)
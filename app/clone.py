@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+from typing import Dict
+
+from sqlalchemy import String, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app import group_stats
+from app.models.attachment import AttachmentModel
+from app.models.homework import HomeworkModel
+
+
+def _shift(column, days: int, dialect: str):
+    if dialect == "sqlite":
+        # datetime() отбрасывает микросекунды: дробная часть берется из исходного значения,
+        # иначе срок копии не совпадает при сравнении с datetime, сохраненным SQLAlchemy
+        return func.datetime(column, f"{days:+d} days", type_=String).concat(func.substr(column, 20))
+    return column + timedelta(days=days)
+
+
+def _numbered_homeworks(group_id: int):
+    # Порядковый номер задания в группе сопоставляет исходные задания с копиями
+    return (
+        select(HomeworkModel.id, func.row_number().over(order_by=HomeworkModel.id).label("position"))
+        .where(HomeworkModel.group_id == group_id)
+        .subquery()
+    )
+
+
+def copy_homeworks(session: Session, source_group_id: int, target_group_id: int,
+                   deadline_offset_days: int = 0) -> Dict[str, int]:
+    """Копирует задания и их вложения в другую группу запросами INSERT ... SELECT,
+    сдвигая сроки сдачи; фиксация - на вызывающей стороне."""
+    now = datetime.utcnow()
+    dialect = session.get_bind().dialect.name
+
+    # Копии вставляются в порядке id исходных заданий, поэтому получают id в том же порядке
+    homeworks = session.execute(
+        insert(HomeworkModel).from_select(
+            ["group_id", "assigned_by", "title", "description", "deadline", "created_at"],
+            select(
+                literal(target_group_id),
+                HomeworkModel.assigned_by,
+                HomeworkModel.title,
+                HomeworkModel.description,
+                _shift(HomeworkModel.deadline, deadline_offset_days, dialect),
+                literal(now),
+            )
+            .where(HomeworkModel.group_id == source_group_id)
+            .order_by(HomeworkModel.id),
+        )
+    ).rowcount
+
+    source = _numbered_homeworks(source_group_id)
+    target = _numbered_homeworks(target_group_id)
+    attachments = session.execute(
+        insert(AttachmentModel).from_select(
+            ["homework_id", "file_ref_id", "file_type", "file_name", "caption", "uploaded_at"],
+            select(
+                target.c.id,
+                AttachmentModel.file_ref_id,
+                AttachmentModel.file_type,
+                AttachmentModel.file_name,
+                AttachmentModel.caption,
+                literal(now),
+            )
+            .join(source, source.c.id == AttachmentModel.homework_id)
+            .join(target, target.c.position == source.c.position)
+            .order_by(AttachmentModel.id),
+        )
+    ).rowcount
+
+    group_stats.homeworks_copied(session, target_group_id, homeworks)
+    return {"homeworks": homeworks, "attachments": attachments}
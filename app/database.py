@@ -1,25 +1,137 @@
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from fastapi import Request
+from fastapi import Depends, HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 import os
+import sqlite3
+import time
 from dotenv import load_dotenv
+from app import replicas
 
 load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./school_bot.db")
+# Режим журнала SQLite: в WAL чтение не ждет записи, журнал сбрасывает app.maintenance
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "wal")
 
-engine = create_engine(
+def configure_sqlite(engine):
+    """Настройки соединений SQLite: режим журнала и incremental auto_vacuum
+    (auto_vacuum применяется к новым базам, для существующих - python -m app.migrations)."""
+    if engine.dialect.name != "sqlite":
+        return engine
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            try:
+                cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+            except sqlite3.OperationalError:
+                # База занята другим соединением; режим журнала хранится в файле и
+                # будет переключен при следующем подключении
+                pass
+        finally:
+            cursor.close()
+
+    return engine
+
+engine = configure_sqlite(create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {}
-)
+))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
-def get_db():
+def _session_scope():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def tenant_of(db: Session):
+    # Арендатор, к базе которого привязана сессия (None - основная база)
+    return db.info.get("tenant")
+
+def get_db(request: Request):
+    # Подзапросы пакетного запроса (/batch) используют общую сессию
+    shared_db = getattr(request.state, "db", None)
+    if shared_db is not None:
+        yield shared_db
+        return
+    tenant = getattr(request.state, "tenant", None)
+    if tenant is not None:
+        yield from _tenant_session_scope(tenant)
+        return
+    yield from _session_scope()
+
+def _tenant_session_scope(tenant: str):
+    # Реестр арендаторов сам зависит от этого модуля, поэтому импортируется здесь
+    from app import tenants
+    try:
+        db = tenants.registry.session(tenant)
+    except tenants.TenantNotFound:
+        raise HTTPException(status_code=404, detail="Tenant not found")
+    except tenants.TenantUnavailable:
+        raise HTTPException(status_code=503, detail="Tenant is being moved", headers={"Retry-After": "5"})
+    try:
+        yield db
+    finally:
+        tenants.registry.release(db)
+
+def client_key(request: Request) -> str:
+    # Клиент для чтения своих записей: заголовок X-Client-ID или адрес
+    client_id = request.headers.get("x-client-id")
+    if client_id:
+        return client_id
+    return request.client.host if request.client else ""
+
+def last_write_of(request: Request):
+    # Время последней записи клиента, возвращенное ему в cookie или заголовке X-Last-Write
+    value = request.headers.get(replicas.STICKY_HEADER) or request.cookies.get(replicas.STICKY_COOKIE)
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+def get_write_db(request: Request, db: Session = Depends(get_db)):
+    """Сессия основной базы для обработчиков, изменяющих данные."""
+    # Время записи уходит клиенту в ответе (replicas.StickyWriteMiddleware)
+    request.state.last_write = time.time()
+    yield db
+    replicas.router.record_write(client_key(request))
+
+def get_read_db(request: Request, db: Session = Depends(get_db)):
+    """Сессия реплики для чтения; основная база, если реплик нет, все недоступны
+    или клиент недавно выполнял запись."""
+    if getattr(request.state, "db", None) is not None or tenant_of(db) is not None:
+        yield db
+        return
+    replica = replicas.router.choose(client_key(request), last_write_of(request))
+    if replica is None:
+        yield db
+        return
+    session = Session(bind=replica.engine, autoflush=False, info={"replica": replica.url})
+    try:
+        yield session
+    except OperationalError:
+        replicas.router.mark_failed(replica)
+        raise
+    finally:
+        session.close()
+
+@contextmanager
+def open_session(app):
+    # Сессия вне обработчика (например, в middleware) с учетом переопределений зависимостей
+    provider = app.dependency_overrides.get(get_db, _session_scope)
+    session_gen = provider()
+    try:
+        yield next(session_gen)
+    finally:
+        session_gen.close()
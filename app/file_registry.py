@@ -0,0 +1,53 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.file import FileModel
+
+FileKey = Tuple[str, Optional[str]]
+
+
+def _insert_ignore(session: Session):
+    # INSERT ... ON CONFLICT DO NOTHING: параллельная регистрация того же файла не является ошибкой
+    dialect = postgresql if session.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(FileModel.__table__).on_conflict_do_nothing()
+
+
+def _lookup(session: Session, keys: Sequence[FileKey]) -> Tuple[Dict[str, FileModel], Dict[str, FileModel]]:
+    file_ids = {file_id for file_id, _ in keys}
+    unique_ids = {unique_id for _, unique_id in keys if unique_id}
+    files = session.scalars(
+        select(FileModel).where(
+            or_(FileModel.file_id.in_(file_ids), FileModel.file_unique_id.in_(unique_ids))
+        )
+    ).all()
+    by_file_id = {f.file_id: f for f in files}
+    by_unique_id = {f.file_unique_id: f for f in files if f.file_unique_id}
+    return by_file_id, by_unique_id
+
+
+def _match(key: FileKey, by_file_id, by_unique_id) -> Optional[FileModel]:
+    file_id, unique_id = key
+    if unique_id and unique_id in by_unique_id:
+        return by_unique_id[unique_id]
+    return by_file_id.get(file_id)
+
+
+def resolve_files(session: Session, keys: Sequence[FileKey]) -> List[FileModel]:
+    """Возвращает записи files для пар (file_id, file_unique_id), создавая недостающие.
+
+    Файл определяется по file_unique_id, если он передан, иначе по file_id.
+    """
+    by_file_id, by_unique_id = _lookup(session, keys)
+    missing = {}
+    for key in keys:
+        if _match(key, by_file_id, by_unique_id) is None:
+            missing.setdefault(key[1] or key[0], {"file_id": key[0], "file_unique_id": key[1]})
+
+    if missing:
+        session.execute(_insert_ignore(session), list(missing.values()))
+        by_file_id, by_unique_id = _lookup(session, keys)
+
+    return [_match(key, by_file_id, by_unique_id) for key in keys]
@@ -0,0 +1,191 @@
+from datetime import datetime
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.models.group import GroupModel
+from app.models.group_stats import GroupStatsModel
+from app.models.homework import HomeworkModel
+from app.models.user_group import UserGroupModel
+
+stats_table = GroupStatsModel.__table__
+
+
+def _next_deadline_query(group_id, now: datetime):
+    return (
+        select(func.min(HomeworkModel.deadline))
+        .where(HomeworkModel.group_id == group_id, HomeworkModel.deadline >= now)
+        .scalar_subquery()
+    )
+
+
+def _ensure(session: Session, group_id: int) -> None:
+    dialect = postgresql if session.get_bind().dialect.name == "postgresql" else sqlite
+    session.execute(
+        dialect.insert(stats_table)
+        .values(group_id=group_id, member_count=0, homework_count=0)
+        .on_conflict_do_nothing()
+    )
+
+
+def _update(session: Session, group_id: int, **values) -> None:
+    # Изменения сессии должны попасть в базу до пересчета подзапросами
+    session.flush()
+    _ensure(session, group_id)
+    session.execute(
+        update(stats_table)
+        .where(stats_table.c.group_id == group_id)
+        .values(last_activity=datetime.utcnow(), **values)
+    )
+
+
+def group_created(session: Session, group_id: int) -> None:
+    _ensure(session, group_id)
+
+
+def groups_created(session: Session, group_ids: Iterable[int]) -> None:
+    rows = [{"group_id": group_id, "member_count": 0, "homework_count": 0} for group_id in group_ids]
+    if not rows:
+        return
+    dialect = postgresql if session.get_bind().dialect.name == "postgresql" else sqlite
+    session.execute(dialect.insert(stats_table).values(rows).on_conflict_do_nothing())
+
+
+def group_deleted(session: Session, group_id: int) -> None:
+    session.execute(delete(stats_table).where(stats_table.c.group_id == group_id))
+
+
+def members_changed(session: Session, group_id: int, delta: int) -> None:
+    _update(session, group_id, member_count=stats_table.c.member_count + delta)
+
+
+def homework_added(session: Session, group_id: int, deadline: datetime) -> None:
+    now = datetime.utcnow()
+    next_deadline = stats_table.c.next_deadline
+    values = {"homework_count": stats_table.c.homework_count + 1}
+    if deadline >= now:
+        values["next_deadline"] = case(
+            # Сохраненный срок уже прошел - ближайший ищется заново
+            (next_deadline < now, _next_deadline_query(group_id, now)),
+            (next_deadline.is_(None) | (next_deadline > deadline), deadline),
+            else_=next_deadline,
+        )
+    _update(session, group_id, **values)
+
+
+def homework_removed(session: Session, group_id: int, deadline: datetime) -> None:
+    # Ближайший срок пересчитывается, только если удалено задание с этим сроком
+    next_deadline = stats_table.c.next_deadline
+    _update(
+        session, group_id,
+        homework_count=stats_table.c.homework_count - 1,
+        next_deadline=case(
+            (next_deadline == deadline, _next_deadline_query(group_id, datetime.utcnow())),
+            else_=next_deadline,
+        ),
+    )
+
+
+def homeworks_copied(session: Session, group_id: int, count: int) -> None:
+    _update(
+        session, group_id,
+        homework_count=stats_table.c.homework_count + count,
+        next_deadline=_next_deadline_query(group_id, datetime.utcnow()),
+    )
+
+
+def homeworks_imported(session: Session, counts: Dict[int, int]) -> None:
+    """Учитывает задания, добавленные массовым импортом, одним запросом на все группы."""
+    if not counts:
+        return
+    groups_created(session, counts)
+    session.execute(
+        update(stats_table)
+        .where(stats_table.c.group_id.in_(counts))
+        .values(
+            homework_count=stats_table.c.homework_count + case(counts, value=stats_table.c.group_id, else_=0),
+            next_deadline=_next_deadline_query(stats_table.c.group_id, datetime.utcnow()),
+            last_activity=datetime.utcnow(),
+        )
+    )
+
+
+def homeworks_archived(session: Session, group_id: int, count: int) -> None:
+    # Архивные задания не учитываются; перенос в архив не считается активностью группы
+    session.execute(
+        update(stats_table)
+        .where(stats_table.c.group_id == group_id)
+        .values(
+            homework_count=stats_table.c.homework_count - count,
+            next_deadline=_next_deadline_query(group_id, datetime.utcnow()),
+        )
+    )
+
+
+def homework_updated(session: Session, old_group_id: int, old_deadline: datetime,
+                     group_id: int, deadline: datetime) -> None:
+    if old_group_id != group_id:
+        homework_removed(session, old_group_id, old_deadline)
+        homework_added(session, group_id, deadline)
+    elif old_deadline != deadline:
+        _update(session, group_id, next_deadline=_next_deadline_query(group_id, datetime.utcnow()))
+    else:
+        _update(session, group_id)
+
+
+def current_stats(db: Session, group_ids: Iterable[int]) -> Dict[int, GroupStatsModel]:
+    """Статистика групп; ближайший срок, который уже прошел, пересчитывается одним запросом."""
+    group_ids = list(group_ids)
+    rows = {
+        row.group_id: row
+        for row in db.query(GroupStatsModel).filter(GroupStatsModel.group_id.in_(group_ids))
+    }
+    now = datetime.utcnow()
+    stale = [row.group_id for row in rows.values() if row.next_deadline is not None and row.next_deadline < now]
+    if stale:
+        upcoming = dict(
+            db.query(HomeworkModel.group_id, func.min(HomeworkModel.deadline))
+            .filter(HomeworkModel.group_id.in_(stale), HomeworkModel.deadline >= now)
+            .group_by(HomeworkModel.group_id)
+        )
+        for group_id in stale:
+            # Значение только для ответа: чтение не изменяет базу
+            db.expunge(rows[group_id])
+            rows[group_id].next_deadline = upcoming.get(group_id)
+    return rows
+
+
+def rebuild(connection: Connection, now: Optional[datetime] = None) -> int:
+    """Пересчитывает статистику всех групп по данным таблиц (для миграции)."""
+    now = now or datetime.utcnow()
+    members = (
+        select(UserGroupModel.group_id, func.count().label("count"))
+        .group_by(UserGroupModel.group_id).subquery()
+    )
+    homeworks = (
+        select(
+            HomeworkModel.group_id,
+            func.count().label("count"),
+            func.max(HomeworkModel.created_at).label("last_created"),
+        )
+        .group_by(HomeworkModel.group_id).subquery()
+    )
+    connection.execute(delete(stats_table))
+    result = connection.execute(
+        stats_table.insert().from_select(
+            ["group_id", "member_count", "homework_count", "next_deadline", "last_activity"],
+            select(
+                GroupModel.id,
+                func.coalesce(members.c.count, 0),
+                func.coalesce(homeworks.c.count, 0),
+                _next_deadline_query(GroupModel.id, now),
+                func.coalesce(homeworks.c.last_created, GroupModel.created_at),
+            )
+            .outerjoin(members, members.c.group_id == GroupModel.id)
+            .outerjoin(homeworks, homeworks.c.group_id == GroupModel.id),
+        )
+    )
+    return result.rowcount
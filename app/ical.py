@@ -0,0 +1,252 @@
+"""Календари сроков сдачи заданий в формате iCalendar (RFC 5545).
+
+Сформированный календарь хранится в кэше ответов до изменения заданий группы
+(тег group:{id}), поэтому повторный опрос календаря не обращается к базе.
+ETag - хэш содержимого. Last-Modified - время, когда календарь впервые отдан с этим
+ETag: он хранится вместе с ETag последней версии и меняется только при изменении
+содержимого (в том числе при переименовании группы или выходе пользователя из нее).
+"""
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Dict, Iterable, NamedTuple, Optional, Sequence
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import cache as response_cache
+from app.database import tenant_of
+from app.membership import membership_for
+from app.models.group import GroupModel
+from app.models.homework import HomeworkModel
+from app.models.user import UserModel
+from app.models.user_group import UserGroupModel
+
+# Задания со сроком раньше стольких дней назад в календарь не попадают
+CALENDAR_PAST_DAYS = int(os.getenv("CALENDAR_PAST_DAYS", "30"))
+# Календарь в кэше живет до изменения заданий, но не дольше этого срока (сдвиг окна CALENDAR_PAST_DAYS)
+CALENDAR_CACHE_TTL_SECONDS = float(os.getenv("CALENDAR_CACHE_TTL_SECONDS", "86400"))
+# Сколько хранится ETag и Last-Modified последней версии календаря (дольше самого календаря,
+# чтобы после его вытеснения из кэша Last-Modified не менялся без изменений)
+CALENDAR_VERSION_TTL_SECONDS = float(os.getenv("CALENDAR_VERSION_TTL_SECONDS", str(30 * 86400)))
+# Cache-Control: max-age для календарных приложений
+CALENDAR_MAX_AGE_SECONDS = int(os.getenv("CALENDAR_MAX_AGE_SECONDS", "300"))
+
+MEDIA_TYPE = "text/calendar; charset=utf-8"
+PRODID = "-//School Bot//Homework deadlines//RU"
+
+# Версии календарей, если кэш ответов выключен
+_versions: Dict[str, bytes] = {}
+
+
+class Feed(NamedTuple):
+    body: bytes
+    etag: str
+    last_modified: datetime
+
+
+def escape(value: Optional[str]) -> str:
+    return (
+        (value or "")
+        .replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\r\n", "\\n")
+        .replace("\n", "\\n")
+    )
+
+
+def fold(line: str) -> str:
+    # Строки длиннее 75 байт переносятся с пробелом в начале продолжения, не разрывая символы UTF-8
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    parts, current, size = [], "", 0
+    for char in line:
+        width = len(char.encode())
+        if size + width > (75 if not parts else 74):
+            parts.append(current)
+            current, size = "", 0
+        current += char
+        size += width
+    parts.append(current)
+    return "\r\n ".join(parts)
+
+
+def _timestamp(value: datetime) -> str:
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+
+def render(name: str, rows: Iterable, tenant: Optional[str]) -> bytes:
+    """rows: (id, title, description, deadline, created_at, version, group_name)."""
+    domain = f"{tenant}.school-bot" if tenant else "school-bot"
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-CALNAME:{escape(name)}",
+    ]
+    for homework_id, title, description, deadline, created_at, version, group_name in rows:
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:homework-{homework_id}@{domain}",
+            # DTSTAMP из данных задания, чтобы содержимое (и ETag) не менялось без изменений
+            f"DTSTAMP:{_timestamp(created_at)}",
+            f"DTSTART:{_timestamp(deadline)}",
+            f"SEQUENCE:{version - 1}",
+            f"SUMMARY:{escape(title)}",
+            f"DESCRIPTION:{escape(description)}",
+            f"CATEGORIES:{escape(group_name)}",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(fold(line) for line in lines) + "\r\n").encode()
+
+
+def _load_version(name: str) -> Optional[bytes]:
+    if response_cache.cache is None:
+        return _versions.get(name)
+    try:
+        return response_cache.cache.backend.get(name)
+    except Exception:
+        response_cache.cache.errors += 1
+        return None
+
+
+def _store_version(name: str, data: bytes) -> None:
+    if response_cache.cache is None:
+        _versions[name] = data
+        return
+    try:
+        response_cache.cache.backend.set(name, data, CALENDAR_VERSION_TTL_SECONDS)
+    except Exception:
+        response_cache.cache.errors += 1
+
+
+def publish(name: str, body: bytes) -> Feed:
+    """Возвращает календарь с ETag и Last-Modified. Last-Modified сохраняется, пока
+    не меняется ETag, и при новом ETag сдвигается только вперед."""
+    etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+    now = datetime.utcnow().replace(microsecond=0)
+    previous = _load_version(name)
+    if previous is not None:
+        previous_etag, previous_modified = previous.decode().split("\n")
+        previous_modified = datetime.fromisoformat(previous_modified)
+        if previous_etag == etag:
+            return Feed(body, etag, previous_modified)
+        now = max(now, previous_modified + timedelta(seconds=1))
+    _store_version(name, f"{etag}\n{now.isoformat()}".encode())
+    return Feed(body, etag, now)
+
+
+def _homeworks_query(cutoff: datetime):
+    return (
+        select(
+            HomeworkModel.id, HomeworkModel.title, HomeworkModel.description, HomeworkModel.deadline,
+            HomeworkModel.created_at, HomeworkModel.version, GroupModel.name,
+        )
+        .join(GroupModel, GroupModel.id == HomeworkModel.group_id)
+        .where(HomeworkModel.deadline >= cutoff)
+        .order_by(HomeworkModel.deadline, HomeworkModel.id)
+    )
+
+
+def load_group_feed(db: Session, group_id: int) -> bytes:
+    name = db.scalar(select(GroupModel.name).where(GroupModel.id == group_id))
+    if name is None:
+        raise HTTPException(status_code=404, detail="Group not found")
+    cutoff = datetime.utcnow() - timedelta(days=CALENDAR_PAST_DAYS)
+    rows = db.execute(_homeworks_query(cutoff).where(HomeworkModel.group_id == group_id))
+    return render(name, rows, tenant_of(db))
+
+
+def load_user_feed(db: Session, user_id: int) -> bytes:
+    full_name = db.scalar(select(UserModel.full_name).where(UserModel.id == user_id))
+    if full_name is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    cutoff = datetime.utcnow() - timedelta(days=CALENDAR_PAST_DAYS)
+    rows = db.execute(
+        _homeworks_query(cutoff)
+        .join(UserGroupModel, UserGroupModel.group_id == HomeworkModel.group_id)
+        .where(UserGroupModel.user_id == user_id)
+    )
+    return render(full_name, rows, tenant_of(db))
+
+
+def _pack(feed: Feed) -> bytes:
+    return f"{feed.etag}\n{feed.last_modified.isoformat()}\n".encode() + feed.body
+
+
+def _unpack(data: bytes) -> Feed:
+    etag, last_modified, body = data.split(b"\n", 2)
+    return Feed(body, etag.decode(), datetime.fromisoformat(last_modified.decode()))
+
+
+def cached_feed(db: Session, key: tuple, tags: Sequence[str], load: Callable[[], bytes]) -> Feed:
+    # Версия календаря не зависит от реплики и набора групп, входящих в ключ кэша
+    name = f"{key[0]}.version:{key[1] or ''}:{key[2]}"
+    if response_cache.cache is None:
+        return publish(name, load())
+    data = response_cache.cache.get_or_load(
+        key[0], key, tags, lambda: _pack(publish(name, load())), tenant_of(db), ttl=CALENDAR_CACHE_TTL_SECONDS
+    )
+    return _unpack(data)
+
+
+def group_feed(db: Session, group_id: int) -> Feed:
+    return cached_feed(
+        db, ("calendar.group", tenant_of(db), group_id, db.info.get("replica")), ["groups", f"group:{group_id}"],
+        lambda: load_group_feed(db, group_id),
+    )
+
+
+def user_feed(db: Session, user_id: int) -> Feed:
+    # Группы пользователя берутся из индекса членства в памяти; индекс заполняется только
+    # из основной базы, поэтому сессия реплики читает группы сама. Смена групп меняет ключ
+    replica = db.info.get("replica")
+    if replica is None:
+        membership = membership_for(db)
+        membership.ensure_loaded(db)
+        groups = membership.groups_of(user_id)
+    else:
+        groups = sorted(db.scalars(select(UserGroupModel.group_id).where(UserGroupModel.user_id == user_id)))
+    return cached_feed(
+        db, ("calendar.user", tenant_of(db), user_id, replica, tuple(groups)),
+        ["users"] + [f"group:{group_id}" for group_id in groups],
+        lambda: load_user_feed(db, user_id),
+    )
+
+
+def not_modified(request: Request, feed: Feed) -> bool:
+    # If-None-Match важнее If-Modified-Since (RFC 9110)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {value[2:] if value.startswith("W/") else value
+                for value in (item.strip() for item in if_none_match.split(","))}
+        return "*" in tags or feed.etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is not None:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        return feed.last_modified <= since
+    return False
+
+
+def feed_response(request: Request, feed: Feed, filename: str) -> Response:
+    headers = {
+        "ETag": feed.etag,
+        "Last-Modified": format_datetime(feed.last_modified.replace(tzinfo=timezone.utc), usegmt=True),
+        "Cache-Control": f"private, max-age={CALENDAR_MAX_AGE_SECONDS}",
+    }
+    if not_modified(request, feed):
+        return Response(status_code=304, headers=headers)
+    headers["Content-Disposition"] = f'inline; filename="{filename}"'
+    return Response(content=feed.body, media_type=MEDIA_TYPE, headers=headers)
@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app import metrics
+from app.database import open_session
+from app.models.idempotency_key import IdempotencyKeyModel
+
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+# Очистка хранилища выполняется раз в столько сохранений
+IDEMPOTENCY_EVICT_EVERY = 100
+
+stats = {"stored": 0, "replayed": 0, "waited": 0}
+metrics.register("idempotency", lambda: dict(stats))
+
+
+def load_response(db: Session, key: str) -> Optional[IdempotencyKeyModel]:
+    cutoff = datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+    return db.scalar(
+        select(IdempotencyKeyModel).where(
+            IdempotencyKeyModel.key == key,
+            IdempotencyKeyModel.created_at >= cutoff,
+        )
+    )
+
+
+def store_response(db: Session, record: dict) -> None:
+    # Ключ, уже сохраненный другим процессом, не перезаписывается; устаревшая запись
+    # с тем же ключом (еще не удаленная evict) заменяется новым ответом
+    cutoff = datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+    db.execute(delete(IdempotencyKeyModel).where(
+        IdempotencyKeyModel.key == record["key"], IdempotencyKeyModel.created_at < cutoff,
+    ))
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    db.execute(dialect.insert(IdempotencyKeyModel.__table__).values(**record).on_conflict_do_nothing())
+    stats["stored"] += 1
+    if stats["stored"] % IDEMPOTENCY_EVICT_EVERY == 0:
+        evict(db)
+    db.commit()
+
+
+def evict(db: Session) -> None:
+    # Удаляем устаревшие ключи и самые старые сверх лимита
+    cutoff = datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_TTL_SECONDS)
+    db.execute(delete(IdempotencyKeyModel).where(IdempotencyKeyModel.created_at < cutoff))
+    overflow = (
+        select(IdempotencyKeyModel.key)
+        .order_by(IdempotencyKeyModel.created_at.desc())
+        .offset(IDEMPOTENCY_MAX_KEYS)
+    )
+    db.execute(delete(IdempotencyKeyModel).where(IdempotencyKeyModel.key.in_(overflow)))
+
+
+class IdempotencyMiddleware:
+    """Повтор POST-запроса с тем же заголовком Idempotency-Key получает
+    сохраненный ответ без повторного выполнения обработчика."""
+
+    def __init__(self, app):
+        self.app = app
+        self._in_flight = {}
+
+    async def __call__(self, scope, receive, send):
+        key = None
+        # Подзапросы /batch не проверяются: ключ относится к пакету целиком
+        is_batch_step = scope.get("state", {}).get("batch")
+        if scope["type"] == "http" and scope["method"] == "POST" and not is_batch_step:
+            key = dict(scope["headers"]).get(b"idempotency-key")
+        if not key:
+            await self.app(scope, receive, send)
+            return
+        key = key.decode("latin-1")
+        # Ключи разных арендаторов не пересекаются
+        tenant = scope.get("state", {}).get("tenant")
+        if tenant is not None:
+            key = f"{tenant}:{key}"
+
+        # Одновременные дубликаты ждут завершения первого запроса. Событие регистрируется
+        # до первого await, иначе дубликаты проходят проверку одновременно
+        while key in self._in_flight:
+            stats["waited"] += 1
+            await self._in_flight[key].wait()
+        done = asyncio.Event()
+        self._in_flight[key] = done
+        try:
+            record = await run_in_threadpool(self._load, scope, key)
+            if record is not None:
+                await self._replay(record, scope, receive, send)
+            else:
+                await self._execute(key, scope, receive, send)
+        finally:
+            self._in_flight.pop(key, None)
+            done.set()
+
+    def _load(self, scope, key):
+        with open_session(scope["app"]) as db:
+            record = load_response(db, key)
+            if record is not None:
+                db.expunge(record)
+            return record
+
+    async def _replay(self, record, scope, receive, send):
+        fingerprint = hashlib.sha256()
+        more_body = True
+        while more_body:
+            message = await receive()
+            fingerprint.update(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        if (
+            record.method != scope["method"]
+            or record.path != scope["path"]
+            # Ключи, сохраненные до появления отпечатка тела, сравниваются без него
+            or record.fingerprint not in (None, fingerprint.hexdigest())
+        ):
+            response = JSONResponse(
+                {"detail": "Idempotency-Key was already used for another request"},
+                status_code=422,
+            )
+        else:
+            stats["replayed"] += 1
+            response = Response(
+                content=record.body,
+                status_code=record.status_code,
+                media_type=record.content_type,
+                headers={"Idempotent-Replayed": "true"},
+            )
+        await response(scope, receive, send)
+
+    async def _execute(self, key, scope, receive, send):
+        captured = {"status": None, "content_type": None, "body": []}
+        # Отпечаток тела запроса считается по мере чтения, без буферизации
+        fingerprint = hashlib.sha256()
+        body_read = {"done": False}
+
+        async def read():
+            message = await receive()
+            if message["type"] == "http.request":
+                fingerprint.update(message.get("body", b""))
+                body_read["done"] = not message.get("more_body", False)
+            return message
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+                captured["content_type"] = dict(message.get("headers", [])).get(b"content-type")
+            elif message["type"] == "http.response.body":
+                captured["body"].append(message.get("body", b""))
+            await send(message)
+
+        await self.app(scope, read, capture)
+        # Обработчик мог ответить, не дочитав тело: отпечаток считается по всему телу
+        while not body_read["done"]:
+            if (await read())["type"] != "http.request":
+                break
+
+        # Ошибки сервера не сохраняем: повтор должен выполниться заново
+        if captured["status"] is None or captured["status"] >= 500:
+            return
+        content_type = captured["content_type"]
+        record = dict(
+            key=key,
+            method=scope["method"],
+            path=scope["path"],
+            fingerprint=fingerprint.hexdigest(),
+            status_code=captured["status"],
+            content_type=content_type.decode("latin-1") if content_type else None,
+            body=b"".join(captured["body"]),
+            created_at=datetime.utcnow(),
+        )
+        await run_in_threadpool(self._store, scope, record)
+
+    def _store(self, scope, record):
+        with open_session(scope["app"]) as db:
+            store_response(db, record)
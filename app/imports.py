@@ -0,0 +1,275 @@
+"""Массовый импорт пользователей, групп и заданий из потока CSV или NDJSON.
+
+Тело запроса читается по частям: в памяти одновременно находится только текущая
+пачка из IMPORT_CHUNK_SIZE строк. Каждая пачка проверяется схемой создания записи
+(UserCreate, GroupCreate, HomeworkCreate) и вставляется одним запросом
+INSERT ... ON CONFLICT DO NOTHING в своей транзакции.
+"""
+import codecs
+import csv
+import json
+import os
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app import group_stats
+from app.cache import invalidate
+from app.database import tenant_of
+from app.models.group import GroupModel
+from app.models.homework import HomeworkModel
+from app.models.user import UserModel, fold
+from app.schemas.group import GroupCreate
+from app.schemas.homework import HomeworkCreate
+from app.schemas.user import UserCreate
+from app.singleflight import reads
+
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+# Ошибок в отчете не больше этого числа; счетчики учитывают все строки
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "100"))
+
+FORMATS = {
+    "text/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+}
+
+# Сущность -> (схема, модель, уникальный столбец и сообщение о дубликате как у POST)
+ENTITIES = {
+    "users": (UserCreate, UserModel, "telegram_id", "User already exists"),
+    "groups": (GroupCreate, GroupModel, "name", "Group already exists"),
+    "homeworks": (HomeworkCreate, HomeworkModel, None, None),
+}
+
+
+def detect_format(content_type: Optional[str], requested: Optional[str]) -> Optional[str]:
+    if requested:
+        return requested if requested in ("csv", "ndjson") else None
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return FORMATS.get(media_type)
+
+
+class ImportReport:
+    def __init__(self, entity: str, max_errors: Optional[int] = None):
+        self.entity = entity
+        self.max_errors = IMPORT_MAX_ERRORS if max_errors is None else max_errors
+        self.rows = 0
+        self.inserted = 0
+        self.skipped = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+        self.errors_truncated = False
+        # Затронутые группы (для статистики и инвалидации кэша списков заданий)
+        self.groups: Set[int] = set()
+
+    def error(self, row: int, message: str, skipped: bool = False) -> None:
+        if skipped:
+            self.skipped += 1
+        else:
+            self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"row": row, "error": message})
+        else:
+            self.errors_truncated = True
+
+    def result(self) -> dict:
+        return {
+            "entity": self.entity,
+            "rows": self.rows,
+            "inserted": self.inserted,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            # Ошибки разбора попадают в отчет сразу, ошибки проверки - после пачки
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+            "errors_truncated": self.errors_truncated,
+        }
+
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """Строки CSV (первая строка - заголовок) как словари; пустые значения - None."""
+    header = None
+    record = ""
+    number = 0
+    async for line in _lines(chunks):
+        record = f"{record}\n{line}" if record else line
+        # Перевод строки внутри кавычек не завершает запись
+        if record.count('"') % 2:
+            continue
+        line, record = record, ""
+        if not line.strip():
+            continue
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        number += 1
+        if len(values) != len(header):
+            yield number, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield number, {name: value if value != "" else None for name, value in zip(header, values)}
+    if record:
+        yield number + 1, "Unterminated quoted field"
+
+
+async def ndjson_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    number = 0
+    async for line in _lines(chunks):
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            data = json.loads(line)
+        except ValueError as exc:
+            yield number, f"Invalid JSON: {exc}"
+            continue
+        if not isinstance(data, dict):
+            yield number, "Row must be a JSON object"
+            continue
+        yield number, data
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in exc.errors())
+
+
+def _values(entity: str, item, now: datetime) -> dict:
+    values = {**item.model_dump(), "created_at": now, "version": 1}
+    if entity == "users":
+        # Bulk INSERT минует валидаторы модели, поэтому поля поиска заполняются здесь
+        values["username_folded"] = fold(item.username)
+        values["full_name_folded"] = fold(item.full_name)
+    return values
+
+
+def insert_chunk(db: Session, entity: str, rows: List[Tuple[int, dict]], report: ImportReport) -> None:
+    """Проверяет и вставляет пачку строк в одной транзакции; если вставка не удалась,
+    ошибку получают только строки, которые не вставляются по отдельности."""
+    schema, _, key, duplicate = ENTITIES[entity]
+    now = datetime.utcnow()
+    items: List[Tuple[int, Any]] = []
+    seen = set()
+    for number, data in rows:
+        try:
+            item = schema(**data)
+        except ValidationError as exc:
+            report.error(number, _validation_message(exc))
+            continue
+        if key is not None:
+            # Повтор внутри пачки - такой же дубликат, как существующая запись
+            value = getattr(item, key)
+            if value in seen:
+                report.error(number, duplicate, skipped=True)
+                continue
+            seen.add(value)
+        items.append((number, item))
+
+    if entity == "homeworks" and items:
+        group_ids = {item.group_id for _, item in items}
+        existing = set(db.scalars(select(GroupModel.id).where(GroupModel.id.in_(group_ids))))
+        for number, item in items:
+            if item.group_id not in existing:
+                report.error(number, "Group not found")
+        items = [(number, item) for number, item in items if item.group_id in existing]
+    if not items:
+        return
+
+    _insert_items(db, entity, items, now, report)
+
+
+def _insert_items(db: Session, entity: str, items: List[Tuple[int, Any]], now: datetime,
+                  report: ImportReport) -> None:
+    _, model, key, duplicate = ENTITIES[entity]
+    table = model.__table__
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(table)
+    if key is not None:
+        statement = statement.on_conflict_do_nothing(index_elements=[table.c[key]])
+    returned = table.c[key] if key is not None else table.c.group_id
+    try:
+        # Список параметров: один скомпилированный INSERT, строки пачками (insertmanyvalues)
+        inserted = db.execute(
+            statement.returning(table.c.id, returned), [_values(entity, item, now) for _, item in items]
+        ).all()
+        if entity == "groups":
+            group_stats.groups_created(db, [row[0] for row in inserted])
+        elif entity == "homeworks":
+            counts: Dict[int, int] = {}
+            for _, group_id in inserted:
+                counts[group_id] = counts.get(group_id, 0) + 1
+            group_stats.homeworks_imported(db, counts)
+            report.groups.update(counts)
+        db.commit()
+    except SQLAlchemyError as exc:
+        db.rollback()
+        if len(items) == 1:
+            report.error(items[0][0], f"Insert failed: {exc.__class__.__name__}")
+            return
+        # Пачка делится пополам, пока ошибка не сведется к одной строке: остальные строки вставляются
+        middle = len(items) // 2
+        _insert_items(db, entity, items[:middle], now, report)
+        _insert_items(db, entity, items[middle:], now, report)
+        return
+
+    report.inserted += len(inserted)
+    if key is not None:
+        added = {row[1] for row in inserted}
+        for number, item in items:
+            if getattr(item, key) not in added:
+                report.error(number, duplicate, skipped=True)
+
+
+def forget_imported(db: Session, report: ImportReport) -> None:
+    if not report.inserted:
+        return
+    if report.entity == "users":
+        invalidate(db, "users")
+    elif report.entity == "groups":
+        invalidate(db, "groups")
+    else:
+        tenant = tenant_of(db)
+        for group_id in report.groups:
+            reads.forget(("homeworks.group", tenant, group_id))
+        invalidate(db, *(f"group:{group_id}" for group_id in report.groups))
+
+
+async def import_stream(db: Session, entity: str, data_format: str, chunks: AsyncIterator[bytes],
+                        chunk_size: Optional[int] = None) -> dict:
+    """Импортирует строки из потока и возвращает отчет с ошибками по номерам строк."""
+    chunk_size = chunk_size or IMPORT_CHUNK_SIZE
+    report = ImportReport(entity)
+    parse = csv_rows if data_format == "csv" else ndjson_rows
+    pending: List[Tuple[int, dict]] = []
+    async for number, data in parse(chunks):
+        report.rows += 1
+        if isinstance(data, str):
+            report.error(number, data)
+            continue
+        pending.append((number, data))
+        if len(pending) >= chunk_size:
+            # Проверка и запись - в пуле потоков, цикл событий продолжает обслуживать запросы
+            await run_in_threadpool(insert_chunk, db, entity, pending, report)
+            pending = []
+    if pending:
+        await run_in_threadpool(insert_chunk, db, entity, pending, report)
+    await run_in_threadpool(forget_imported, db, report)
+    return report.result()
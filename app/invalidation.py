@@ -0,0 +1,142 @@
+import os
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from app import metrics
+from app.models.cache_version import CacheVersionModel
+
+# Период опроса версий другими процессами; 0 - опрос выключен (один процесс)
+INVALIDATION_POLL_MS = float(os.getenv("INVALIDATION_POLL_MS", "0"))
+
+
+class InvalidationBus:
+    """Инвалидация локальных кэшей между процессами через таблицу cache_versions.
+
+    Запись увеличивает версию кэша в той же транзакции, что и изменение данных.
+    Каждый процесс периодически читает версии и вызывает подписчиков для кэшей,
+    версия которых изменилась не им самим.
+    """
+
+    def __init__(self, poll_ms: float = INVALIDATION_POLL_MS):
+        self.poll_interval = poll_ms / 1000
+        self._subscribers: Dict[str, List[Callable[[], None]]] = defaultdict(list)
+        self._seen: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        # Опрашиваемые базы: основная и базы арендаторов (по URL движка)
+        self._engines: Dict[str, Engine] = {}
+        self._data_versions: Dict[str, int] = {}
+        self.polls = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    def subscribe(self, name: str, callback: Callable[[], None]) -> None:
+        self._subscribers[name].append(callback)
+
+    def publish(self, session: Session, name: str) -> int:
+        """Увеличивает версию кэша в транзакции сессии и возвращает новую версию."""
+        dialect = postgresql if session.get_bind().dialect.name == "postgresql" else sqlite
+        table = CacheVersionModel.__table__
+        statement = dialect.insert(table).values(name=name, version=1)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.name], set_={"version": table.c.version + 1}
+        )
+        session.execute(statement)
+        return session.scalar(select(table.c.version).where(table.c.name == name))
+
+    def acknowledge(self, name: str, version: int) -> None:
+        # Собственное изменение уже применено локально; если между ним и прошлой
+        # известной версией были чужие изменения, версия не сдвигается и опрос их увидит
+        with self._lock:
+            if self._seen.get(name) == version - 1:
+                self._seen[name] = version
+
+    def poll(self, connection: Connection) -> List[str]:
+        """Читает версии и инвалидирует изменившиеся кэши; возвращает их имена."""
+        self.polls += 1
+        if connection.dialect.name == "sqlite":
+            # data_version меняется только при фиксации транзакций другими соединениями
+            key = str(connection.engine.url)
+            data_version = connection.exec_driver_sql("PRAGMA data_version").scalar()
+            if data_version == self._data_versions.get(key):
+                return []
+            self._data_versions[key] = data_version
+        rows = connection.execute(select(CacheVersionModel.name, CacheVersionModel.version)).all()
+        changed = []
+        with self._lock:
+            for name, version in rows:
+                if self._seen.get(name) != version:
+                    self._seen[name] = version
+                    changed.append(name)
+        for name in changed:
+            self.invalidations += 1
+            for callback in self._subscribers.get(name, []):
+                callback()
+        return changed
+
+    def watch(self, engine: Engine) -> None:
+        with self._lock:
+            self._engines[str(engine.url)] = engine
+
+    def unwatch(self, engine: Engine) -> None:
+        with self._lock:
+            self._engines.pop(str(engine.url), None)
+
+    def start(self, engine: Engine) -> None:
+        self.watch(engine)
+        if self.poll_interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="invalidation-bus", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def _run(self) -> None:
+        # data_version сравнивается в пределах одного соединения, поэтому соединения постоянные
+        connections = {}
+        try:
+            while not self._stop.wait(self.poll_interval):
+                with self._lock:
+                    engines = dict(self._engines)
+                for key in set(connections) - set(engines):
+                    connections.pop(key).close()
+                    self._data_versions.pop(key, None)
+                for key, engine in engines.items():
+                    try:
+                        if key not in connections:
+                            connections[key] = engine.connect()
+                        self.poll(connections[key])
+                        connections[key].rollback()
+                    except Exception:
+                        self.errors += 1
+                        connection = connections.pop(key, None)
+                        if connection is not None:
+                            connection.close()
+        finally:
+            for connection in connections.values():
+                connection.close()
+
+    def stats(self) -> dict:
+        return {
+            "polls": self.polls,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+            "databases": len(self._engines),
+            "versions": dict(self._seen),
+        }
+
+
+bus = InvalidationBus()
+metrics.register("invalidation", bus.stats)
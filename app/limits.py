@@ -0,0 +1,127 @@
+import asyncio
+import os
+from collections import deque
+
+from fastapi.responses import JSONResponse
+
+from app import metrics
+
+RETRY_AFTER_SECONDS = int(os.getenv("LIMIT_RETRY_AFTER", "1"))
+
+# Пути, которые не ограничиваются (наблюдаемость нужна именно под нагрузкой)
+EXEMPT_PATHS = ("/metrics",)
+
+# Долгие выгрузки (содержимое файлов, календари) не занимают слоты обычных чтений
+EXPORT_SUFFIXES = ("/content", "/calendar.ics")
+
+
+class RouteLimiter:
+    """Ограничение числа одновременных запросов с ограниченной очередью ожидания."""
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, queue_timeout_ms: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout_ms / 1000
+        self.active = 0
+        self.shed = 0
+        self.timed_out = 0
+        self._waiters = deque()
+
+    async def acquire(self) -> bool:
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            return True
+        if len(self._waiters) >= self.queue_size:
+            self.shed += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # Слот передается ожидающему в release(), счетчик active не меняется
+            await asyncio.wait_for(waiter, self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            self.shed += 1
+            return False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self) -> None:
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": len(self._waiters),
+            "shed": self.shed,
+            "timed_out": self.timed_out,
+        }
+
+
+def _limiter(name: str, concurrency: int, queue_size: int, queue_timeout_ms: int) -> RouteLimiter:
+    prefix = f"LIMIT_{name.upper()}_"
+    return RouteLimiter(
+        name,
+        concurrency=int(os.getenv(prefix + "CONCURRENCY", concurrency)),
+        queue_size=int(os.getenv(prefix + "QUEUE", queue_size)),
+        queue_timeout_ms=float(os.getenv(prefix + "QUEUE_TIMEOUT_MS", queue_timeout_ms)),
+    )
+
+
+# Классы маршрутов: чтение, запись и выгрузка ограничиваются независимо,
+# поэтому всплеск записей не вытесняет чтения (например, /users/telegram/{id})
+limiters = {
+    "read": _limiter("read", concurrency=32, queue_size=256, queue_timeout_ms=2000),
+    "write": _limiter("write", concurrency=8, queue_size=128, queue_timeout_ms=5000),
+    "export": _limiter("export", concurrency=4, queue_size=32, queue_timeout_ms=10000),
+}
+
+metrics.register("limits", lambda: {name: limiter.stats() for name, limiter in limiters.items()})
+
+
+def classify(method: str, path: str) -> str:
+    if method in ("GET", "HEAD", "OPTIONS"):
+        return "export" if path.endswith(EXPORT_SUFFIXES) else "read"
+    return "write"
+
+
+class ConcurrencyLimitMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["path"] in EXEMPT_PATHS
+            or scope.get("state", {}).get("batch")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        limiter = limiters[classify(scope["method"], scope["path"])]
+        if not await limiter.acquire():
+            response = JSONResponse(
+                {"detail": "Server is overloaded, retry later"},
+                status_code=503,
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
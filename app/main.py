@@ -1,28 +1,68 @@
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from app import metrics
 from app.database import engine, Base
-from app.routes import users, groups, homeworks, attachments, user_groups
+from app.idempotency import IdempotencyMiddleware
+from app.invalidation import bus
+from app.limits import ConcurrencyLimitMiddleware
+from app.maintenance import scheduler
+from app.replicas import StickyWriteMiddleware
+from app.routes import users, groups, homeworks, attachments, user_groups, batch, search, admin, imports
+from app.tenants import TenantMiddleware
 
-# Пересоздаем таблицы
-Base.metadata.drop_all(bind=engine)
+# Пересоздаем таблицы; RESET_DB_ON_STARTUP=0 сохраняет данные (app.server готовит
+# схему один раз до запуска рабочих процессов и сбрасывает флаг для них)
+RESET_DB_ON_STARTUP = os.getenv("RESET_DB_ON_STARTUP", "1") == "1"
+if RESET_DB_ON_STARTUP:
+    Base.metadata.drop_all(bind=engine)
 Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Опрос версий кэшей других процессов (при INVALIDATION_POLL_MS > 0)
+    bus.start(engine)
+    # ANALYZE, incremental_vacuum и сброс WAL в периоды малой нагрузки
+    scheduler.start(engine)
+    yield
+    scheduler.stop()
+    bus.stop()
+
 app = FastAPI(
     title="School Bot API",
     description="REST API для Telegram бота школы программирования",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+# Время записи передается клиенту, чтобы любой рабочий процесс читал его записи из основной базы
+app.add_middleware(StickyWriteMiddleware)
+# Ограничиваем число одновременных запросов по классам маршрутов
+app.add_middleware(ConcurrencyLimitMiddleware)
+# Повторы POST-запросов с заголовком Idempotency-Key отвечаются из хранилища
+app.add_middleware(IdempotencyMiddleware)
+# Школа (арендатор) определяется до остальных middleware: ключи идемпотентности зависят от нее
+app.add_middleware(TenantMiddleware)
+
 # Подключаем роуты
 app.include_router(users.router)
 app.include_router(groups.router)
 app.include_router(homeworks.router)
 app.include_router(attachments.router)
 app.include_router(user_groups.router)
+app.include_router(batch.router)
+app.include_router(search.router)
+app.include_router(admin.router)
+app.include_router(imports.router)
 
 @app.get("/")
 def read_root():
     return {"message": "School Bot API is running!"}
 
+@app.get("/metrics")
+def read_metrics():
+    return metrics.snapshot()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,233 @@
+"""Обслуживание баз SQLite в фоне: статистика планировщика, возврат свободных страниц,
+сброс журнала WAL.
+
+Планировщик запускается вместе с приложением и раз в MAINTENANCE_INTERVAL_SECONDS
+обходит основную базу и открытые базы школ, когда запросов мало (активных запросов
+во всех классах ограничений не больше MAINTENANCE_MAX_ACTIVE). Под нагрузкой запуск
+откладывается, а начатый прерывается между шагами.
+"""
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy.engine import Engine
+
+from app import metrics
+from app.limits import limiters
+
+# 0 - обслуживание по расписанию выключено (запуск через POST /admin/maintenance)
+MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("MAINTENANCE_INTERVAL_SECONDS", "3600"))
+# Как часто проверяется, наступило ли время и мала ли нагрузка
+MAINTENANCE_CHECK_SECONDS = float(os.getenv("MAINTENANCE_CHECK_SECONDS", "30"))
+MAINTENANCE_MAX_ACTIVE = int(os.getenv("MAINTENANCE_MAX_ACTIVE", "2"))
+# Часы (местное время), в которые разрешен запуск по расписанию, например "1-5"; пусто - любые
+MAINTENANCE_HOURS = os.getenv("MAINTENANCE_HOURS", "")
+# Страниц, возвращаемых одним вызовом incremental_vacuum
+MAINTENANCE_VACUUM_PAGES = int(os.getenv("MAINTENANCE_VACUUM_PAGES", "1000"))
+# Строк индекса, просматриваемых ANALYZE (PRAGMA analysis_limit)
+MAINTENANCE_ANALYSIS_LIMIT = int(os.getenv("MAINTENANCE_ANALYSIS_LIMIT", "1000"))
+# Ожидание блокировок обслуживанием: оно уступает запросам, а не ждет их
+MAINTENANCE_BUSY_TIMEOUT_MS = int(os.getenv("MAINTENANCE_BUSY_TIMEOUT_MS", "100"))
+MAINTENANCE_REPORTS = int(os.getenv("MAINTENANCE_REPORTS", "20"))
+MAIN_DATABASE = "main"
+
+
+def current_load() -> int:
+    # Счетчики ограничителей меняются в цикле событий; здесь достаточно приблизительного значения
+    return sum(limiter.active + len(limiter._waiters) for limiter in limiters.values())
+
+
+def parse_hours(value: str) -> Optional[Set[int]]:
+    if not value.strip():
+        return None
+    start, _, end = value.partition("-")
+    start = int(start)
+    end = int(end or start)
+    # Окно через полночь, например "22-3"
+    return set(range(start, end + 1)) if start <= end else {*range(start, 24), *range(0, end + 1)}
+
+
+class Busy(Exception):
+    pass
+
+
+class MaintenanceScheduler:
+    """Периодическое обслуживание баз SQLite с отчетами о каждом обходе."""
+
+    def __init__(self, interval_seconds: float = MAINTENANCE_INTERVAL_SECONDS,
+                 check_seconds: float = MAINTENANCE_CHECK_SECONDS, max_active: int = MAINTENANCE_MAX_ACTIVE,
+                 hours: str = MAINTENANCE_HOURS, load: Callable[[], int] = current_load):
+        self.interval = interval_seconds
+        self.check_interval = min(check_seconds, interval_seconds) if interval_seconds > 0 else check_seconds
+        self.max_active = max_active
+        self.hours = parse_hours(hours)
+        self.load = load
+        self.reports = deque(maxlen=MAINTENANCE_REPORTS)
+        # Обслуживаемые базы: имя (main или школа) -> движок
+        self._engines: Dict[str, Engine] = {}
+        self._lock = threading.Lock()
+        # Одновременно выполняется один обход (по расписанию или по запросу)
+        self._running = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._due = 0.0
+        self.runs = 0
+        self.deferred = 0
+        self.errors = 0
+
+    def watch(self, name: str, engine: Engine) -> None:
+        if engine.dialect.name != "sqlite":
+            return
+        with self._lock:
+            self._engines[name] = engine
+
+    def unwatch(self, name: str) -> None:
+        with self._lock:
+            self._engines.pop(name, None)
+
+    def idle(self) -> bool:
+        return self.load() <= self.max_active
+
+    def in_window(self) -> bool:
+        return self.hours is None or datetime.now().hour in self.hours
+
+    def _check(self, force: bool) -> None:
+        if not force and not self.idle():
+            raise Busy()
+
+    def _maintain(self, engine: Engine, force: bool) -> dict:
+        report = {}
+        raw = engine.raw_connection()
+        connection = raw.driver_connection
+        # PRAGMA и ANALYZE выполняются вне транзакции драйвера, фиксировать их не нужно
+        busy_timeout = connection.execute("PRAGMA busy_timeout").fetchone()[0]
+        connection.execute(f"PRAGMA busy_timeout = {MAINTENANCE_BUSY_TIMEOUT_MS}")
+        try:
+            # ANALYZE при первом обслуживании, затем PRAGMA optimize (только устаревшая статистика)
+            connection.execute(f"PRAGMA analysis_limit = {MAINTENANCE_ANALYSIS_LIMIT}")
+            has_stats = connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            ).fetchone() is not None
+            started = time.perf_counter()
+            connection.execute("PRAGMA optimize" if has_stats else "ANALYZE")
+            report["analyze"] = {
+                "mode": "optimize" if has_stats else "analyze",
+                "ms": round((time.perf_counter() - started) * 1000, 1),
+            }
+
+            self._check(force)
+            auto_vacuum = connection.execute("PRAGMA auto_vacuum").fetchone()[0]
+            free_before = connection.execute("PRAGMA freelist_count").fetchone()[0]
+            vacuum = {"free_pages": free_before, "released": 0}
+            if auto_vacuum != 2:
+                vacuum["skipped"] = "auto_vacuum is not incremental"
+            else:
+                free = free_before
+                while free > 0:
+                    # Пачками, чтобы не держать блокировку записи долго; страницы
+                    # возвращаются по мере чтения результата
+                    connection.execute(f"PRAGMA incremental_vacuum({MAINTENANCE_VACUUM_PAGES})").fetchall()
+                    remaining = connection.execute("PRAGMA freelist_count").fetchone()[0]
+                    if remaining >= free:
+                        break
+                    free = remaining
+                    vacuum["released"] = free_before - free
+                    self._check(force)
+            report["incremental_vacuum"] = vacuum
+
+            self._check(force)
+            if connection.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal":
+                # PASSIVE переносит страницы без блокировок, TRUNCATE - остаток и обнуляет файл журнала
+                connection.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+                busy, log, checkpointed = connection.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+                report["wal_checkpoint"] = {"busy": bool(busy), "log_pages": log, "checkpointed": checkpointed}
+            else:
+                report["wal_checkpoint"] = {"skipped": "journal_mode is not wal"}
+        finally:
+            connection.execute(f"PRAGMA busy_timeout = {busy_timeout}")
+            raw.close()
+        return report
+
+    def run(self, trigger: str = "manual", force: bool = True) -> dict:
+        """Обслуживает все базы и возвращает отчет; force - не смотреть на нагрузку."""
+        with self._running:
+            started = time.perf_counter()
+            report = {
+                "started_at": datetime.utcnow(),
+                "trigger": trigger,
+                "load": self.load(),
+                "completed": True,
+                "databases": {},
+            }
+            with self._lock:
+                engines = dict(self._engines)
+            for name, engine in engines.items():
+                try:
+                    self._check(force)
+                    report["databases"][name] = self._maintain(engine, force)
+                except Busy:
+                    report["completed"] = False
+                    report["databases"][name] = {"deferred": "load"}
+                    break
+                except Exception as exc:
+                    self.errors += 1
+                    report["databases"][name] = {"error": str(exc)}
+            report["seconds"] = round(time.perf_counter() - started, 3)
+            self.runs += 1
+            self.reports.appendleft(report)
+            return report
+
+    def tick(self) -> Optional[dict]:
+        """Запускает обход, если подошло время, разрешен час и нагрузка мала."""
+        if time.monotonic() < self._due or not self.in_window():
+            return None
+        if not self.idle():
+            self.deferred += 1
+            return None
+        report = self.run("schedule", force=False)
+        # Прерванный из-за нагрузки обход повторяется при следующей проверке
+        if report["completed"]:
+            self._due = time.monotonic() + self.interval
+        return report
+
+    def start(self, engine: Engine) -> None:
+        self.watch(MAIN_DATABASE, engine)
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._due = time.monotonic() + self.interval
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.tick()
+            except Exception:
+                self.errors += 1
+
+    def stats(self) -> dict:
+        last = self.reports[0] if self.reports else None
+        return {
+            "runs": self.runs,
+            "deferred": self.deferred,
+            "errors": self.errors,
+            "databases": sorted(self._engines),
+            "last_run": last["started_at"].isoformat() if last else None,
+        }
+
+    def history(self) -> List[dict]:
+        return list(self.reports)
+
+
+scheduler = MaintenanceScheduler()
+metrics.register("maintenance", scheduler.stats)
@@ -0,0 +1,129 @@
+import threading
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app import metrics
+from app.invalidation import bus
+from app.models.user_group import UserGroupModel
+
+MEMBERSHIP_CACHE = "membership"
+
+# Чем выше ранг, тем больше прав; роль с большим рангом включает права меньших
+ROLE_RANK = {"member": 0, "student": 0, "teacher": 1, "admin": 2}
+
+
+def role_satisfies(role: Optional[str], required_role: Optional[str]) -> bool:
+    if role is None:
+        return False
+    if required_role is None or role == required_role:
+        return True
+    if role in ROLE_RANK and required_role in ROLE_RANK:
+        return ROLE_RANK[role] >= ROLE_RANK[required_role]
+    return False
+
+
+class MembershipIndex:
+    """Членство пользователей в группах в памяти: группа -> {пользователь -> роль}.
+
+    Загружается из user_groups при первой проверке и далее обновляется
+    обработчиками записи; изменения из других процессов приходят через bus.
+    """
+
+    def __init__(self, cache_name: str = MEMBERSHIP_CACHE):
+        self.cache_name = cache_name
+        self._groups: Dict[int, Dict[int, str]] = {}
+        self._loaded = False
+        # Изменения во время загрузки делают загруженный снимок устаревшим
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.checks = 0
+
+    def ensure_loaded(self, db: Session) -> None:
+        if self._loaded:
+            return
+        generation = self._generation
+        rows = db.execute(select(UserGroupModel.group_id, UserGroupModel.user_id, UserGroupModel.user_role)).all()
+        groups = {}
+        for group_id, user_id, role in rows:
+            groups.setdefault(group_id, {})[user_id] = role
+        with self._lock:
+            self._groups = groups
+            self._loaded = self._generation == generation
+            self.loads += 1
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._groups = {}
+            self._loaded = False
+            self._generation += 1
+
+    def role(self, user_id: int, group_id: int) -> Optional[str]:
+        self.checks += 1
+        return self._groups.get(group_id, {}).get(user_id)
+
+    def groups_of(self, user_id: int) -> List[int]:
+        return sorted(group_id for group_id, members in list(self._groups.items()) if user_id in members)
+
+    def set(self, user_id: int, group_id: int, role: str) -> None:
+        with self._lock:
+            self._generation += 1
+            self._groups.setdefault(group_id, {})[user_id] = role
+
+    def remove(self, user_id: int, group_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            self._groups.get(group_id, {}).pop(user_id, None)
+
+    def remove_group(self, group_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            self._groups.pop(group_id, None)
+
+    def remove_user(self, user_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            for members in self._groups.values():
+                members.pop(user_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self._loaded,
+            "loads": self.loads,
+            "checks": self.checks,
+            "groups": len(self._groups),
+            "memberships": sum(len(members) for members in self._groups.values()),
+        }
+
+
+membership = MembershipIndex()
+bus.subscribe(MEMBERSHIP_CACHE, membership.invalidate)
+metrics.register("membership", membership.stats)
+
+# У каждого арендатора своя база и свой индекс членства
+_tenant_indexes: Dict[str, MembershipIndex] = {}
+_tenant_indexes_lock = threading.Lock()
+
+
+def membership_for(db: Session) -> MembershipIndex:
+    """Индекс членства для базы, к которой привязана сессия."""
+    tenant = db.info.get("tenant")
+    if tenant is None:
+        return membership
+    with _tenant_indexes_lock:
+        index = _tenant_indexes.get(tenant)
+        if index is None:
+            index = MembershipIndex(f"{MEMBERSHIP_CACHE}:{tenant}")
+            bus.subscribe(index.cache_name, index.invalidate)
+            _tenant_indexes[tenant] = index
+        return index
+
+
+def forget_tenant(tenant: str) -> None:
+    # База арендатора больше не опрашивается шиной: индекс загрузится заново при следующей проверке
+    with _tenant_indexes_lock:
+        index = _tenant_indexes.get(tenant)
+    if index is not None:
+        index.invalidate()
@@ -0,0 +1,12 @@
+from typing import Callable, Dict
+
+# Реестр источников метрик: имя -> функция, возвращающая словарь счетчиков
+_sources: Dict[str, Callable[[], dict]] = {}
+
+
+def register(name: str, source: Callable[[], dict]) -> None:
+    _sources[name] = source
+
+
+def snapshot() -> dict:
+    return {name: source() for name, source in _sources.items()}
@@ -0,0 +1,229 @@
+"""Миграции существующих баз данных.
+
+Запуск: python -m app.migrations [DATABASE_URL]
+"""
+import sys
+
+from sqlalchemy import Table, create_engine, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.schema import CreateTable
+
+from app.database import SQLALCHEMY_DATABASE_URL
+from app import group_stats, search
+from app.models.archive import AttachmentArchiveModel, HomeworkArchiveModel
+from app.models.attachment import AttachmentModel
+from app.models.file import FileModel
+from app.models.group_stats import GroupStatsModel
+from app.models.homework import HomeworkModel
+from app.models.user import fold
+
+
+def rebuild_table(connection: Connection, table: Table) -> None:
+    """Пересоздает таблицу SQLite по описанию модели с переносом строк.
+
+    SQLite не изменяет ограничения существующих столбцов (NOT NULL, AUTOINCREMENT), поэтому
+    таблица создается заново под временным именем. Переносятся столбцы, общие для старой
+    таблицы и модели; индексы и триггеры старой таблицы создаются заново.
+    """
+    name = table.name
+    rebuilt = f"{name}_rebuild"
+    columns = {column["name"] for column in inspect(connection).get_columns(name)}
+    columns = ", ".join(f'"{column.name}"' for column in table.columns if column.name in columns)
+    # Индексы и триггеры удаляются вместе с таблицей
+    dependents = connection.execute(text(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = :name AND type IN ('index', 'trigger') "
+        "AND sql IS NOT NULL ORDER BY type"
+    ), {"name": name}).scalars().all()
+
+    create = str(CreateTable(table).compile(connection)).strip()
+    connection.execute(text(create.replace(f"CREATE TABLE {name} ", f"CREATE TABLE {rebuilt} ", 1)))
+    connection.execute(text(f'INSERT INTO {rebuilt} ({columns}) SELECT {columns} FROM "{name}"'))
+    connection.execute(text(f'DROP TABLE "{name}"'))
+    connection.execute(text(f'ALTER TABLE {rebuilt} RENAME TO "{name}"'))
+    for statement in dependents:
+        connection.execute(text(statement))
+    for index in table.indexes:
+        index.create(connection, checkfirst=True)
+
+
+def dedupe_attachment_files(connection: Connection) -> dict:
+    """Переносит file_id из attachments в таблицу files, по одной записи на файл."""
+    inspector = inspect(connection)
+    if not inspector.has_table("attachments"):
+        return {"migrated": False}
+    columns = {column["name"] for column in inspector.get_columns("attachments")}
+    if "file_ref_id" in columns:
+        return {"migrated": False}
+
+    FileModel.__table__.create(connection, checkfirst=True)
+    connection.execute(text(
+        "INSERT INTO files (file_id, created_at) "
+        "SELECT file_id, MIN(uploaded_at) FROM attachments GROUP BY file_id"
+    ))
+    connection.execute(text("ALTER TABLE attachments ADD COLUMN file_ref_id INTEGER REFERENCES files (id)"))
+    connection.execute(text(
+        "UPDATE attachments SET file_ref_id = "
+        "(SELECT files.id FROM files WHERE files.file_id = attachments.file_id)"
+    ))
+    for index in inspect(connection).get_indexes("attachments"):
+        if "file_id" in index["column_names"]:
+            connection.execute(text(f'DROP INDEX "{index["name"]}"'))
+    if connection.dialect.name == "sqlite":
+        # Пересборка удаляет file_id и делает file_ref_id NOT NULL, как в новой базе
+        rebuild_table(connection, AttachmentModel.__table__)
+    else:
+        connection.execute(text("ALTER TABLE attachments DROP COLUMN file_id"))
+        connection.execute(text("ALTER TABLE attachments ALTER COLUMN file_ref_id SET NOT NULL"))
+        connection.execute(text("CREATE INDEX ix_attachments_file_ref_id ON attachments (file_ref_id)"))
+
+    return {
+        "migrated": True,
+        "attachments": connection.scalar(text("SELECT COUNT(*) FROM attachments")),
+        "files": connection.scalar(text("SELECT COUNT(*) FROM files")),
+    }
+
+
+def add_user_search_columns(connection: Connection) -> dict:
+    """Добавляет в users нормализованные столбцы для поиска по префиксу и заполняет их."""
+    inspector = inspect(connection)
+    if not inspector.has_table("users"):
+        return {"migrated": False}
+    columns = {column["name"] for column in inspector.get_columns("users")}
+    if "full_name_folded" in columns:
+        return {"migrated": False}
+
+    connection.execute(text("ALTER TABLE users ADD COLUMN username_folded VARCHAR(100)"))
+    connection.execute(text("ALTER TABLE users ADD COLUMN full_name_folded VARCHAR(200)"))
+    # lower() в SQLite не работает с кириллицей, поэтому значения вычисляются в Python
+    users = connection.execute(text("SELECT id, username, full_name FROM users")).all()
+    if users:
+        connection.execute(
+            text("UPDATE users SET username_folded = :username, full_name_folded = :full_name WHERE id = :id"),
+            [{"id": user.id, "username": fold(user.username), "full_name": fold(user.full_name)} for user in users],
+        )
+    connection.execute(text("CREATE INDEX ix_users_username_folded ON users (username_folded)"))
+    connection.execute(text("CREATE INDEX ix_users_full_name_folded ON users (full_name_folded)"))
+    return {"migrated": True, "users": len(users)}
+
+
+def create_group_stats(connection: Connection) -> dict:
+    """Создает таблицу group_stats и заполняет ее по текущим данным."""
+    inspector = inspect(connection)
+    required = ("groups", "homeworks", "user_groups")
+    if inspector.has_table("group_stats") or not all(inspector.has_table(name) for name in required):
+        return {"migrated": False}
+
+    GroupStatsModel.__table__.create(connection)
+    connection.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_homeworks_group_deadline ON homeworks (group_id, deadline)"
+    ))
+    return {"migrated": True, "groups": group_stats.rebuild(connection)}
+
+
+def add_version_columns(connection: Connection) -> dict:
+    """Добавляет столбец version (оптимистичная блокировка) в изменяемые через PUT таблицы."""
+    inspector = inspect(connection)
+    migrated = []
+    for table in ("users", "groups", "homeworks", "attachments"):
+        if not inspector.has_table(table):
+            continue
+        if "version" in {column["name"] for column in inspector.get_columns(table)}:
+            continue
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+        migrated.append(table)
+    return {"migrated": bool(migrated), "tables": migrated}
+
+
+def add_idempotency_fingerprint(connection: Connection) -> dict:
+    """Добавляет в idempotency_keys отпечаток тела запроса."""
+    inspector = inspect(connection)
+    if not inspector.has_table("idempotency_keys"):
+        return {"migrated": False}
+    if "fingerprint" in {column["name"] for column in inspector.get_columns("idempotency_keys")}:
+        return {"migrated": False}
+    connection.execute(text("ALTER TABLE idempotency_keys ADD COLUMN fingerprint VARCHAR(64)"))
+    return {"migrated": True}
+
+
+def add_search_prefix_index(connection: Connection) -> dict:
+    """Пересоздает индекс полнотекстового поиска с индексами префиксов и заполняет его."""
+    if connection.dialect.name != "sqlite":
+        return {"migrated": False}
+    sql = connection.scalar(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": search.SEARCH_TABLE},
+    )
+    if sql is None or "prefix" in sql:
+        return {"migrated": False}
+    connection.execute(text(f"DROP TABLE {search.SEARCH_TABLE}"))
+    connection.execute(text(search.CREATE_INDEX))
+    search.rebuild(connection)
+    return {"migrated": True, "rows": connection.scalar(text(f"SELECT COUNT(*) FROM {search.SEARCH_TABLE}"))}
+
+
+def autoincrement_homework_ids(connection: Connection) -> dict:
+    """Пересоздает homeworks и attachments с AUTOINCREMENT, чтобы id архивных и удаленных
+    строк не выдавались новым."""
+    if connection.dialect.name != "sqlite":
+        return {"migrated": False}
+    migrated = []
+    for table, archive_table in (
+        (HomeworkModel.__table__, HomeworkArchiveModel.__table__),
+        (AttachmentModel.__table__, AttachmentArchiveModel.__table__),
+    ):
+        sql = connection.scalar(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table.name}
+        )
+        if sql is None or "AUTOINCREMENT" in sql.upper():
+            continue
+        rebuild_table(connection, table)
+        # Счетчик начинается после наибольшего id, в том числе среди архивных строк
+        last_id = connection.scalar(text(f"SELECT MAX(id) FROM {table.name}")) or 0
+        if inspect(connection).has_table(archive_table.name):
+            last_id = max(last_id, connection.scalar(text(f"SELECT MAX(id) FROM {archive_table.name}")) or 0)
+        connection.execute(text("DELETE FROM sqlite_sequence WHERE name = :name"), {"name": table.name})
+        connection.execute(
+            text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)"),
+            {"name": table.name, "seq": last_id},
+        )
+        migrated.append(table.name)
+    return {"migrated": bool(migrated), "tables": migrated}
+
+
+MIGRATIONS = [
+    dedupe_attachment_files, add_user_search_columns, create_group_stats, add_version_columns,
+    add_idempotency_fingerprint, add_search_prefix_index, autoincrement_homework_ids,
+]
+
+
+def enable_incremental_vacuum(engine) -> dict:
+    """Переводит существующую базу SQLite в auto_vacuum=INCREMENTAL (нужен полный VACUUM,
+    выполняется вне транзакции и при остановленном API)."""
+    if engine.dialect.name != "sqlite":
+        return {"migrated": False}
+    raw = engine.raw_connection()
+    try:
+        connection = raw.driver_connection
+        if connection.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return {"migrated": False}
+        connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        connection.execute("VACUUM")
+        return {"migrated": True}
+    finally:
+        raw.close()
+
+
+def migrate(url: str = SQLALCHEMY_DATABASE_URL) -> dict:
+    engine = create_engine(url)
+    try:
+        with engine.begin() as connection:
+            report = {migration.__name__: migration(connection) for migration in MIGRATIONS}
+        report[enable_incremental_vacuum.__name__] = enable_incremental_vacuum(engine)
+        return report
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    for name, report in migrate(*sys.argv[1:]).items():
+        print(name, report)
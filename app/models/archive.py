@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, ForeignKey
+from datetime import datetime
+from app.database import Base
+
+# Архив заданий прошлых периодов: строки переносятся из homeworks и attachments
+# с теми же id, поэтому горячие таблицы и их индексы содержат только актуальные данные
+
+class HomeworkArchiveModel(Base):
+    __tablename__ = "homeworks_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=False, index=True)
+    assigned_by = Column(BigInteger, ForeignKey("users.id"), nullable=False)
+    title = Column(String(200), nullable=False)
+    description = Column(Text)
+    deadline = Column(DateTime, nullable=False)
+    created_at = Column(DateTime)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+class AttachmentArchiveModel(Base):
+    __tablename__ = "attachments_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    homework_id = Column(Integer, ForeignKey("homeworks_archive.id"), nullable=False, index=True)
+    file_ref_id = Column(Integer, ForeignKey("files.id"), nullable=False, index=True)
+    file_type = Column(String(50), nullable=False)
+    file_name = Column(String(255), nullable=False)
+    caption = Column(Text)
+    uploaded_at = Column(DateTime)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    archived_at = Column(DateTime, default=datetime.utcnow)
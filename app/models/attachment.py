@@ -5,14 +5,28 @@ from app.database import Base
 
 class AttachmentModel(Base):
     __tablename__ = "attachments"
+    # id архивных и удаленных вложений не используются повторно
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     homework_id = Column(Integer, ForeignKey("homeworks.id"), nullable=False)
-    file_id = Column(String(255), nullable=False)
+    # Один и тот же файл Telegram хранится в таблице files один раз
+    file_ref_id = Column(Integer, ForeignKey("files.id"), nullable=False, index=True)
     file_type = Column(String(50), nullable=False)
     file_name = Column(String(255), nullable=False)
     caption = Column(Text)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
+    # Версия строки для оптимистичной блокировки (ETag / If-Match)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     # Relationships
-    homework = relationship("HomeworkModel", back_populates="attachments")
\ No newline at end of file
+    homework = relationship("HomeworkModel", back_populates="attachments")
+    file = relationship("FileModel", back_populates="attachments", lazy="joined")
+
+    @property
+    def file_id(self):
+        return self.file.file_id
+
+    @property
+    def file_unique_id(self):
+        return self.file.file_unique_id
@@ -11,6 +11,8 @@ class GroupModel(Base):
     description = Column(Text)
     created_by = Column(BigInteger, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Версия строки для оптимистичной блокировки (ETag / If-Match)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     # Relationships
     creator = relationship("UserModel", back_populates="created_groups")
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from app.database import Base
+
+class GroupStatsModel(Base):
+    __tablename__ = "group_stats"
+
+    group_id = Column(Integer, ForeignKey("groups.id"), primary_key=True)
+    member_count = Column(Integer, nullable=False, default=0)
+    homework_count = Column(Integer, nullable=False, default=0)
+    next_deadline = Column(DateTime)
+    last_activity = Column(DateTime)
@@ -1,10 +1,16 @@
-from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
 
 class HomeworkModel(Base):
     __tablename__ = "homeworks"
+    # Задания группы и ближайший срок сдачи выбираются по индексу; AUTOINCREMENT не дает
+    # SQLite повторно выдать id заданий, перенесенных в архив или удаленных
+    __table_args__ = (
+        Index("ix_homeworks_group_deadline", "group_id", "deadline"),
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     group_id = Column(Integer, ForeignKey("groups.id"), nullable=False)
@@ -13,6 +19,8 @@ class HomeworkModel(Base):
     description = Column(Text)
     deadline = Column(DateTime, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Версия строки для оптимистичной блокировки (ETag / If-Match)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     # Relationships
     group = relationship("GroupModel", back_populates="homeworks")
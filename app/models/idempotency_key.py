@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary
+from datetime import datetime
+from app.database import Base
+
+class IdempotencyKeyModel(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String(255), primary_key=True)
+    method = Column(String(10), nullable=False)
+    path = Column(String(255), nullable=False)
+    # SHA-256 тела запроса: повтор ключа с другим телом отклоняется
+    fingerprint = Column(String(64))
+    status_code = Column(Integer, nullable=False)
+    content_type = Column(String(100))
+    body = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
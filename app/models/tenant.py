@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, DateTime
+from datetime import datetime
+from app.database import Base
+
+class TenantModel(Base):
+    __tablename__ = "tenants"
+
+    id = Column(String(64), primary_key=True)
+    node = Column(String(64), nullable=False)
+    status = Column(String(20), nullable=False, default="active")  # active/moving
+    created_at = Column(DateTime, default=datetime.utcnow)
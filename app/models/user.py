@@ -1,8 +1,16 @@
 from sqlalchemy import Column, BigInteger, String, DateTime, Integer
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from datetime import datetime
 from app.database import Base
 
+
+def fold(value):
+    """Приводит строку к виду для поиска без учета регистра (ё и е не различаются)."""
+    if value is None:
+        return None
+    return value.casefold().replace("ё", "е")
+
+
 class UserModel(Base):
     __tablename__ = "users"
 
@@ -12,8 +20,19 @@ class UserModel(Base):
     full_name = Column(String(200), nullable=False)
     role = Column(String(20), nullable=False)  # student/teacher/admin
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Версия строки для оптимистичной блокировки (ETag / If-Match)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    # Нормализованные копии для поиска по префиксу через индекс
+    username_folded = Column(String(100), index=True)
+    full_name_folded = Column(String(200), index=True)
 
     # Relationships
     created_groups = relationship("GroupModel", back_populates="creator")
     assigned_homeworks = relationship("HomeworkModel", back_populates="assigner")
-    user_groups = relationship("UserGroupModel", back_populates="user")
\ No newline at end of file
+    user_groups = relationship("UserGroupModel", back_populates="user")
+
+    @validates("username", "full_name")
+    def _fold_search_fields(self, key, value):
+        setattr(self, f"{key}_folded", fold(value))
+        return value
@@ -0,0 +1,158 @@
+import itertools
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+
+from app import metrics
+
+# Реплики только для чтения, через запятую; без них все запросы идут в основную базу
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# Сколько секунд после записи клиент читает из основной базы (чтение своих записей)
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+# Через сколько секунд недоступная реплика проверяется снова
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "10"))
+# Предел числа запоминаемых клиентов с недавними записями
+REPLICA_STICKY_MAX_CLIENTS = 10000
+# Время последней записи (Unix time) возвращается клиенту в cookie и заголовке; запрос
+# с ним читает из основной базы в любом рабочем процессе, а не только в том, где была запись
+STICKY_COOKIE = "last_write"
+STICKY_HEADER = "X-Last-Write"
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = create_engine(
+            url, connect_args={"check_same_thread": False} if url.startswith("sqlite") else {}
+        )
+        self.healthy = True
+        self.retry_at = 0.0
+        self.reads = 0
+        self.failures = 0
+
+
+class ReplicaRouter:
+    """Выбор реплики для чтения: по кругу среди доступных, с возвратом
+    к основной базе для клиентов, которые недавно писали."""
+
+    def __init__(self, urls: List[str], sticky_seconds: float = REPLICA_STICKY_SECONDS,
+                 retry_seconds: float = REPLICA_RETRY_SECONDS):
+        self.replicas = [Replica(url) for url in urls]
+        self.sticky_seconds = sticky_seconds
+        self.retry_seconds = retry_seconds
+        self._cycle = itertools.cycle(self.replicas) if self.replicas else None
+        self._lock = threading.Lock()
+        self._last_write: Dict[str, float] = {}
+        self.primary_reads = 0
+        self.sticky_reads = 0
+
+    def record_write(self, client: str) -> None:
+        if not self.replicas:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if len(self._last_write) >= REPLICA_STICKY_MAX_CLIENTS:
+                self._last_write = {
+                    key: at for key, at in self._last_write.items() if now - at < self.sticky_seconds
+                }
+            self._last_write[client] = now
+
+    def choose(self, client: str, written_at: Optional[float] = None) -> Optional[Replica]:
+        """Реплика для чтения или None, если читать нужно из основной базы.
+
+        written_at - время последней записи клиента из cookie или заголовка (Unix time).
+        """
+        if not self.replicas:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            recent = written_at is not None and time.time() - written_at < self.sticky_seconds
+            local = self._last_write.get(client)
+            if recent or (local is not None and now - local < self.sticky_seconds):
+                self.sticky_reads += 1
+                return None
+            for _ in range(len(self.replicas)):
+                replica = next(self._cycle)
+                if replica.healthy:
+                    replica.reads += 1
+                    return replica
+                if now >= replica.retry_at:
+                    # Проверяем недоступную реплику не чаще раза в retry_seconds
+                    replica.retry_at = now + self.retry_seconds
+                    candidate = replica
+                    break
+            else:
+                self.primary_reads += 1
+                return None
+        if self._ping(candidate):
+            candidate.reads += 1
+            return candidate
+        self.primary_reads += 1
+        return None
+
+    def _ping(self, replica: Replica) -> bool:
+        try:
+            with replica.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+        except Exception:
+            self.mark_failed(replica)
+            return False
+        replica.healthy = True
+        return True
+
+    def mark_failed(self, replica: Replica) -> None:
+        with self._lock:
+            replica.healthy = False
+            replica.failures += 1
+            replica.retry_at = time.monotonic() + self.retry_seconds
+
+    def dispose(self) -> None:
+        for replica in self.replicas:
+            replica.engine.dispose()
+
+    def stats(self) -> dict:
+        return {
+            "primary_reads": self.primary_reads,
+            "sticky_reads": self.sticky_reads,
+            "replicas": {
+                replica.url: {"healthy": replica.healthy, "reads": replica.reads, "failures": replica.failures}
+                for replica in self.replicas
+            },
+        }
+
+
+class StickyWriteMiddleware:
+    """Добавляет к ответу на запрос с записью (request.state.last_write) время записи
+    в cookie и заголовке X-Last-Write."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_write_time(message):
+            written_at = scope.get("state", {}).get("last_write")
+            if message["type"] == "http.response.start" and written_at is not None and router.replicas:
+                value = f"{written_at:.3f}"
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Set-Cookie",
+                    f"{STICKY_COOKIE}={value}; Max-Age={math.ceil(router.sticky_seconds)}; Path=/; HttpOnly; SameSite=Lax",
+                )
+                headers.append(STICKY_HEADER, value)
+            await send(message)
+
+        await self.app(scope, receive, send_with_write_time)
+
+
+router = ReplicaRouter(DATABASE_REPLICA_URLS)
+metrics.register("replicas", lambda: router.stats())
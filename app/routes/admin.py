@@ -0,0 +1,236 @@
+import os
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app import archive, backup, tenants
+from app.maintenance import scheduler
+from app.database import get_read_db, get_write_db, tenant_of
+from app.schemas.archive import ArchiveRequest, ArchiveResult
+from app.schemas.backup import BackupFile, BackupRequest, BackupResult
+from app.schemas.maintenance import MaintenanceReport
+from app.schemas.tenant import TenantCreate, Tenant, TenantMove, TenantMoveResult
+
+# Если задан, административные запросы требуют заголовок X-Admin-Token с этим значением
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+@router.post(
+    "/tenants",
+    response_model=Tenant,
+    summary="Зарегистрировать школу (арендатора)",
+    description="""
+    Регистрирует школу с отдельной базой данных на указанном узле хранения.
+    База создается при первом запросе школы (заголовок X-Tenant-ID или префикс /t/{tenant}).
+    
+    **Параметры тела:**
+    - id: Идентификатор школы (строчные латинские буквы, цифры, _ и -)
+    - node: Узел хранения из TENANT_NODES
+    
+    **Ошибки:**
+    - 400: Школа уже зарегистрирована или узел неизвестен
+    
+    **Использование:**
+    - POST /admin/tenants
+    """
+)
+def create_tenant(tenant: TenantCreate):
+    try:
+        return tenants.registry.register(tenant.id, tenant.node)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+@router.get(
+    "/tenants",
+    response_model=List[Tenant],
+    summary="Получить список школ",
+    description="""
+    Возвращает зарегистрированные школы с узлами хранения и состоянием.
+    
+    **Использование:**
+    - GET /admin/tenants
+    """
+)
+def read_tenants():
+    return tenants.registry.list()
+
+@router.post(
+    "/tenants/{tenant_id}/move",
+    response_model=TenantMoveResult,
+    summary="Перенести школу на другой узел хранения",
+    description="""
+    Копирует базу данных школы на другой узел и переключает запросы школы на нее.
+    На время переноса запросы школы получают ответ 503 с заголовком Retry-After.
+    Исходная база остается на прежнем узле без изменений.
+    
+    **Параметры пути:**
+    - tenant_id: Идентификатор школы
+    
+    **Параметры тела:**
+    - node: Целевой узел хранения
+    
+    **Возвращает:**
+    - Школу после переноса, прежний узел и число скопированных строк по таблицам
+    
+    **Ошибки:**
+    - 400: Неизвестный узел или школа уже на нем
+    - 404: Школа не найдена
+    - 409: Школа уже переносится или начатые запросы школы не завершились
+      за TENANT_MOVE_DRAIN_SECONDS секунд
+    
+    **Использование:**
+    - POST /admin/tenants/school-1/move
+    """
+)
+def move_tenant(tenant_id: str, move: TenantMove):
+    try:
+        return tenants.registry.move(tenant_id, move.node)
+    except tenants.TenantNotFound:
+        raise HTTPException(status_code=404, detail="Tenant not found")
+    except tenants.TenantUnavailable:
+        raise HTTPException(status_code=409, detail="Tenant is being moved")
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.post(
+    "/archive",
+    response_model=ArchiveResult,
+    summary="Перенести задания прошлых периодов в архив",
+    description="""
+    Переносит задания со сроком сдачи старше older_than_days дней и их вложения в архивные
+    таблицы (homeworks_archive, attachments_archive) пачками по batch_size заданий, каждая
+    пачка - в своей транзакции. Обычные запросы после этого не видят архивные задания;
+    параметр include_archived=true возвращает их вместе с актуальными.
+    Для школы запрос выполняется с заголовком X-Tenant-ID или префиксом /t/{tenant}.
+    
+    **Параметры тела:**
+    - older_than_days: Возраст срока сдачи в днях (по умолчанию ARCHIVE_AFTER_DAYS, 180)
+    - batch_size: Заданий в одной транзакции (по умолчанию ARCHIVE_BATCH_SIZE, 1000)
+    
+    **Возвращает:**
+    - Число перенесенных заданий и вложений и число транзакций
+    
+    **Использование:**
+    - POST /admin/archive
+    """
+)
+def archive_homeworks(request: ArchiveRequest, db: Session = Depends(get_write_db)):
+    days = request.older_than_days if request.older_than_days is not None else archive.ARCHIVE_AFTER_DAYS
+    batch_size = request.batch_size or archive.ARCHIVE_BATCH_SIZE
+    return archive.archive(db.get_bind(), days, batch_size, tenant_of(db))
+
+
+@router.post(
+    "/backups",
+    response_model=BackupResult,
+    summary="Создать резервную копию базы",
+    description="""
+    Создает копию базы SQLite в BACKUP_DIR, не останавливая API. Копирование идет через
+    backup API SQLite шагами по BACKUP_PAGES_PER_STEP страниц с паузой BACKUP_STEP_SLEEP_MS
+    между шагами, поэтому запись блокируется только на время одного шага.
+    Для школы запрос выполняется с заголовком X-Tenant-ID или префиксом /t/{tenant}.
+    
+    **Параметры тела:**
+    - compress: Сжать копию gzip (по умолчанию true)
+    - verify: Восстановить копию во временный файл и проверить ее (по умолчанию true)
+    
+    **Возвращает:**
+    - Имя и размер файла, время и число шагов копирования, результат проверки
+    
+    **Ошибки:**
+    - 501: База не SQLite
+    
+    **Использование:**
+    - POST /admin/backups
+    """
+)
+def create_backup(request: BackupRequest, db: Session = Depends(get_write_db)):
+    tenant = tenant_of(db)
+    name = f"{tenant}-{backup.timestamp()}" if tenant is not None else None
+    try:
+        return backup.create_backup(db.get_bind(), backup.backup_dir(tenant), name=name,
+                                    compressed=request.compress, check=request.verify)
+    except backup.BackupUnsupported as exc:
+        raise HTTPException(status_code=501, detail=str(exc))
+
+
+@router.get(
+    "/backups",
+    response_model=List[BackupFile],
+    summary="Получить список резервных копий",
+    description="""
+    Возвращает файлы копий из BACKUP_DIR, новые первыми. Для школы (заголовок X-Tenant-ID
+    или префикс /t/{tenant}) - только копии ее базы.
+    
+    **Использование:**
+    - GET /admin/backups
+    """
+)
+def read_backups(db: Session = Depends(get_read_db)):
+    return backup.list_backups(backup.backup_dir(tenant_of(db)))
+
+
+@router.get(
+    "/backups/{name}",
+    response_class=FileResponse,
+    summary="Скачать резервную копию",
+    description="""
+    Отдает файл копии потоком. Школа может скачать только копию своей базы.
+    
+    **Параметры пути:**
+    - name: Имя файла из GET /admin/backups
+    
+    **Ошибки:**
+    - 404: Копия не найдена
+    
+    **Использование:**
+    - GET /admin/backups/backup-20240101-120000-000000.db.gz
+    """
+)
+def download_backup(name: str, db: Session = Depends(get_read_db)):
+    path = backup.find_backup(name, backup.backup_dir(tenant_of(db)))
+    if path is None:
+        raise HTTPException(status_code=404, detail="Backup not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=path.name)
+
+
+@router.post(
+    "/maintenance",
+    response_model=MaintenanceReport,
+    summary="Обслужить базы данных",
+    description="""
+    Сразу выполняет обход, который планировщик запускает раз в MAINTENANCE_INTERVAL_SECONDS
+    при малой нагрузке: для основной базы и открытых баз школ - ANALYZE (при первом
+    обслуживании) или PRAGMA optimize, PRAGMA incremental_vacuum пачками по
+    MAINTENANCE_VACUUM_PAGES страниц и PRAGMA wal_checkpoint(TRUNCATE).
+    
+    **Возвращает:**
+    - Отчет обхода: что сделано для каждой базы
+    
+    **Использование:**
+    - POST /admin/maintenance
+    """
+)
+def run_maintenance():
+    return scheduler.run()
+
+
+@router.get(
+    "/maintenance",
+    response_model=List[MaintenanceReport],
+    summary="Получить отчеты обслуживания баз",
+    description="""
+    Возвращает отчеты последних MAINTENANCE_REPORTS обходов, новые первыми.
+    
+    **Использование:**
+    - GET /admin/maintenance
+    """
+)
+def read_maintenance():
+    return scheduler.history()
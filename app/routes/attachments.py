@@ -1,12 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException
+import os
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from sqlalchemy import insert, or_, select
 from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
+from typing import List, Optional
+from app import archive
+from app.blobs import BlobCache, BlobNotFound, CachedFileResponse, get_blob_cache
+from app.cache import invalidate
+from app.database import get_read_db, get_write_db, tenant_of
+from app.file_registry import resolve_files
 from app.models.attachment import AttachmentModel
+from app.models.file import FileModel
+from app.models.homework import HomeworkModel
 from app.schemas.attachment import AttachmentCreate, Attachment, AttachmentUpdate
+from app.singleflight import coalesced_json, reads
+from app.versioning import conditional_update, etag, parse_if_match, raise_update_failed
+from app.write_queue import run_write
 
 router = APIRouter(prefix="/attachments", tags=["attachments"])
 
+# Поля файла хранятся в таблице files, а не во вложении
+FILE_FIELDS = {"file_id", "file_unique_id"}
+
+ATTACHMENT_BULK_MAX_SIZE = int(os.getenv("ATTACHMENT_BULK_MAX_SIZE", "1000"))
+
+def forget_attachment_reads(db: Session, homework_id: int):
+    reads.forget(("attachments.homework", tenant_of(db), homework_id))
+    # Списки заданий с expand=attachments тоже содержат вложения
+    reads.forget(("homeworks.group", tenant_of(db)))
+    if homework_id is not None:
+        group_id = db.query(HomeworkModel.group_id).filter(HomeworkModel.id == homework_id).scalar()
+        if group_id is not None:
+            invalidate(db, f"group:{group_id}")
+
 @router.post(
     "/",
     response_model=Attachment,
@@ -32,13 +57,75 @@ router = APIRouter(prefix="/attachments", tags=["attachments"])
     Вложение должно быть связано либо с домашним заданием, либо с ответом.
     """
 )
-def create_attachment(attachment: AttachmentCreate, db: Session = Depends(get_db)):
-    db_attachment = AttachmentModel(**attachment.dict())
-    db.add(db_attachment)
-    db.commit()
-    db.refresh(db_attachment)
+def create_attachment(attachment: AttachmentCreate, db: Session = Depends(get_write_db)):
+    def insert(session: Session):
+        [db_file] = resolve_files(session, [(attachment.file_id, attachment.file_unique_id)])
+        db_attachment = AttachmentModel(file=db_file, **attachment.dict(exclude=FILE_FIELDS))
+        session.add(db_attachment)
+        session.flush()
+        return db_attachment
+
+    db_attachment = run_write(db, insert)
+    forget_attachment_reads(db, db_attachment.homework_id)
     return db_attachment
 
+@router.post(
+    "/bulk",
+    response_model=List[Attachment],
+    summary="Создать несколько вложений",
+    description="""
+    Создает список вложений (например, альбом Telegram до 10 файлов) одной транзакцией.
+    
+    **Параметры тела:**
+    - Список вложений (AttachmentCreate schema), могут относиться к разным заданиям
+    
+    **Возвращает:**
+    - Созданные вложения в порядке передачи
+    
+    **Ошибки:**
+    - 400: Превышен размер списка (ATTACHMENT_BULK_MAX_SIZE, по умолчанию 1000)
+    - 404: Одно из указанных домашних заданий не найдено
+    
+    **Использование:**
+    - POST /attachments/bulk
+    
+    **Примечание:**
+    Существование заданий проверяется одним запросом, вставка выполняется
+    одним INSERT ... RETURNING.
+    """
+)
+def create_attachments_bulk(attachments: List[AttachmentCreate], db: Session = Depends(get_write_db)):
+    if len(attachments) > ATTACHMENT_BULK_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"Bulk size exceeds {ATTACHMENT_BULK_MAX_SIZE}")
+    if not attachments:
+        return []
+    homework_ids = {attachment.homework_id for attachment in attachments}
+
+    def insert_all(session: Session):
+        found = set(session.scalars(select(HomeworkModel.id).where(HomeworkModel.id.in_(homework_ids))))
+        missing = sorted(homework_ids - found)
+        if missing:
+            raise HTTPException(status_code=404, detail=f"Homework not found: {missing}")
+
+        files = resolve_files(session, [(a.file_id, a.file_unique_id) for a in attachments])
+        table = AttachmentModel.__table__
+        rows = session.execute(
+            insert(table).returning(*table.c, sort_by_parameter_order=True),
+            [
+                {"file_ref_id": db_file.id, **attachment.dict(exclude=FILE_FIELDS)}
+                for attachment, db_file in zip(attachments, files)
+            ],
+        )
+        return [
+            {**row, "file_id": db_file.file_id, "file_unique_id": db_file.file_unique_id}
+            for row, db_file in zip(rows.mappings(), files)
+        ]
+
+    rows = run_write(db, insert_all)
+    for homework_id in homework_ids:
+        forget_attachment_reads(db, homework_id)
+    return rows
+
 @router.get(
     "/",
     response_model=List[Attachment],
@@ -49,6 +136,7 @@ def create_attachment(attachment: AttachmentCreate, db: Session = Depends(get_db
     **Параметры запроса:**
     - skip: Количество записей для пропуска (по умолчанию 0)
     - limit: Максимальное количество записей для возврата (по умолчанию 100)
+    - include_archived: Включить вложения архивных заданий (поле archived)
     
     **Возвращает:**
     - Список вложений
@@ -58,7 +146,12 @@ def create_attachment(attachment: AttachmentCreate, db: Session = Depends(get_db
     - GET /attachments/?skip=10&limit=50
     """
 )
-def read_attachments(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_attachments(skip: int = 0, limit: int = 100, include_archived: bool = False,
+                     db: Session = Depends(get_read_db)):
+    if include_archived:
+        attachments = archive.attachments_query(True)
+        rows = db.execute(select(attachments).order_by(attachments.c.id).offset(skip).limit(limit)).mappings()
+        return [dict(row) for row in rows]
     attachments = db.query(AttachmentModel).offset(skip).limit(limit).all()
     return attachments
 
@@ -72,6 +165,9 @@ def read_attachments(skip: int = 0, limit: int = 100, db: Session = Depends(get_
     **Параметры пути:**
     - attachment_id: ID вложения
     
+    **Параметры запроса:**
+    - include_archived: Искать вложение также в архиве
+    
     **Возвращает:**
     - Данные вложения
     
@@ -82,11 +178,65 @@ def read_attachments(skip: int = 0, limit: int = 100, db: Session = Depends(get_
     - GET /attachments/123
     """
 )
-def read_attachment(attachment_id: int, db: Session = Depends(get_db)):
+def read_attachment(attachment_id: int, response: Response, include_archived: bool = False,
+                    db: Session = Depends(get_read_db)):
+    attachments = archive.attachments_query(include_archived)
+    row = db.execute(select(attachments).where(attachments.c.id == attachment_id)).mappings().first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    response.headers["ETag"] = etag(row["version"])
+    return dict(row)
+
+@router.get(
+    "/{attachment_id}/content",
+    summary="Получить содержимое вложения",
+    description="""
+    Возвращает содержимое файла вложения. Файл загружается из Telegram при первом
+    обращении и далее отдается из локального дискового кэша.
+    
+    **Параметры пути:**
+    - attachment_id: ID вложения
+    
+    **Заголовки запроса:**
+    - Range: Диапазон байтов (опционально), ответ 206 Partial Content
+    
+    **Возвращает:**
+    - Содержимое файла
+    
+    **Ошибки:**
+    - 404: Вложение или его содержимое не найдено
+    - 503: Источник файлов не настроен (BLOB_SOURCE_DIR или TELEGRAM_BOT_TOKEN)
+    
+    **Использование:**
+    - GET /attachments/123/content
+    - GET /attachments/123/content с заголовком Range: bytes=0-1023
+    """
+)
+def read_attachment_content(
+    attachment_id: int,
+    db: Session = Depends(get_read_db),
+    cache: Optional[BlobCache] = Depends(get_blob_cache),
+):
+    if cache is None:
+        raise HTTPException(status_code=503, detail="Attachment storage is not configured")
     db_attachment = db.query(AttachmentModel).filter(AttachmentModel.id == attachment_id).first()
     if db_attachment is None:
         raise HTTPException(status_code=404, detail="Attachment not found")
-    return db_attachment
+
+    try:
+        # Файл закреплен в кэше до конца ответа: вытеснение не удалит его во время отправки
+        path = cache.acquire(db_attachment.file_unique_id or db_attachment.file_id, db_attachment.file_id)
+    except BlobNotFound:
+        raise HTTPException(status_code=404, detail="Attachment content not found")
+
+    media_type = db_attachment.file_type if "/" in db_attachment.file_type else None
+    return CachedFileResponse(
+        cache,
+        path,
+        media_type=media_type,
+        filename=db_attachment.file_name,
+        content_disposition_type="inline",
+    )
 
 @router.get(
     "/homework/{homework_id}",
@@ -98,6 +248,9 @@ def read_attachment(attachment_id: int, db: Session = Depends(get_db)):
     **Параметры пути:**
     - homework_id: ID домашнего задания
     
+    **Параметры запроса:**
+    - include_archived: Включить вложения архивного задания
+    
     **Возвращает:**
     - Список вложений для указанного домашнего задания
     
@@ -106,10 +259,53 @@ def read_attachment(attachment_id: int, db: Session = Depends(get_db)):
     
     **Примечание:"
     Возвращает пустой список, если для задания нет вложений.
+    Одновременные запросы для одного задания выполняют один запрос к базе
+    и получают общий ответ.
+    """
+)
+def read_homework_attachments(homework_id: int, include_archived: bool = False, db: Session = Depends(get_read_db)):
+    if include_archived:
+        attachments = archive.attachments_query(True)
+        statement = select(attachments).where(attachments.c.homework_id == homework_id).order_by(attachments.c.id)
+        return coalesced_json(
+            ("attachments.homework", tenant_of(db), homework_id, db.info.get("replica"), "archived"),
+            lambda: [dict(row) for row in db.execute(statement).mappings()],
+            List[Attachment],
+        )
+    return coalesced_json(
+        ("attachments.homework", tenant_of(db), homework_id, db.info.get("replica")),
+        lambda: db.query(AttachmentModel).filter(AttachmentModel.homework_id == homework_id).all(),
+        List[Attachment],
+    )
+
+@router.get(
+    "/by-file/{file_id}",
+    response_model=List[Attachment],
+    summary="Найти вложения по файлу Telegram",
+    description="""
+    Возвращает все вложения, использующие указанный файл, во всех заданиях и группах.
+    
+    **Параметры пути:**
+    - file_id: File ID или File unique ID от Telegram
+    
+    **Возвращает:**
+    - Список вложений с этим файлом
+    
+    **Использование:**
+    - GET /attachments/by-file/AgACAgIAAxkBAAI
+    
+    **Примечание:**
+    Поиск выполняется по индексам таблицы files. Возвращает пустой список,
+    если файл нигде не используется.
     """
 )
-def read_homework_attachments(homework_id: int, db: Session = Depends(get_db)):
-    attachments = db.query(AttachmentModel).filter(AttachmentModel.homework_id == homework_id).all()
+def read_attachments_by_file(file_id: str, db: Session = Depends(get_read_db)):
+    attachments = (
+        db.query(AttachmentModel)
+        .join(AttachmentModel.file)
+        .filter(or_(FileModel.file_id == file_id, FileModel.file_unique_id == file_id))
+        .all()
+    )
     return attachments
 
 @router.put(
@@ -128,11 +324,16 @@ def read_homework_attachments(homework_id: int, db: Session = Depends(get_db)):
     - file_size: Новый размер файла (опционально)
     - file_type: Новый MIME-тип файла (опционально)
     
+    **Заголовки:**
+    - If-Match: версия из заголовка ETag ответа GET; если запись с тех пор изменилась,
+      обновление не выполняется и возвращается 412. Ответ содержит ETag новой версии.
+    
     **Возвращает:**
     - Обновленные данные вложения
     
     **Ошибки:**
     - 404: Вложение с указанным ID не найдено
+    - 412: Версия в If-Match не совпадает с текущей
     
     **Использование:**
     - PUT /attachments/123
@@ -141,18 +342,17 @@ def read_homework_attachments(homework_id: int, db: Session = Depends(get_db)):
     Использует частичное обновление - только переданные поля будут изменены.
     """
 )
-def update_attachment(attachment_id: int, attachment: AttachmentUpdate, db: Session = Depends(get_db)):
-    db_attachment = db.query(AttachmentModel).filter(AttachmentModel.id == attachment_id).first()
-    if db_attachment is None:
-        raise HTTPException(status_code=404, detail="Attachment not found")
-    
+def update_attachment(attachment_id: int, attachment: AttachmentUpdate, response: Response,
+                      if_match: Optional[str] = Header(None), db: Session = Depends(get_write_db)):
     update_data = attachment.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_attachment, field, value)
-    
+    row = conditional_update(db, AttachmentModel, attachment_id, update_data, parse_if_match(if_match))
+    if row is None:
+        raise_update_failed(db, AttachmentModel, attachment_id, "Attachment not found")
+    db_file = db.get(FileModel, row["file_ref_id"])
     db.commit()
-    db.refresh(db_attachment)
-    return db_attachment
+    forget_attachment_reads(db, row["homework_id"])
+    response.headers["ETag"] = etag(row["version"])
+    return {**row, "file_id": db_file.file_id, "file_unique_id": db_file.file_unique_id}
 
 @router.delete(
     "/{attachment_id}",
@@ -180,11 +380,12 @@ def update_attachment(attachment_id: int, attachment: AttachmentUpdate, db: Sess
     перед удалением.
     """
 )
-def delete_attachment(attachment_id: int, db: Session = Depends(get_db)):
+def delete_attachment(attachment_id: int, db: Session = Depends(get_write_db)):
     db_attachment = db.query(AttachmentModel).filter(AttachmentModel.id == attachment_id).first()
     if db_attachment is None:
         raise HTTPException(status_code=404, detail="Attachment not found")
     
     db.delete(db_attachment)
     db.commit()
+    forget_attachment_reads(db, db_attachment.homework_id)
     return {"message": "Attachment deleted successfully"}
\ No newline at end of file
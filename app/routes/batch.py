@@ -0,0 +1,194 @@
+import json
+import os
+import re
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional
+from app.database import get_db
+from app.schemas.batch import BatchOperation, BatchResult
+from app.tenants import TENANT_PATH
+
+router = APIRouter(prefix="/batch", tags=["batch"])
+
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "20"))
+
+# Ссылка на результат предыдущего шага: $<номер шага>.<поле>.<поле>...
+REFERENCE = re.compile(r"\$(\d+)((?:\.[A-Za-z0-9_]+)*)")
+
+# Заголовки пакета, которые не передаются подзапросам: они описывают тело самого пакета
+# или относятся к пакету целиком (ответы подзапросов разбираются как несжатый JSON)
+NOT_FORWARDED = {b"content-type", b"content-length", b"transfer-encoding", b"idempotency-key", b"accept-encoding"}
+
+
+class UnresolvedReference(Exception):
+    pass
+
+
+def resolve_reference(match: re.Match, results: List[BatchResult]) -> Any:
+    step = int(match.group(1))
+    if step >= len(results) or results[step].status >= 400:
+        raise UnresolvedReference(f"Step {step} is not available")
+    value = results[step].body
+    for part in match.group(2).split(".")[1:]:
+        try:
+            value = value[int(part)] if isinstance(value, list) else value[part]
+        except (KeyError, IndexError, ValueError, TypeError):
+            raise UnresolvedReference(f"Reference {match.group(0)} not found")
+    return value
+
+
+def substitute(value: Any, results: List[BatchResult], interpolate: bool = False) -> Any:
+    # В теле заменяются только значения, целиком состоящие из ссылки: символ $ в тексте
+    # (например, в описании задания) остается как есть. В пути и заголовках ссылка
+    # может быть частью строки (/homeworks/$0.id, "$1.version")
+    if isinstance(value, str):
+        match = REFERENCE.fullmatch(value)
+        if match:
+            return resolve_reference(match, results)
+        if interpolate:
+            return REFERENCE.sub(lambda m: str(resolve_reference(m, results)), value)
+        return value
+    if isinstance(value, list):
+        return [substitute(item, results, interpolate) for item in value]
+    if isinstance(value, dict):
+        return {key: substitute(item, results, interpolate) for key, item in value.items()}
+    return value
+
+
+def is_batch_path(path: str) -> bool:
+    # Путь сравнивается без строки запроса и префикса арендатора /t/{tenant}
+    path = path.partition("?")[0]
+    match = TENANT_PATH.match(path)
+    if match:
+        path = match.group(2) or "/"
+    return path.rstrip("/") == router.prefix
+
+
+def sub_request_headers(request: Request, payload: bytes, extra: Optional[Dict[str, str]]) -> list:
+    # Подзапросы получают заголовки пакета (X-Tenant-ID, X-Client-ID, авторизация, If-Match);
+    # заголовки операции заменяют одноименные заголовки пакета
+    extra = {
+        name.lower().encode("latin-1"): str(value).encode("latin-1")
+        for name, value in (extra or {}).items()
+    }
+    headers = [
+        (name, value) for name, value in request.scope["headers"]
+        if name not in NOT_FORWARDED and name not in extra
+    ]
+    headers += [(name, value) for name, value in extra.items() if name not in NOT_FORWARDED]
+    return headers + [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(payload)).encode()),
+    ]
+
+
+async def dispatch(request: Request, method: str, path: str, body: Any, db: Session,
+                   headers: Optional[Dict[str, str]] = None) -> BatchResult:
+    path, _, query = path.partition("?")
+    payload = json.dumps(body).encode() if body is not None else b""
+    state = {"db": db, "batch": True}
+    # Арендатор из префикса пути пакета не виден в путях подзапросов
+    tenant = getattr(request.state, "tenant", None)
+    if tenant is not None:
+        state["tenant"] = tenant
+    scope = {
+        "type": "http",
+        "asgi": request.scope.get("asgi", {"version": "3.0"}),
+        "http_version": "1.1",
+        "method": method.upper(),
+        "scheme": request.scope.get("scheme", "http"),
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": sub_request_headers(request, payload, headers),
+        "client": request.scope.get("client"),
+        "server": request.scope.get("server"),
+        "app": request.app,
+        # Все подзапросы используют сессию пакетного запроса;
+        # лимиты и идемпотентность уже применены к самому пакету
+        "state": state,
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": payload, "more_body": False}
+
+    response = {"status": 500, "body": []}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"].append(message.get("body", b""))
+
+    try:
+        await request.app(scope, receive, send)
+    except Exception:
+        db.rollback()
+        return BatchResult(status=500, body={"detail": "Internal Server Error"})
+
+    # Клиент читает из основной базы, только если какой-то шаг выполнил запись
+    if "last_write" in state:
+        request.state.last_write = state["last_write"]
+
+    raw = b"".join(response["body"])
+    try:
+        content = json.loads(raw) if raw else None
+    except ValueError:
+        content = raw.decode("utf-8", "replace")
+    return BatchResult(status=response["status"], body=content)
+
+
+@router.post(
+    "/",
+    response_model=List[BatchResult],
+    summary="Выполнить несколько запросов за один вызов",
+    description="""
+    Выполняет массив подзапросов последовательно внутри сервера и возвращает
+    все результаты вместе. Подзапросы используют одну сессию базы данных.
+    
+    **Параметры тела:**
+    - Массив объектов: method, path, body (опционально), headers (опционально,
+      например {"If-Match": "\"2\""})
+    
+    Подзапросы получают заголовки пакета (X-Tenant-ID, X-Client-ID, If-Match и др.),
+    заголовки операции заменяют их.
+    
+    **Ссылки на предыдущие шаги:**
+    - $0.id - поле id из ответа шага 0
+    - $1.0.group_id - поле group_id первого элемента списка из ответа шага 1
+    В path и заголовках ссылка может быть частью строки; в body заменяются только
+    строковые значения, целиком состоящие из ссылки ("$0.id"), а символ $ внутри
+    текста не меняется. Если шаг, на который
+    ссылается подзапрос, завершился ошибкой, подзапрос получает статус 424.
+    
+    **Возвращает:**
+    - Список результатов (status, body) в порядке подзапросов
+    
+    **Ошибки:**
+    - 400: Превышен максимальный размер пакета (BATCH_MAX_SIZE)
+    
+    **Использование:**
+    - POST /batch/
+    - [{"method": "GET", "path": "/users/telegram/123"},
+       {"method": "GET", "path": "/user-groups/user/$0.id"}]
+    """
+)
+async def execute_batch(operations: List[BatchOperation], request: Request, db: Session = Depends(get_db)):
+    if len(operations) > BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batch size exceeds {BATCH_MAX_SIZE}")
+
+    results = []
+    for operation in operations:
+        try:
+            path = substitute(operation.path, results, interpolate=True)
+            body = substitute(operation.body, results)
+            headers = substitute(operation.headers, results, interpolate=True)
+        except UnresolvedReference as exc:
+            results.append(BatchResult(status=424, body={"detail": str(exc)}))
+            continue
+        if is_batch_path(path):
+            results.append(BatchResult(status=400, body={"detail": "Nested batches are not allowed"}))
+            continue
+        results.append(await dispatch(request, operation.method, path, body, db, headers))
+    return results
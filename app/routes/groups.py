@@ -1,9 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Request, Response
 from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
+from typing import List, Optional
+from app import cascade, clone, group_stats, ical
+from app.cache import cached_json, invalidate
+from app.database import get_read_db, get_write_db, tenant_of
 from app.models.group import GroupModel
-from app.schemas.group import GroupCreate, Group, GroupUpdate
+from app.models.group_stats import GroupStatsModel
+from app.schemas.group import (
+    GroupCreate, Group, GroupUpdate, GroupStats, GroupWithStats, GroupClone, GroupCloneResult,
+)
+from app.versioning import conditional_update, etag, parse_if_match, raise_update_failed, with_etag
 
 router = APIRouter(prefix="/groups", tags=["groups"])
 
@@ -31,20 +37,73 @@ router = APIRouter(prefix="/groups", tags=["groups"])
     - Тело запроса: JSON с данными группы
     """
 )
-def create_group(group: GroupCreate, db: Session = Depends(get_db)):
+def create_group(group: GroupCreate, db: Session = Depends(get_write_db)):
     db_group = db.query(GroupModel).filter(GroupModel.name == group.name).first()
     if db_group:
         raise HTTPException(status_code=400, detail="Group already exists")
     
     db_group = GroupModel(**group.dict())
     db.add(db_group)
+    db.flush()
+    group_stats.group_created(db, db_group.id)
     db.commit()
     db.refresh(db_group)
+    invalidate(db, "groups")
     return db_group
 
+@router.post(
+    "/{group_id}/clone",
+    response_model=GroupCloneResult,
+    summary="Создать группу по образцу существующей",
+    description="""
+    Создает новую группу и копирует в нее все задания исходной группы вместе с вложениями.
+    Сроки сдачи сдвигаются на deadline_offset_days дней. Копирование выполняется в базе
+    данных запросами INSERT ... SELECT в одной транзакции; участники не копируются.
+    
+    **Параметры пути:**
+    - group_id: ID исходной группы
+    
+    **Тело запроса:**
+    - name: Название новой группы
+    - description, created_by: По умолчанию берутся из исходной группы
+    - deadline_offset_days: Сдвиг сроков сдачи в днях
+    
+    **Возвращает:**
+    - Новую группу и число скопированных заданий и вложений
+    
+    **Ошибки:**
+    - 400: Группа с таким именем уже существует
+    - 404: Исходная группа не найдена
+    
+    **Использование:**
+    - POST /groups/123/clone
+    """
+)
+def clone_group(group_id: int, group: GroupClone, db: Session = Depends(get_write_db)):
+    source = db.query(GroupModel).filter(GroupModel.id == group_id).first()
+    if source is None:
+        raise HTTPException(status_code=404, detail="Group not found")
+    if db.query(GroupModel).filter(GroupModel.name == group.name).first():
+        raise HTTPException(status_code=400, detail="Group already exists")
+    
+    db_group = GroupModel(
+        name=group.name,
+        description=group.description if group.description is not None else source.description,
+        created_by=group.created_by if group.created_by is not None else source.created_by,
+    )
+    db.add(db_group)
+    db.flush()
+    group_stats.group_created(db, db_group.id)
+    copied = clone.copy_homeworks(db, group_id, db_group.id, group.deadline_offset_days)
+    db.commit()
+    db.refresh(db_group)
+    invalidate(db, "groups")
+    return {"group": db_group, **copied}
+
 @router.get(
     "/", 
-    response_model=List[Group],
+    response_model=List[GroupWithStats],
+    response_model_exclude_unset=True,
     summary="Получить список групп",
     description="""
     Возвращает список всех групп с поддержкой пагинации.
@@ -52,6 +111,8 @@ def create_group(group: GroupCreate, db: Session = Depends(get_db)):
     **Параметры запроса:**
     - skip: Количество записей для пропуска (для пагинации)
     - limit: Максимальное количество возвращаемых записей (максимум 100)
+    - with_stats: Добавить статистику группы (число участников и заданий, ближайший срок,
+      последняя активность); берется из таблицы group_stats без подсчета по связанным таблицам
     
     **Возвращает:**
     - Список объектов групп
@@ -59,14 +120,27 @@ def create_group(group: GroupCreate, db: Session = Depends(get_db)):
     **Использование:**
     - GET /groups/?skip=0&limit=20
     - GET /groups/?limit=50
+    - GET /groups/?with_stats=true
     
     **Примечание:**
     Используйте пагинацию для больших списков групп.
     """
 )
-def read_groups(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    groups = db.query(GroupModel).offset(skip).limit(limit).all()
-    return groups
+def read_groups(skip: int = 0, limit: int = 100, with_stats: bool = False, db: Session = Depends(get_read_db)):
+    query = db.query(GroupModel).offset(skip).limit(limit)
+    if not with_stats:
+        # Статистика меняется при каждом задании и членстве, поэтому кэшируется только список
+        key = ("groups.list", tenant_of(db), skip, limit, db.info.get("replica"))
+        return cached_json(db, key, ["groups"], query.all, List[Group])
+    groups = query.all()
+    stats = group_stats.current_stats(db, [g.id for g in groups])
+    return [
+        GroupWithStats(
+            **Group.model_validate(g).model_dump(),
+            stats=GroupStats.model_validate(stats[g.id]) if g.id in stats else None,
+        )
+        for g in groups
+    ]
 
 @router.get(
     "/{group_id}", 
@@ -92,11 +166,40 @@ def read_groups(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     ID группы является числовым идентификатором в базе данных.
     """
 )
-def read_group(group_id: int, db: Session = Depends(get_db)):
-    db_group = db.query(GroupModel).filter(GroupModel.id == group_id).first()
-    if db_group is None:
-        raise HTTPException(status_code=404, detail="Group not found")
-    return db_group
+def read_group(group_id: int, db: Session = Depends(get_read_db)):
+    def load():
+        db_group = db.query(GroupModel).filter(GroupModel.id == group_id).first()
+        if db_group is None:
+            raise HTTPException(status_code=404, detail="Group not found")
+        return db_group
+
+    key = ("groups.id", tenant_of(db), group_id, db.info.get("replica"))
+    return with_etag(cached_json(db, key, ["groups"], load, Group))
+
+@router.get(
+    "/{group_id}/calendar.ics",
+    response_class=Response,
+    summary="Календарь сроков сдачи заданий группы",
+    description="""
+    Возвращает календарь iCalendar (text/calendar) со сроками сдачи заданий группы:
+    по событию на задание со сроком не раньше CALENDAR_PAST_DAYS дней назад.
+    
+    Календарь хранится в кэше до изменения заданий группы. Ответ содержит ETag и
+    Last-Modified; запрос с If-None-Match или If-Modified-Since получает 304 без
+    обращения к базе, если календарь не изменился.
+    
+    **Параметры пути:**
+    - group_id: ID группы
+    
+    **Ошибки:**
+    - 404: Группа не найдена
+    
+    **Использование:**
+    - GET /groups/123/calendar.ics
+    """
+)
+def read_group_calendar(group_id: int, request: Request, db: Session = Depends(get_read_db)):
+    return ical.feed_response(request, ical.group_feed(db, group_id), f"group-{group_id}.ics")
 
 @router.put(
     "/{group_id}", 
@@ -112,11 +215,16 @@ def read_group(group_id: int, db: Session = Depends(get_db)):
     **Тело запроса:**
     - group: Данные для обновления (GroupUpdate schema)
     
+    **Заголовки:**
+    - If-Match: версия из заголовка ETag ответа GET; если запись с тех пор изменилась,
+      обновление не выполняется и возвращается 412. Ответ содержит ETag новой версии.
+    
     **Возвращает:**
     - Обновленный объект группы
     
     **Ошибки:**
     - 404: Группа с указанным ID не найдена
+    - 412: Версия в If-Match не совпадает с текущей
     
     **Использование:**
     - PUT /groups/123
@@ -126,18 +234,16 @@ def read_group(group_id: int, db: Session = Depends(get_db)):
     Если имя группы изменяется, система проверит уникальность нового имени.
     """
 )
-def update_group(group_id: int, group: GroupUpdate, db: Session = Depends(get_db)):
-    db_group = db.query(GroupModel).filter(GroupModel.id == group_id).first()
-    if db_group is None:
-        raise HTTPException(status_code=404, detail="Group not found")
-    
+def update_group(group_id: int, group: GroupUpdate, response: Response, if_match: Optional[str] = Header(None),
+                 db: Session = Depends(get_write_db)):
     update_data = group.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_group, field, value)
-    
+    row = conditional_update(db, GroupModel, group_id, update_data, parse_if_match(if_match))
+    if row is None:
+        raise_update_failed(db, GroupModel, group_id, "Group not found")
     db.commit()
-    db.refresh(db_group)
-    return db_group
+    invalidate(db, "groups")
+    response.headers["ETag"] = etag(row["version"])
+    return dict(row)
 
 @router.delete(
     "/{group_id}",
@@ -146,30 +252,37 @@ def update_group(group_id: int, group: GroupUpdate, db: Session = Depends(get_db
     Удаляет группу из системы по её внутреннему ID.
     
     **Внимание:** Эта операция необратима. Все данные группы будут удалены.
-    Убедитесь, что удаление группы не нарушит целостность данных системы.
+    Вместе с группой в одной транзакции удаляются ее задания, вложения заданий
+    и членство пользователей.
     
     **Параметры пути:**
     - group_id: Внутренний идентификатор группы для удаления
     
     **Возвращает:**
-    - Сообщение об успешном удалении
+    - Сообщение об успешном удалении и число удаленных заданий, вложений и связей
+    - 202: Если у группы больше CASCADE_BACKGROUND_THRESHOLD заданий (по умолчанию 5000),
+      удаление выполняется в фоне после ответа
     
     **Ошибки:"
     - 404: Группа с указанным ID не найдена
     
     **Использование:**
     - DELETE /groups/123
-    
-    **Примечание:**
-    Перед удалением группы рекомендуется проверить связанные сущности
-    (пользователей, права доступа и т.д.), которые могут ссылаться на эту группу.
     """
 )
-def delete_group(group_id: int, db: Session = Depends(get_db)):
+def delete_group(group_id: int, response: Response, background_tasks: BackgroundTasks,
+                 db: Session = Depends(get_write_db)):
     db_group = db.query(GroupModel).filter(GroupModel.id == group_id).first()
     if db_group is None:
         raise HTTPException(status_code=404, detail="Group not found")
     
-    db.delete(db_group)
-    db.commit()
-    return {"message": "Group deleted successfully"}
\ No newline at end of file
+    homework_count = db.query(GroupStatsModel.homework_count).filter(
+        GroupStatsModel.group_id == group_id
+    ).scalar() or 0
+    if homework_count > cascade.CASCADE_BACKGROUND_THRESHOLD:
+        background_tasks.add_task(cascade.delete_group_in_background, db.get_bind(), group_id, tenant_of(db))
+        response.status_code = 202
+        return {"message": "Group deletion scheduled", "homeworks": homework_count}
+    
+    deleted = cascade.delete_group(db, group_id)
+    return {"message": "Group deleted successfully", **deleted}
\ No newline at end of file
@@ -1,12 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload, noload, selectinload
+from typing import List, Optional, Union
+from app import archive, cascade, group_stats
+from app.cache import cached_json, invalidate
+from app.database import get_read_db, get_write_db, tenant_of
 from app.models.homework import HomeworkModel
-from app.schemas.homework import HomeworkCreate, Homework, HomeworkUpdate
+from app.schemas.homework import HomeworkCreate, Homework, HomeworkUpdate, HomeworkFull
+from app.singleflight import reads
+from app.versioning import conditional_update, etag, parse_if_match, raise_update_failed
+from app.write_queue import run_write
 
 router = APIRouter(prefix="/homeworks", tags=["homeworks"])
 
+# Связанные сущности, которые можно загрузить вместе с заданиями
+EXPANDABLE = {
+    "attachments": selectinload,
+    "group": joinedload,
+    "assigner": joinedload,
+}
+
+def expand_options(fields) -> list:
+    # Нераскрытые связи не загружаются вовсе, чтобы сериализация не порождала N+1 запросов
+    return [
+        (EXPANDABLE[field] if field in fields else noload)(getattr(HomeworkModel, field))
+        for field in EXPANDABLE
+    ]
+
+def parse_expand(expand: Optional[str]) -> tuple:
+    fields = tuple(sorted({field.strip() for field in expand.split(",") if field.strip()})) if expand else ()
+    unknown = [field for field in fields if field not in EXPANDABLE]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown expand fields: {', '.join(unknown)}")
+    return fields
+
 @router.post(
     "/", 
     response_model=Homework,
@@ -29,11 +56,17 @@ router = APIRouter(prefix="/homeworks", tags=["homeworks"])
     Проверьте схему HomeworkCreate для точного списка обязательных полей.
     """
 )
-def create_homework(homework: HomeworkCreate, db: Session = Depends(get_db)):
-    db_homework = HomeworkModel(**homework.dict())
-    db.add(db_homework)
-    db.commit()
-    db.refresh(db_homework)
+def create_homework(homework: HomeworkCreate, db: Session = Depends(get_write_db)):
+    def insert(session: Session):
+        db_homework = HomeworkModel(**homework.dict())
+        session.add(db_homework)
+        session.flush()
+        group_stats.homework_added(session, db_homework.group_id, db_homework.deadline)
+        return db_homework
+
+    db_homework = run_write(db, insert)
+    reads.forget(("homeworks.group", tenant_of(db), db_homework.group_id))
+    invalidate(db, f"group:{db_homework.group_id}")
     return db_homework
 
 @router.get(
@@ -46,6 +79,7 @@ def create_homework(homework: HomeworkCreate, db: Session = Depends(get_db)):
     **Параметры запроса:**
     - skip: Количество записей для пропуска (для пагинации)
     - limit: Максимальное количество возвращаемых записей (максимум 100)
+    - include_archived: Включить задания, перенесенные в архив (поле archived)
     
     **Возвращает:**
     - Список объектов домашних заданий
@@ -53,12 +87,18 @@ def create_homework(homework: HomeworkCreate, db: Session = Depends(get_db)):
     **Использование:**
     - GET /homeworks/?skip=0&limit=20
     - GET /homeworks/?limit=50
+    - GET /homeworks/?include_archived=true
     
     **Примечание:**
     Для получения заданий конкретной группы используйте /homeworks/group/{group_id}
     """
 )
-def read_homeworks(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_homeworks(skip: int = 0, limit: int = 100, include_archived: bool = False,
+                   db: Session = Depends(get_read_db)):
+    if include_archived:
+        homeworks = archive.homeworks_query(True)
+        rows = db.execute(select(homeworks).order_by(homeworks.c.id).offset(skip).limit(limit)).mappings()
+        return [dict(row) for row in rows]
     homeworks = db.query(HomeworkModel).offset(skip).limit(limit).all()
     return homeworks
 
@@ -72,6 +112,9 @@ def read_homeworks(skip: int = 0, limit: int = 100, db: Session = Depends(get_db
     **Параметры пути:**
     - homework_id: Внутренний идентификатор домашнего задания в системе
     
+    **Параметры запроса:**
+    - include_archived: Искать задание также в архиве
+    
     **Возвращает:**
     - Объект домашнего задания с детальной информацией
     
@@ -86,15 +129,57 @@ def read_homeworks(skip: int = 0, limit: int = 100, db: Session = Depends(get_db
     ID домашнего задания является числовым идентификатором в базе данных.
     """
 )
-def read_homework(homework_id: int, db: Session = Depends(get_db)):
+def read_homework(homework_id: int, response: Response, include_archived: bool = False,
+                  db: Session = Depends(get_read_db)):
+    if include_archived:
+        homeworks = archive.homeworks_query(True)
+        row = db.execute(select(homeworks).where(homeworks.c.id == homework_id)).mappings().first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Homework not found")
+        response.headers["ETag"] = etag(row["version"])
+        return dict(row)
     db_homework = db.query(HomeworkModel).filter(HomeworkModel.id == homework_id).first()
+    if db_homework is None:
+        raise HTTPException(status_code=404, detail="Homework not found")
+    response.headers["ETag"] = etag(db_homework.version)
+    return db_homework
+
+@router.get(
+    "/{homework_id}/full",
+    response_model=HomeworkFull,
+    summary="Получить домашнее задание со связанными данными",
+    description="""
+    Возвращает домашнее задание вместе с вложениями, группой и назначившим пользователем.
+    Заменяет четыре запроса (задание, вложения, группа, пользователь) одним.
+    
+    **Параметры пути:**
+    - homework_id: Внутренний идентификатор домашнего задания
+    
+    **Возвращает:**
+    - Задание с полями attachments, group и assigner
+    
+    **Ошибки:**
+    - 404: Домашнее задание с указанным ID не найдено
+    
+    **Использование:**
+    - GET /homeworks/123/full
+    """
+)
+def read_homework_full(homework_id: int, db: Session = Depends(get_read_db)):
+    db_homework = (
+        db.query(HomeworkModel)
+        .options(*expand_options(EXPANDABLE))
+        .filter(HomeworkModel.id == homework_id)
+        .first()
+    )
     if db_homework is None:
         raise HTTPException(status_code=404, detail="Homework not found")
     return db_homework
 
 @router.get(
     "/group/{group_id}", 
-    response_model=List[Homework],
+    # С expand элементы содержат раскрытые поля (HomeworkFull)
+    response_model=List[Union[HomeworkFull, Homework]],
     summary="Получить домашние задания по ID группы",
     description="""
     Возвращает список домашних заданий для конкретной группы.
@@ -102,21 +187,52 @@ def read_homework(homework_id: int, db: Session = Depends(get_db)):
     **Параметры пути:**
     - group_id: Идентификатор группы, для которой нужно получить задания
     
+    **Параметры запроса:**
+    - expand: Связанные данные через запятую: attachments, group, assigner (опционально).
+      Загружаются фиксированным числом запросов независимо от числа заданий
+    - include_archived: Включить задания группы, перенесенные в архив (без expand)
+    
     **Возвращает:"
     - Список объектов домашних заданий, принадлежащих указанной группе
     
+    **Ошибки:**
+    - 400: Неизвестное значение в expand или expand вместе с include_archived
+    
     **Использование:**
     - GET /homeworks/group/123
     - GET /homeworks/group/45
+    - GET /homeworks/group/45?expand=attachments,assigner
     
     **Примечание:**
     Полезно для отображения всех заданий конкретной учебной группы.
     Возвращает как активные, так и завершенные задания.
+    Ответ хранится в кэше ответов до изменения заданий группы; одновременные промахи
+    кэша выполняют один запрос к базе. Без кэша (CACHE_BACKEND=none) одновременные
+    запросы для одной группы объединяются (app.singleflight).
     """
 )
-def read_group_homeworks(group_id: int, db: Session = Depends(get_db)):
-    homeworks = db.query(HomeworkModel).filter(HomeworkModel.group_id == group_id).all()
-    return homeworks
+def read_group_homeworks(group_id: int, expand: Optional[str] = None, include_archived: bool = False,
+                         db: Session = Depends(get_read_db)):
+    fields = parse_expand(expand)
+    # Ответы реплики и основной базы не объединяются: после записи клиент читает свои данные
+    source = db.info.get("replica")
+    tags = [f"group:{group_id}"]
+    if include_archived:
+        if fields:
+            raise HTTPException(status_code=400, detail="expand is not supported with include_archived")
+        homeworks = archive.homeworks_query(True)
+        statement = select(homeworks).where(homeworks.c.group_id == group_id).order_by(homeworks.c.id)
+        return cached_json(db, ("homeworks.group", tenant_of(db), group_id, source, "archived"), tags,
+                           lambda: [dict(row) for row in db.execute(statement).mappings()], List[Homework])
+    query = db.query(HomeworkModel).filter(HomeworkModel.group_id == group_id)
+    if not fields:
+        return cached_json(db, ("homeworks.group", tenant_of(db), group_id, source), tags, query.all, List[Homework])
+    # Раскрытые группа и автор меняются независимо от заданий группы
+    tags += [tag for field, tag in (("group", "groups"), ("assigner", "users")) if field in fields]
+    query = query.options(*expand_options(fields))
+    hidden = {"__all__": set(EXPANDABLE) - set(fields)}
+    return cached_json(db, ("homeworks.group", tenant_of(db), group_id, source, fields), tags, query.all,
+                       List[HomeworkFull], exclude=hidden)
 
 @router.put(
     "/{homework_id}", 
@@ -132,11 +248,17 @@ def read_group_homeworks(group_id: int, db: Session = Depends(get_db)):
     **Тело запроса:**
     - homework: Данные для обновления (HomeworkUpdate schema)
     
+    **Заголовки:**
+    - If-Match: версия из заголовка ETag ответа GET; если запись с тех пор изменилась,
+      обновление не выполняется и возвращается 412. Ответ содержит ETag новой версии.
+    
     **Возвращает:**
     - Обновленный объект домашнего задания
     
     **Ошибки:**
     - 404: Домашнее задание с указанным ID не найдено
+    - 412: Версия в If-Match не совпадает с текущей (или задание изменено
+      одновременно с переносом срока сдачи - повторите запрос)
     
     **Использование:**
     - PUT /homeworks/123
@@ -146,18 +268,33 @@ def read_group_homeworks(group_id: int, db: Session = Depends(get_db)):
     Часто обновляемые поля: title, description, deadline, is_completed.
     """
 )
-def update_homework(homework_id: int, homework: HomeworkUpdate, db: Session = Depends(get_db)):
-    db_homework = db.query(HomeworkModel).filter(HomeworkModel.id == homework_id).first()
-    if db_homework is None:
-        raise HTTPException(status_code=404, detail="Homework not found")
-    
+def update_homework(homework_id: int, homework: HomeworkUpdate, response: Response,
+                    if_match: Optional[str] = Header(None), db: Session = Depends(get_write_db)):
     update_data = homework.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_homework, field, value)
-    
+    versions = parse_if_match(if_match)
+    old = None
+    if "deadline" in update_data:
+        # Статистика группы зависит от прежнего срока: он читается вместе с версией,
+        # и UPDATE выполняется, только если запись с тех пор не менялась
+        old = (
+            db.query(HomeworkModel.group_id, HomeworkModel.deadline, HomeworkModel.version)
+            .filter(HomeworkModel.id == homework_id)
+            .first()
+        )
+        if old is None:
+            raise HTTPException(status_code=404, detail="Homework not found")
+        versions = {old.version} if versions is None or old.version in versions else set()
+    
+    row = conditional_update(db, HomeworkModel, homework_id, update_data, versions)
+    if row is None:
+        raise_update_failed(db, HomeworkModel, homework_id, "Homework not found")
+    if old is not None:
+        group_stats.homework_updated(db, old.group_id, old.deadline, row["group_id"], row["deadline"])
     db.commit()
-    db.refresh(db_homework)
-    return db_homework
+    reads.forget(("homeworks.group", tenant_of(db), row["group_id"]))
+    invalidate(db, f"group:{row['group_id']}")
+    response.headers["ETag"] = etag(row["version"])
+    return dict(row)
 
 @router.delete(
     "/{homework_id}",
@@ -171,8 +308,10 @@ def update_homework(homework_id: int, homework: HomeworkUpdate, db: Session = De
     **Параметры пути:**
     - homework_id: Внутренний идентификатор домашнего задания для удаления
     
+    Вложения задания удаляются вместе с ним в одной транзакции.
+    
     **Возвращает:**
-    - Сообщение об успешном удалении
+    - Сообщение об успешном удалении и число удаленных вложений
     
     **Ошибки:**
     - 404: Домашнее задание с указанным ID не найдено
@@ -185,11 +324,10 @@ def update_homework(homework_id: int, homework: HomeworkUpdate, db: Session = De
     Рассмотрите возможность архивирования вместо полного удаления.
     """
 )
-def delete_homework(homework_id: int, db: Session = Depends(get_db)):
+def delete_homework(homework_id: int, db: Session = Depends(get_write_db)):
     db_homework = db.query(HomeworkModel).filter(HomeworkModel.id == homework_id).first()
     if db_homework is None:
         raise HTTPException(status_code=404, detail="Homework not found")
     
-    db.delete(db_homework)
-    db.commit()
-    return {"message": "Homework deleted successfully"}
\ No newline at end of file
+    deleted = cascade.delete_homework(db, db_homework)
+    return {"message": "Homework deleted successfully", **deleted}
\ No newline at end of file
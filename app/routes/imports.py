@@ -0,0 +1,50 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.orm import Session
+from typing import Optional
+from app import imports
+from app.database import get_write_db
+from app.schemas.imports import ImportResult
+
+router = APIRouter(prefix="/import", tags=["import"])
+
+@router.post(
+    "/{entity}",
+    response_model=ImportResult,
+    summary="Массовый импорт пользователей, групп или заданий",
+    description="""
+    Создает записи из тела запроса в формате CSV (первая строка - заголовок с именами полей)
+    или NDJSON (один JSON-объект в строке). Тело читается потоком, строки проверяются
+    схемами UserCreate, GroupCreate, HomeworkCreate и вставляются пачками по
+    IMPORT_CHUNK_SIZE строк, каждая пачка - в своей транзакции.
+    
+    Пользователи с существующим telegram_id и группы с существующим названием пропускаются
+    (skipped), задания для несуществующих групп не создаются. Ошибка в строке не
+    останавливает импорт: строка попадает в отчет с номером и причиной.
+    
+    **Параметры пути:**
+    - entity: users, groups или homeworks
+    
+    **Параметры запроса:**
+    - format: csv или ndjson (по умолчанию - по Content-Type: text/csv или application/x-ndjson)
+    
+    **Возвращает:**
+    - Число прочитанных строк, созданных записей, пропущенных дубликатов и ошибок,
+      ошибки по строкам (не больше IMPORT_MAX_ERRORS)
+    
+    **Ошибки:**
+    - 404: Неизвестная сущность
+    - 415: Формат не указан или не поддерживается
+    
+    **Использование:**
+    - POST /import/users с Content-Type: text/csv
+    - POST /import/homeworks?format=ndjson
+    """
+)
+async def import_rows(entity: str, request: Request, format: Optional[str] = Query(None),
+                      db: Session = Depends(get_write_db)):
+    if entity not in imports.ENTITIES:
+        raise HTTPException(status_code=404, detail="Unknown import entity")
+    data_format = imports.detect_format(request.headers.get("content-type"), format)
+    if data_format is None:
+        raise HTTPException(status_code=415, detail="Use text/csv or application/x-ndjson")
+    return await imports.import_stream(db, entity, data_format, request.stream())
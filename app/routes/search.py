@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import List
+from app import search as search_index
+from app.database import get_read_db
+from app.schemas.search import SearchResult
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+@router.get(
+    "",
+    response_model=List[SearchResult],
+    summary="Полнотекстовый поиск",
+    description="""
+    Ищет по названиям и описаниям домашних заданий и групп.
+    Результаты упорядочены по релевантности, совпадения выделены тегами <b>.
+    Текст заголовка и фрагмента не экранируется: при выводе как HTML его экранирует клиент.
+    
+    **Параметры запроса:**
+    - q: Поисковый запрос; последнее слово ищется как префикс
+    - skip: Количество результатов для пропуска (для пагинации)
+    - limit: Максимальное количество результатов (максимум 100)
+    - include_archived: Искать также среди архивных заданий (поле archived в результате)
+    
+    **Возвращает:**
+    - Список результатов: тип (homework/group), ID, заголовок, фрагмент описания
+    
+    **Ошибки:**
+    - 501: Полнотекстовый поиск недоступен для текущей базы данных
+    
+    **Использование:**
+    - GET /search?q=дроби
+    - GET /search?q=python циклы&skip=20&limit=20
+    """
+)
+def search(q: str, skip: int = Query(0, ge=0), limit: int = Query(20, ge=1, le=100), include_archived: bool = False,
+           db: Session = Depends(get_read_db)):
+    if db.get_bind().dialect.name != "sqlite":
+        raise HTTPException(status_code=501, detail="Full-text search requires SQLite FTS5")
+    return search_index.search(db, q, skip=skip, limit=limit, include_archived=include_archived)
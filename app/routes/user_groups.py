@@ -1,12 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from typing import List
-from app.database import get_db
+from app import group_stats
+from app.database import get_db, get_read_db, get_write_db
+from app.invalidation import bus
+from app.membership import membership_for, role_satisfies
 from app.models.user_group import UserGroupModel
-from app.schemas.user_group import UserGroupCreate, UserGroup
+from app.schemas.user_group import UserGroupCreate, UserGroup, MembershipCheck, MembershipCheckResult
+from app.write_queue import run_write
 
 router = APIRouter(prefix="/user-groups", tags=["user_groups"])
 
+MEMBERSHIP_CHECK_MAX_SIZE = 1000
+
 @router.post(
     "/",
     response_model=UserGroup,
@@ -29,21 +35,67 @@ router = APIRouter(prefix="/user-groups", tags=["user_groups"])
     - POST /user-groups/
     """
 )
-def add_user_to_group(user_group: UserGroupCreate, db: Session = Depends(get_db)):
-    # Проверяем, существует ли уже такая связь
-    db_user_group = db.query(UserGroupModel).filter(
-        UserGroupModel.user_id == user_group.user_id,
-        UserGroupModel.group_id == user_group.group_id
-    ).first()
+def add_user_to_group(user_group: UserGroupCreate, db: Session = Depends(get_write_db)):
+    membership = membership_for(db)
+
+    def insert(session: Session):
+        # Проверяем, существует ли уже такая связь
+        db_user_group = session.query(UserGroupModel).filter(
+            UserGroupModel.user_id == user_group.user_id,
+            UserGroupModel.group_id == user_group.group_id
+        ).first()
+
+        if db_user_group:
+            raise HTTPException(status_code=400, detail="User already in group")
+
+        db_user_group = UserGroupModel(**user_group.dict())
+        session.add(db_user_group)
+        session.flush()
+        group_stats.members_changed(session, user_group.group_id, 1)
+        return db_user_group, bus.publish(session, membership.cache_name)
+
+    db_user_group, version = run_write(db, insert)
+    membership.set(user_group.user_id, user_group.group_id, user_group.user_role)
+    bus.acknowledge(membership.cache_name, version)
+    return db_user_group
+
+@router.post(
+    "/check",
+    response_model=List[MembershipCheckResult],
+    summary="Проверить членство и роли пользователей в группах",
+    description="""
+    Проверяет для каждого набора (user_id, group_id, required_role), состоит ли
+    пользователь в группе и удовлетворяет ли его роль требуемой (admin включает member).
+    Ответ формируется из индекса членства в памяти без обращения к базе данных.
     
-    if db_user_group:
-        raise HTTPException(status_code=400, detail="User already in group")
+    **Параметры тела:**
+    - Список проверок (до 1000): user_id, group_id, required_role (необязательно)
     
-    db_user_group = UserGroupModel(**user_group.dict())
-    db.add(db_user_group)
-    db.commit()
-    db.refresh(db_user_group)
-    return db_user_group
+    **Возвращает:**
+    - Результаты в том же порядке: member, role, allowed
+    
+    **Ошибки:**
+    - 400: Слишком много проверок в одном запросе
+    
+    **Использование:**
+    - POST /user-groups/check
+    """
+)
+def check_memberships(checks: List[MembershipCheck], db: Session = Depends(get_db)):
+    if len(checks) > MEMBERSHIP_CHECK_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"Too many checks (max {MEMBERSHIP_CHECK_MAX_SIZE})")
+    membership = membership_for(db)
+    membership.ensure_loaded(db)
+    results = []
+    for check in checks:
+        role = membership.role(check.user_id, check.group_id)
+        results.append(MembershipCheckResult(
+            **check.dict(),
+            member=role is not None,
+            role=role,
+            allowed=role_satisfies(role, check.required_role),
+        ))
+    return results
 
 @router.get(
     "/",
@@ -64,7 +116,7 @@ def add_user_to_group(user_group: UserGroupCreate, db: Session = Depends(get_db)
     - GET /user-groups/?skip=10&limit=50
     """
 )
-def read_user_groups(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_user_groups(skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
     user_groups = db.query(UserGroupModel).offset(skip).limit(limit).all()
     return user_groups
 
@@ -88,7 +140,7 @@ def read_user_groups(skip: int = 0, limit: int = 100, db: Session = Depends(get_
     - GET /user-groups/user/123
     """
 )
-def read_user_groups_by_user(user_id: int, db: Session = Depends(get_db)):
+def read_user_groups_by_user(user_id: int, db: Session = Depends(get_read_db)):
     user_groups = db.query(UserGroupModel).filter(UserGroupModel.user_id == user_id).all()
     return user_groups
 
@@ -112,7 +164,7 @@ def read_user_groups_by_user(user_id: int, db: Session = Depends(get_db)):
     - GET /user-groups/group/456
     """
 )
-def read_group_users(group_id: int, db: Session = Depends(get_db)):
+def read_group_users(group_id: int, db: Session = Depends(get_read_db)):
     user_groups = db.query(UserGroupModel).filter(UserGroupModel.group_id == group_id).all()
     return user_groups
 
@@ -138,15 +190,15 @@ def read_group_users(group_id: int, db: Session = Depends(get_db)):
     """
 )
 def read_user_group(user_id: int, group_id: int, db: Session = Depends(get_db)):
-    user_group = db.query(UserGroupModel).filter(
-        UserGroupModel.user_id == user_id,
-        UserGroupModel.group_id == group_id
-    ).first()
+    # Ответ из индекса членства в памяти
+    membership = membership_for(db)
+    membership.ensure_loaded(db)
+    role = membership.role(user_id, group_id)
     
-    if user_group is None:
+    if role is None:
         raise HTTPException(status_code=404, detail="User not found in group")
     
-    return user_group
+    return UserGroup(user_id=user_id, group_id=group_id, user_role=role)
 
 @router.put(
     "/{user_id}/{group_id}",
@@ -172,7 +224,7 @@ def read_user_group(user_id: int, group_id: int, db: Session = Depends(get_db)):
     - PUT /user-groups/123/456
     """
 )
-def update_user_group_role(user_id: int, group_id: int, user_role: str, db: Session = Depends(get_db)):
+def update_user_group_role(user_id: int, group_id: int, user_role: str, db: Session = Depends(get_write_db)):
     user_group = db.query(UserGroupModel).filter(
         UserGroupModel.user_id == user_id,
         UserGroupModel.group_id == group_id
@@ -182,8 +234,12 @@ def update_user_group_role(user_id: int, group_id: int, user_role: str, db: Sess
         raise HTTPException(status_code=404, detail="User not found in group")
     
     user_group.user_role = user_role
+    membership = membership_for(db)
+    version = bus.publish(db, membership.cache_name)
     db.commit()
     db.refresh(user_group)
+    membership.set(user_id, group_id, user_role)
+    bus.acknowledge(membership.cache_name, version)
     return user_group
 
 @router.delete(
@@ -213,7 +269,7 @@ def update_user_group_role(user_id: int, group_id: int, user_role: str, db: Sess
     и функциональности, связанной с этой группе.
     """
 )
-def remove_user_from_group(user_id: int, group_id: int, db: Session = Depends(get_db)):
+def remove_user_from_group(user_id: int, group_id: int, db: Session = Depends(get_write_db)):
     user_group = db.query(UserGroupModel).filter(
         UserGroupModel.user_id == user_id,
         UserGroupModel.group_id == group_id
@@ -223,5 +279,10 @@ def remove_user_from_group(user_id: int, group_id: int, db: Session = Depends(ge
         raise HTTPException(status_code=404, detail="User not found in group")
     
     db.delete(user_group)
+    group_stats.members_changed(db, group_id, -1)
+    membership = membership_for(db)
+    version = bus.publish(db, membership.cache_name)
     db.commit()
+    membership.remove(user_id, group_id)
+    bus.acknowledge(membership.cache_name, version)
     return {"message": "User removed from group successfully"}
\ No newline at end of file
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from typing import List
-from app.database import get_db
-from app.models.user import UserModel
+from typing import List, Optional
+from app import cascade, ical
+from app.cache import cached_json, invalidate
+from app.database import get_read_db, get_write_db, tenant_of
+from app.models.user import UserModel, fold
 from app.schemas.user import UserCreate, User, UserUpdate
+from app.versioning import conditional_update, etag, parse_if_match, raise_update_failed, with_etag
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -27,7 +30,7 @@ router = APIRouter(prefix="/users", tags=["users"])
     - 400: Пользователь с таким telegram_id уже существует
     """
 )
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
+def create_user(user: UserCreate, db: Session = Depends(get_write_db)):
     # Проверяем, существует ли пользователь с таким telegram_id
     db_user = db.query(UserModel).filter(UserModel.telegram_id == user.telegram_id).first()
     if db_user:
@@ -57,10 +60,59 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     - GET /users/?skip=0&limit=20
     """
 )
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
     users = db.query(UserModel).offset(skip).limit(limit).all()
     return users
 
+def prefix_filter(column, prefix: str):
+    # Диапазон [prefix, следующая строка) использует индекс, в отличие от LIKE
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return (column >= prefix) & (column < upper)
+
+@router.get(
+    "/search",
+    response_model=List[User],
+    summary="Поиск пользователей по началу имени",
+    description="""
+    Возвращает пользователей, у которых ФИО или юзернейм начинается с указанной строки.
+    Регистр не учитывается, буквы ё и е не различаются. Предназначен для автодополнения.
+    
+    **Параметры запроса:**
+    - prefix: Начало ФИО или юзернейма (символ @ в начале игнорируется)
+    - limit: Максимальное количество возвращаемых записей (максимум 50)
+    
+    **Возвращает:**
+    - Список пользователей, отсортированный по ФИО
+    
+    **Использование:**
+    - GET /users/search?prefix=иван&limit=10
+    """
+)
+def search_users(
+    prefix: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_read_db),
+):
+    folded = fold(prefix.strip())
+    if not folded:
+        return []
+    by_name = (
+        db.query(UserModel)
+        .filter(prefix_filter(UserModel.full_name_folded, folded))
+        .order_by(UserModel.full_name_folded)
+        .limit(limit)
+        .all()
+    )
+    by_username = (
+        db.query(UserModel)
+        .filter(prefix_filter(UserModel.username_folded, folded.lstrip("@") or folded))
+        .order_by(UserModel.username_folded)
+        .limit(limit)
+        .all()
+    )
+    users = {user.id: user for user in by_name + by_username}
+    return sorted(users.values(), key=lambda user: (user.full_name_folded, user.id))[:limit]
+
 @router.get(
     "/{user_id}", 
     response_model=User,
@@ -81,11 +133,41 @@ def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     - GET /users/123
     """
 )
-def read_user(user_id: int, db: Session = Depends(get_db)):
-    db_user = db.query(UserModel).filter(UserModel.id == user_id).first()
-    if db_user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-    return db_user
+def read_user(user_id: int, db: Session = Depends(get_read_db)):
+    def load():
+        db_user = db.query(UserModel).filter(UserModel.id == user_id).first()
+        if db_user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        return db_user
+
+    key = ("users.id", tenant_of(db), user_id, db.info.get("replica"))
+    return with_etag(cached_json(db, key, ["users"], load, User))
+
+@router.get(
+    "/{user_id}/calendar.ics",
+    response_class=Response,
+    summary="Календарь сроков сдачи заданий пользователя",
+    description="""
+    Возвращает календарь iCalendar (text/calendar) со сроками сдачи заданий всех групп
+    пользователя: по событию на задание со сроком не раньше CALENDAR_PAST_DAYS дней назад.
+    Ссылку можно добавить в календарное приложение как подписку.
+    
+    Календарь хранится в кэше до изменения заданий групп пользователя или его групп.
+    Ответ содержит ETag и Last-Modified; запрос с If-None-Match или If-Modified-Since
+    получает 304 без обращения к базе, если календарь не изменился.
+    
+    **Параметры пути:**
+    - user_id: Внутренний идентификатор пользователя
+    
+    **Ошибки:**
+    - 404: Пользователь не найден
+    
+    **Использование:**
+    - GET /users/123/calendar.ics
+    """
+)
+def read_user_calendar(user_id: int, request: Request, db: Session = Depends(get_read_db)):
+    return ical.feed_response(request, ical.user_feed(db, user_id), f"user-{user_id}.ics")
 
 @router.get(
     "/telegram/{telegram_id}", 
@@ -108,11 +190,15 @@ def read_user(user_id: int, db: Session = Depends(get_db)):
     - GET /users/telegram/123456789
     """
 )
-def read_user_by_telegram(telegram_id: int, db: Session = Depends(get_db)):
-    db_user = db.query(UserModel).filter(UserModel.telegram_id == telegram_id).first()
-    if db_user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-    return db_user
+def read_user_by_telegram(telegram_id: int, db: Session = Depends(get_read_db)):
+    def load():
+        db_user = db.query(UserModel).filter(UserModel.telegram_id == telegram_id).first()
+        if db_user is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        return db_user
+
+    key = ("users.telegram", tenant_of(db), telegram_id, db.info.get("replica"))
+    return with_etag(cached_json(db, key, ["users"], load, User))
 
 @router.put(
     "/{user_id}", 
@@ -128,28 +214,36 @@ def read_user_by_telegram(telegram_id: int, db: Session = Depends(get_db)):
     **Тело запроса:**
     - user: Данные для обновления (UserUpdate schema)
     
+    **Заголовки:**
+    - If-Match: версия из заголовка ETag ответа GET; если запись с тех пор изменилась,
+      обновление не выполняется и возвращается 412. Ответ содержит ETag новой версии.
+    
     **Возвращает:**
     - Обновленный объект пользователя
     
     **Ошибки:**
     - 404: Пользователь с указанным ID не найден
+    - 412: Версия в If-Match не совпадает с текущей
     
     **Использование:**
     - PUT /users/123
     """
 )
-def update_user(user_id: int, user: UserUpdate, db: Session = Depends(get_db)):
-    db_user = db.query(UserModel).filter(UserModel.id == user_id).first()
-    if db_user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-    
+def update_user(user_id: int, user: UserUpdate, response: Response, if_match: Optional[str] = Header(None),
+                db: Session = Depends(get_write_db)):
     update_data = user.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_user, field, value)
+    # UPDATE без ORM не вызывает @validates: нормализованные столбцы заполняются явно
+    for field in ("username", "full_name"):
+        if field in update_data:
+            update_data[f"{field}_folded"] = fold(update_data[field])
     
+    row = conditional_update(db, UserModel, user_id, update_data, parse_if_match(if_match))
+    if row is None:
+        raise_update_failed(db, UserModel, user_id, "User not found")
     db.commit()
-    db.refresh(db_user)
-    return db_user
+    invalidate(db, "users")
+    response.headers["ETag"] = etag(row["version"])
+    return dict(row)
 
 @router.delete(
     "/{user_id}",
@@ -172,11 +266,11 @@ def update_user(user_id: int, user: UserUpdate, db: Session = Depends(get_db)):
     - DELETE /users/123
     """
 )
-def delete_user(user_id: int, db: Session = Depends(get_db)):
+def delete_user(user_id: int, db: Session = Depends(get_write_db)):
     db_user = db.query(UserModel).filter(UserModel.id == user_id).first()
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
     
-    db.delete(db_user)
-    db.commit()
+    # Членство пользователя в группах удаляется вместе с ним
+    cascade.delete_user(db, user_id)
     return {"message": "User deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class ArchiveRequest(BaseModel):
+    older_than_days: Optional[int] = Field(None, ge=0, description="Возраст срока сдачи в днях (по умолчанию ARCHIVE_AFTER_DAYS)")
+    batch_size: Optional[int] = Field(None, ge=1, le=10000, description="Заданий в одной транзакции (по умолчанию ARCHIVE_BATCH_SIZE)")
+
+class ArchiveResult(BaseModel):
+    homeworks: int = Field(..., description="Перенесено заданий")
+    attachments: int = Field(..., description="Перенесено вложений")
+    batches: int = Field(..., description="Число транзакций")
@@ -5,6 +5,7 @@ from typing import Optional
 class AttachmentBase(BaseModel):
     homework_id: int = Field(..., description="ID домашнего задания")
     file_id: str = Field(..., description="File ID от Telegram")
+    file_unique_id: Optional[str] = Field(None, description="File unique ID от Telegram")
     file_type: str = Field(..., description="Тип файла")
     file_name: str = Field(..., description="Имя файла")
     caption: Optional[str] = Field(None, description="Подпись к файлу")
@@ -18,6 +19,8 @@ class AttachmentUpdate(BaseModel):
 class Attachment(AttachmentBase):
     id: int
     uploaded_at: datetime
+    version: int = Field(..., description="Версия записи (ETag)")
+    archived: bool = Field(False, description="Запись перенесена в архив")
 
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -0,0 +1,26 @@
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Dict, Optional
+
+class BackupRequest(BaseModel):
+    compress: bool = Field(True, description="Сжать копию gzip")
+    verify: bool = Field(True, description="Проверить копию после создания (PRAGMA integrity_check и число строк)")
+
+class BackupVerify(BaseModel):
+    integrity: str = Field(..., description="Результат PRAGMA integrity_check (ok - копия целая)")
+    rows: Dict[str, int] = Field(..., description="Число строк по таблицам")
+
+class BackupResult(BaseModel):
+    file: str = Field(..., description="Имя файла копии в BACKUP_DIR")
+    bytes: int = Field(..., description="Размер файла")
+    seconds: float = Field(..., description="Время создания копии")
+    steps: int = Field(..., description="Число шагов копирования")
+    restarts: int = Field(..., description="Сколько раз копирование начиналось заново из-за записи")
+    single_step: bool = Field(..., description="Копия снята за один шаг после BACKUP_MAX_RESTARTS перезапусков")
+    pages: int = Field(..., description="Страниц в базе")
+    verify: Optional[BackupVerify] = Field(None, description="Результат проверки копии")
+
+class BackupFile(BaseModel):
+    file: str = Field(..., description="Имя файла копии")
+    bytes: int = Field(..., description="Размер файла")
+    created_at: datetime = Field(..., description="Время создания")
@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Optional
+
+class BatchOperation(BaseModel):
+    method: str = Field(..., description="HTTP-метод подзапроса")
+    path: str = Field(..., description="Путь подзапроса, может содержать ссылки вида $0.id")
+    body: Optional[Any] = Field(None, description="Тело подзапроса (JSON)")
+    headers: Optional[Dict[str, str]] = Field(
+        None, description="Заголовки подзапроса (например, If-Match), дополняют заголовки пакета"
+    )
+
+class BatchResult(BaseModel):
+    status: int = Field(..., description="HTTP-статус подзапроса")
+    body: Optional[Any] = Field(None, description="Тело ответа подзапроса")
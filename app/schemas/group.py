@@ -17,6 +17,30 @@ class GroupUpdate(BaseModel):
 class Group(GroupBase):
     id: int
     created_at: datetime
+    version: int = Field(..., description="Версия записи (ETag)")
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class GroupStats(BaseModel):
+    member_count: int = Field(..., description="Число участников")
+    homework_count: int = Field(..., description="Число заданий")
+    next_deadline: Optional[datetime] = Field(None, description="Ближайший срок сдачи")
+    last_activity: Optional[datetime] = Field(None, description="Время последнего изменения")
+
+    class Config:
+        from_attributes = True
+
+class GroupWithStats(Group):
+    stats: Optional[GroupStats] = None
+
+class GroupClone(BaseModel):
+    name: str = Field(..., description="Название новой группы")
+    description: Optional[str] = Field(None, description="Описание (по умолчанию - как у исходной группы)")
+    created_by: Optional[int] = Field(None, description="ID создателя (по умолчанию - создатель исходной группы)")
+    deadline_offset_days: int = Field(0, description="Сдвиг сроков сдачи заданий в днях")
+
+class GroupCloneResult(BaseModel):
+    group: Group
+    homeworks: int = Field(..., description="Число скопированных заданий")
+    attachments: int = Field(..., description="Число скопированных вложений")
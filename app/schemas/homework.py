@@ -1,6 +1,9 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
+from app.schemas.attachment import Attachment
+from app.schemas.group import Group
+from app.schemas.user import User
 
 class HomeworkBase(BaseModel):
     group_id: int = Field(..., description="ID группы")
@@ -20,6 +23,13 @@ class HomeworkUpdate(BaseModel):
 class Homework(HomeworkBase):
     id: int
     created_at: datetime
+    version: int = Field(..., description="Версия записи (ETag)")
+    archived: bool = Field(False, description="Запись перенесена в архив")
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class HomeworkFull(Homework):
+    attachments: List[Attachment] = []
+    group: Optional[Group] = None
+    assigner: Optional[User] = None
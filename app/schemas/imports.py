@@ -0,0 +1,15 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+class ImportRowError(BaseModel):
+    row: int = Field(..., description="Номер строки данных (без заголовка CSV), начиная с 1")
+    error: str = Field(..., description="Причина")
+
+class ImportResult(BaseModel):
+    entity: str = Field(..., description="Импортируемая сущность")
+    rows: int = Field(..., description="Прочитано строк")
+    inserted: int = Field(..., description="Создано записей")
+    skipped: int = Field(..., description="Пропущено дубликатов")
+    failed: int = Field(..., description="Строк с ошибками")
+    errors: List[ImportRowError] = Field(..., description="Ошибки по строкам (не больше IMPORT_MAX_ERRORS)")
+    errors_truncated: bool = Field(..., description="В отчет попали не все ошибки")
@@ -0,0 +1,13 @@
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Any, Dict
+
+class MaintenanceReport(BaseModel):
+    started_at: datetime = Field(..., description="Время начала обхода")
+    trigger: str = Field(..., description="schedule - по расписанию, manual - по запросу")
+    load: int = Field(..., description="Активных запросов в начале обхода")
+    completed: bool = Field(..., description="false - обход прерван из-за нагрузки")
+    seconds: float = Field(..., description="Длительность обхода")
+    databases: Dict[str, Dict[str, Any]] = Field(
+        ..., description="По базам (main или школа): analyze, incremental_vacuum, wal_checkpoint"
+    )
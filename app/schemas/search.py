@@ -0,0 +1,10 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+class SearchResult(BaseModel):
+    type: str = Field(..., description="Тип записи (homework/group)")
+    id: int = Field(..., description="ID задания или группы")
+    title: str = Field(..., description="Заголовок с подсветкой совпадений")
+    snippet: Optional[str] = Field(None, description="Фрагмент описания с подсветкой совпадений")
+    archived: bool = Field(False, description="Задание перенесено в архив")
+    score: float = Field(..., description="Релевантность (bm25, меньше - лучше)")
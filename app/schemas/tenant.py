@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import Dict
+
+class TenantCreate(BaseModel):
+    id: str = Field(..., pattern=r"^[a-z0-9][a-z0-9_-]{0,63}$", description="Идентификатор школы")
+    node: str = Field(..., description="Узел хранения (из TENANT_NODES)")
+
+class Tenant(TenantCreate):
+    status: str = Field(..., description="Состояние (active/moving)")
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class TenantMove(BaseModel):
+    node: str = Field(..., description="Узел хранения, на который переносится школа")
+
+class TenantMoveResult(BaseModel):
+    tenant: Tenant
+    from_node: str
+    rows: Dict[str, int] = Field(..., description="Число скопированных строк по таблицам")
@@ -19,6 +19,7 @@ class UserUpdate(BaseModel):
 class User(UserBase):
     id: int
     created_at: datetime
+    version: int = Field(..., description="Версия записи (ETag)")
 
     class Config:
         from_attributes = True
\ No newline at end of file
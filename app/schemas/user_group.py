@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field
+from typing import Optional
 
 class UserGroupBase(BaseModel):
     user_id: int = Field(..., description="ID пользователя")
@@ -10,4 +11,14 @@ class UserGroupCreate(UserGroupBase):
 
 class UserGroup(UserGroupBase):
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class MembershipCheck(BaseModel):
+    user_id: int = Field(..., description="ID пользователя")
+    group_id: int = Field(..., description="ID группы")
+    required_role: Optional[str] = Field(None, description="Требуемая роль (member/admin); пусто - любое членство")
+
+class MembershipCheckResult(MembershipCheck):
+    member: bool = Field(..., description="Пользователь состоит в группе")
+    role: Optional[str] = Field(None, description="Роль пользователя в группе")
+    allowed: bool = Field(..., description="Роль удовлетворяет требуемой")
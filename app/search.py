@@ -0,0 +1,139 @@
+import os
+import re
+from typing import List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection
+
+from app.database import Base
+
+# Индекс FTS5 общий для заданий и групп; rowid кодирует тип и ID записи:
+# задание - id * 2, группа - id * 2 + 1. Это позволяет обновлять индекс по rowid.
+# Архивные задания индексируются с отрицательным rowid: -(id * 2).
+SEARCH_TABLE = "search_index"
+
+# Последнее слово запроса ищется как префикс; индексы префиксов из 2-6 символов избавляют
+# от слияния списков всех слов с этим префиксом при каждом запросе
+PREFIX_LENGTHS = "2 3 4 5 6"
+
+CREATE_INDEX = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    f"title, body, tokenize = 'unicode61 remove_diacritics 2', prefix = '{PREFIX_LENGTHS}')"
+)
+
+TRIGGERS = {
+    "homeworks": "new.id * 2",
+    "groups": "new.id * 2 + 1",
+    "homeworks_archive": "-(new.id * 2)",
+}
+
+TITLE_COLUMNS = {"homeworks": "title", "groups": "name", "homeworks_archive": "title"}
+
+# Частые слова и короткие префиксы совпадают с большой долей записей, а bm25 оценивает
+# каждое совпадение. Поэтому ранжируются только SEARCH_MAX_CANDIDATES самых новых
+# совпадений (0 - все совпадения)
+SEARCH_MAX_CANDIDATES = int(os.getenv("SEARCH_MAX_CANDIDATES", "1000"))
+
+
+def _trigger_statements(table: str, rowid: str) -> List[str]:
+    old_rowid = rowid.replace("new.", "old.")
+    values = f"{rowid}, new.{TITLE_COLUMNS[table]}, coalesce(new.description, '')"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {SEARCH_TABLE} (rowid, title, body) VALUES ({values}); END",
+        # Индекс обновляется только при изменении индексируемых столбцов, а не при
+        # смене версии строки или переносе задания в другую группу
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_update "
+        f"AFTER UPDATE OF {TITLE_COLUMNS[table]}, description ON {table} BEGIN "
+        f"DELETE FROM {SEARCH_TABLE} WHERE rowid = {old_rowid}; "
+        f"INSERT INTO {SEARCH_TABLE} (rowid, title, body) VALUES ({values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN "
+        f"DELETE FROM {SEARCH_TABLE} WHERE rowid = {old_rowid}; END",
+    ]
+
+
+def rebuild(connection: Connection) -> None:
+    connection.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    # В базах до миграции может не быть части таблиц (например, архива)
+    tables = set(connection.scalars(text("SELECT name FROM sqlite_master WHERE type = 'table'")))
+    for table, rowid in TRIGGERS.items():
+        if table not in tables:
+            continue
+        connection.execute(text(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, title, body) "
+            f"SELECT {rowid.replace('new.', '')}, {TITLE_COLUMNS[table]}, coalesce(description, '') FROM {table}"
+        ))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def create_search_index(target, connection: Connection, **kw) -> None:
+    if connection.dialect.name != "sqlite":
+        return
+    exists = connection.scalar(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": SEARCH_TABLE},
+    )
+    connection.execute(text(CREATE_INDEX))
+    for table, rowid in TRIGGERS.items():
+        # Триггеры пересоздаются, чтобы базы с прежними определениями получили новые
+        for action in ("insert", "update", "delete"):
+            connection.execute(text(f"DROP TRIGGER IF EXISTS {table}_search_{action}"))
+        for statement in _trigger_statements(table, rowid):
+            connection.execute(text(statement))
+    if not exists:
+        rebuild(connection)
+
+
+@event.listens_for(Base.metadata, "before_drop")
+def drop_search_index(target, connection: Connection, **kw) -> None:
+    if connection.dialect.name != "sqlite":
+        return
+    connection.execute(text(f"DROP TABLE IF EXISTS {SEARCH_TABLE}"))
+
+
+def match_expression(query: str) -> str:
+    # Слова запроса ищутся как фразы (без синтаксиса FTS5), последнее - как префикс
+    words = re.findall(r"\w+", query)
+    if not words:
+        return ""
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search(connection, query: str, skip: int = 0, limit: int = 20, include_archived: bool = False,
+           max_candidates: Optional[int] = None) -> List[dict]:
+    expression = match_expression(query)
+    if not expression:
+        return []
+    max_candidates = SEARCH_MAX_CANDIDATES if max_candidates is None else max_candidates
+    live_only = "" if include_archived else "AND rowid > 0 "
+    window = ""
+    # Архивные записи (отрицательные rowid) старше живых, поэтому окно новых совпадений
+    # применяется только к поиску без архива
+    if max_candidates > 0 and not include_archived:
+        window = (
+            f"AND rowid >= (SELECT coalesce(min(rowid), 0) FROM (SELECT rowid FROM {SEARCH_TABLE} "
+            f"WHERE {SEARCH_TABLE} MATCH :expression AND rowid > 0 ORDER BY rowid DESC LIMIT :candidates)) "
+        )
+    rows = connection.execute(
+        text(
+            f"SELECT rowid, highlight({SEARCH_TABLE}, 0, '<b>', '</b>') AS title, "
+            f"snippet({SEARCH_TABLE}, 1, '<b>', '</b>', '…', 12) AS snippet, "
+            f"bm25({SEARCH_TABLE}, 10.0, 1.0) AS score "
+            f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :expression {live_only}{window}"
+            "ORDER BY score LIMIT :limit OFFSET :skip"
+        ),
+        {"expression": expression, "limit": limit, "skip": skip, "candidates": max(max_candidates, skip + limit)},
+    )
+    return [
+        {
+            "type": "group" if abs(row.rowid) % 2 else "homework",
+            "id": abs(row.rowid) // 2,
+            "archived": row.rowid < 0,
+            "title": row.title,
+            "snippet": row.snippet or None,
+            "score": row.score,
+        }
+        for row in rows
+    ]
@@ -0,0 +1,213 @@
+"""Запуск в production: несколько рабочих процессов uvicorn на общем сокете.
+
+Запуск: python -m app.server [--workers N] [--host HOST] [--port PORT]
+
+Главный процесс открывает сокет, один раз готовит схему базы и запускает рабочие
+процессы, которые импортируют приложение заново. SIGHUP - плавный перезапуск рабочих
+процессов (новые запускаются до остановки старых, код перечитывается), SIGTERM и
+SIGINT - плавная остановка. Упавший рабочий процесс запускается снова.
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", str(os.cpu_count() or 1)))
+# Время на завершение начатых запросов при остановке рабочего процесса
+SERVER_GRACEFUL_TIMEOUT = float(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))
+# Период опроса шины инвалидации, если он не задан явно, а процессов несколько
+DEFAULT_POLL_MS = "200"
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def prepare_database() -> None:
+    """Импортирует приложение в отдельном процессе: схема создается (и при
+    RESET_DB_ON_STARTUP=1 сбрасывается) один раз, а не в каждом рабочем процессе."""
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            import app.main  # noqa: F401
+        except BaseException:
+            import traceback
+            traceback.print_exc()
+            code = 1
+        os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    if not (os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0):
+        raise SystemExit("database preparation failed")
+    os.environ["RESET_DB_ON_STARTUP"] = "0"
+
+
+def serve_uvicorn(sock: socket.socket, graceful_timeout: float = SERVER_GRACEFUL_TIMEOUT) -> None:
+    # Приложение импортируется в рабочем процессе: у каждого свои соединения с базой и потоки
+    import uvicorn
+
+    config = uvicorn.Config(
+        "app.main:app",
+        lifespan="on",
+        timeout_graceful_shutdown=graceful_timeout,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Supervisor:
+    """Пул рабочих процессов (pre-fork), обслуживающих один сокет."""
+
+    def __init__(self, sock: socket.socket, workers: int,
+                 target: Callable[[socket.socket], None] = serve_uvicorn,
+                 graceful_timeout: float = SERVER_GRACEFUL_TIMEOUT):
+        self.sock = sock
+        self.workers = workers
+        self.target = target
+        self.graceful_timeout = graceful_timeout
+        self.active: Dict[int, float] = {}
+        # Остановленные процессы, завершающие начатые запросы: pid -> срок принудительной остановки
+        self.retiring: Dict[int, float] = {}
+        self.spawned = 0
+        self.restarts = 0
+        self.reloads = 0
+
+    def spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+                    signal.signal(signum, signal.SIG_DFL)
+                # Перезапуск выполняет главный процесс
+                signal.signal(signal.SIGHUP, signal.SIG_IGN)
+                self.target(self.sock)
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                code = 1
+            os._exit(code)
+        self.active[pid] = time.monotonic()
+        self.spawned += 1
+        return pid
+
+    def start(self) -> None:
+        while len(self.active) < self.workers:
+            self.spawn()
+
+    def _retire(self, pids: List[int]) -> None:
+        deadline = time.monotonic() + self.graceful_timeout
+        for pid in pids:
+            self.active.pop(pid, None)
+            self.retiring[pid] = deadline
+            self._signal(pid, signal.SIGTERM)
+
+    def _signal(self, pid: int, signum: int) -> None:
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def reload(self) -> None:
+        """Заменяет все рабочие процессы; сокет все время обслуживается."""
+        self.reloads += 1
+        old = list(self.active)
+        for pid in old:
+            self.spawn()
+            self._retire([pid])
+
+    def reap(self) -> List[int]:
+        """Собирает завершившиеся процессы и возвращает pid упавших рабочих."""
+        crashed = []
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                break
+            if self.retiring.pop(pid, None) is None and self.active.pop(pid, None) is not None:
+                crashed.append(pid)
+        now = time.monotonic()
+        for pid, deadline in self.retiring.items():
+            if now >= deadline:
+                self._signal(pid, signal.SIGKILL)
+        return crashed
+
+    def tick(self) -> None:
+        self.restarts += len(self.reap())
+        self.start()
+
+    def stop(self) -> None:
+        self._retire(list(self.active))
+        while self.retiring:
+            self.reap()
+            time.sleep(0.05)
+
+    def stats(self) -> dict:
+        return {
+            "workers": sorted(self.active),
+            "retiring": sorted(self.retiring),
+            "spawned": self.spawned,
+            "restarts": self.restarts,
+            "reloads": self.reloads,
+        }
+
+
+def run(host: str = SERVER_HOST, port: int = SERVER_PORT, workers: int = SERVER_WORKERS) -> None:
+    if workers > 1:
+        # Локальные кэши процессов согласуются через таблицу cache_versions
+        os.environ.setdefault("INVALIDATION_POLL_MS", DEFAULT_POLL_MS)
+    prepare_database()
+    sock = bind_socket(host, port)
+    supervisor = Supervisor(sock, workers)
+    pending: List[int] = []
+
+    def on_signal(signum, frame):
+        pending.append(signum)
+
+    for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, on_signal)
+
+    supervisor.start()
+    print(f"serving on {host}:{port} with {workers} workers (pid {os.getpid()})", file=sys.stderr)
+    try:
+        while True:
+            while pending:
+                signum = pending.pop(0)
+                if signum == signal.SIGHUP:
+                    supervisor.reload()
+                else:
+                    return
+            supervisor.tick()
+            time.sleep(0.2)
+    finally:
+        supervisor.stop()
+        sock.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="School Bot API (несколько рабочих процессов)")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    args = parser.parse_args(argv)
+    run(args.host, args.port, max(1, args.workers))
+
+
+if __name__ == "__main__":
+    main()
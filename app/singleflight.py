@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from app import metrics
+
+# Сколько миллисекунд готовый результат раздается новым запросам с тем же ключом
+SINGLEFLIGHT_GRACE_MS = float(os.getenv("SINGLEFLIGHT_GRACE_MS", "50"))
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.finished_at = None
+
+
+class SingleFlight:
+    """Объединяет одновременные одинаковые вызовы в одно выполнение."""
+
+    def __init__(self, grace_ms: float = SINGLEFLIGHT_GRACE_MS):
+        self.grace = grace_ms / 1000
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._last_sweep = time.monotonic()
+        self.executed = 0
+        self.coalesced = 0
+
+    def _expired(self, call: _Call, now: float) -> bool:
+        return call.finished_at is not None and now - call.finished_at > self.grace
+
+    def _sweep(self, now: float) -> None:
+        # Вызывается под блокировкой: убираем результаты с истекшим окном
+        if now - self._last_sweep < max(self.grace, 1.0):
+            return
+        self._last_sweep = now
+        for key in [k for k, c in self._calls.items() if self._expired(c, now)]:
+            del self._calls[key]
+
+    def do(self, key: tuple, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            now = time.monotonic()
+            self._sweep(now)
+            call = self._calls.get(key)
+            if call is not None and self._expired(call, now):
+                call = None
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executed += 1
+            else:
+                self.coalesced += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as exc:
+                call.error = exc
+            finally:
+                call.finished_at = time.monotonic()
+                if call.error is not None or self.grace <= 0:
+                    with self._lock:
+                        if self._calls.get(key) is call:
+                            del self._calls[key]
+                call.done.set()
+        else:
+            call.done.wait()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def forget(self, prefix: tuple) -> None:
+        # После записи новые запросы не должны получить старый результат; удаляются
+        # все ключи, начинающиеся с prefix, в том числе выполняющиеся вызовы. Результат,
+        # начатый до записи, получат только присоединившиеся до forget запросы
+        with self._lock:
+            for key in [k for k in self._calls if k[:len(prefix)] == prefix]:
+                del self._calls[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._calls.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            in_flight = sum(1 for c in self._calls.values() if c.finished_at is None)
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "in_flight": in_flight,
+        }
+
+
+reads = SingleFlight()
+metrics.register("singleflight", reads.stats)
+
+
+@lru_cache(maxsize=None)
+def _adapter(schema: Any) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def coalesced_json(key: tuple, load: Callable[[], Any], schema: Any, exclude: Any = None) -> Response:
+    # Запрос к базе и сериализация выполняются один раз на всех ожидающих
+    adapter = _adapter(schema)
+
+    def run():
+        return adapter.dump_json(adapter.validate_python(load(), from_attributes=True), exclude=exclude)
+
+    return Response(content=reads.do(key, run), media_type="application/json")
@@ -0,0 +1,308 @@
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import metrics
+from app.database import Base, SessionLocal, configure_sqlite
+from app.invalidation import bus
+from app.maintenance import scheduler
+from app.membership import forget_tenant
+from app.models.tenant import TenantModel
+from app.write_queue import stop_writer
+
+TENANT_HEADER = b"x-tenant-id"
+# Альтернатива заголовку: префикс пути /t/{tenant}/...
+TENANT_PATH = re.compile(r"^/t/([^/]+)(/.*)?$")
+TENANT_ID = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+# Узлы хранения: имя=шаблон URL базы с {tenant}, через запятую
+TENANT_NODES = os.getenv("TENANT_NODES", "local=sqlite:///./tenants/{tenant}.db")
+# Движок базы арендатора закрывается после стольких секунд без запросов
+TENANT_IDLE_SECONDS = float(os.getenv("TENANT_IDLE_SECONDS", "300"))
+TENANTS_CACHE = "tenants"
+# Таблицы, которые относятся к основной базе и не переносятся между узлами
+REGISTRY_TABLES = {"tenants"}
+MOVE_CHUNK_SIZE = 1000
+# Сколько перенос ждет завершения начатых запросов школы
+MOVE_DRAIN_SECONDS = float(os.getenv("TENANT_MOVE_DRAIN_SECONDS", "30"))
+
+
+class TenantNotFound(Exception):
+    pass
+
+
+class TenantUnavailable(Exception):
+    """База арендатора переносится на другой узел."""
+
+
+def parse_nodes(value: str) -> Dict[str, str]:
+    nodes = {}
+    for item in value.split(","):
+        if item.strip():
+            name, _, template = item.partition("=")
+            nodes[name.strip()] = template.strip()
+    return nodes
+
+
+def _create_engine(url: str) -> Engine:
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        if parsed.database and parsed.database != ":memory:":
+            Path(parsed.database).parent.mkdir(parents=True, exist_ok=True)
+        return configure_sqlite(create_engine(url, connect_args={"check_same_thread": False}))
+    return create_engine(url)
+
+
+class TenantRegistry:
+    """Базы арендаторов (школ): у каждой свой URL на узле хранения и свой пул
+    соединений. Движки создаются при первом запросе и закрываются после простоя."""
+
+    def __init__(self, session_factory: sessionmaker, nodes: Dict[str, str],
+                 idle_seconds: float = TENANT_IDLE_SECONDS):
+        self.session_factory = session_factory
+        self.nodes = nodes
+        self.idle_seconds = idle_seconds
+        self._lock = threading.RLock()
+        self._drained = threading.Condition(self._lock)
+        # Открытые сессии школ: перенос ждет, пока они закроются
+        self._active: Dict[str, int] = {}
+        self._records: Dict[str, Tuple[str, str]] = {}
+        self._engines: Dict[str, Tuple[Engine, str]] = {}
+        self._last_used: Dict[str, float] = {}
+        self._last_sweep = time.monotonic()
+        self.created = 0
+        self.evicted = 0
+        self.moves = 0
+
+    def url(self, tenant: str, node: str) -> str:
+        if node not in self.nodes:
+            raise ValueError(f"Unknown node: {node}")
+        return self.nodes[node].format(tenant=tenant)
+
+    def _record(self, tenant: str) -> Tuple[str, str]:
+        with self._lock:
+            record = self._records.get(tenant)
+        if record is None:
+            with self.session_factory() as db:
+                row = db.get(TenantModel, tenant)
+                if row is None:
+                    raise TenantNotFound(tenant)
+                record = (row.node, row.status)
+            with self._lock:
+                self._records[tenant] = record
+        return record
+
+    def engine(self, tenant: str) -> Engine:
+        self._sweep()
+        with self._lock:
+            # Состояние проверяется под блокировкой, чтобы сессия не открылась после начала переноса
+            node, status = self._record(tenant)
+            if status != "active":
+                raise TenantUnavailable(tenant)
+            entry = self._engines.get(tenant)
+            if entry is not None and entry[1] != node:
+                self._evict(tenant)
+                entry = None
+            if entry is None:
+                engine = _create_engine(self.url(tenant, node))
+                Base.metadata.create_all(bind=engine)
+                bus.watch(engine)
+                scheduler.watch(tenant, engine)
+                entry = self._engines[tenant] = (engine, node)
+                self.created += 1
+            self._last_used[tenant] = time.monotonic()
+            return entry[0]
+
+    def session(self, tenant: str) -> Session:
+        """Открывает сессию базы школы; после использования ее закрывает release()."""
+        with self._lock:
+            session = Session(bind=self.engine(tenant), autoflush=False, info={"tenant": tenant})
+            self._active[tenant] = self._active.get(tenant, 0) + 1
+        return session
+
+    def release(self, session: Session) -> None:
+        session.close()
+        tenant = session.info["tenant"]
+        with self._lock:
+            self._active[tenant] -= 1
+            if not self._active[tenant]:
+                del self._active[tenant]
+                self._drained.notify_all()
+
+    def _drain(self, tenant: str, timeout: float) -> None:
+        with self._lock:
+            if not self._drained.wait_for(lambda: tenant not in self._active, timeout):
+                raise TenantUnavailable(tenant)
+
+    def _evict(self, tenant: str) -> None:
+        # Вызывается под блокировкой
+        entry = self._engines.pop(tenant, None)
+        self._last_used.pop(tenant, None)
+        if entry is None:
+            return
+        engine = entry[0]
+        bus.unwatch(engine)
+        scheduler.unwatch(tenant)
+        stop_writer(engine)
+        forget_tenant(tenant)
+        engine.dispose()
+        self.evicted += 1
+
+    def _sweep(self) -> None:
+        now = time.monotonic()
+        if now - self._last_sweep < min(self.idle_seconds, 60):
+            return
+        with self._lock:
+            self._last_sweep = now
+            for tenant, used_at in list(self._last_used.items()):
+                if now - used_at > self.idle_seconds:
+                    self._evict(tenant)
+
+    def close(self) -> None:
+        with self._lock:
+            for tenant in list(self._engines):
+                self._evict(tenant)
+
+    def invalidate(self) -> None:
+        # Узел или состояние арендатора изменил другой процесс
+        with self._lock:
+            self._records.clear()
+
+    def _update(self, tenant: str, **values) -> TenantModel:
+        with self.session_factory() as db:
+            row = db.get(TenantModel, tenant)
+            for field, value in values.items():
+                setattr(row, field, value)
+            version = bus.publish(db, TENANTS_CACHE)
+            db.commit()
+            db.refresh(row)
+            db.expunge(row)
+        with self._lock:
+            self._records[tenant] = (row.node, row.status)
+        bus.acknowledge(TENANTS_CACHE, version)
+        return row
+
+    def register(self, tenant: str, node: str) -> TenantModel:
+        self.url(tenant, node)
+        with self.session_factory() as db:
+            if db.get(TenantModel, tenant) is not None:
+                raise ValueError("Tenant already exists")
+            row = TenantModel(id=tenant, node=node, status="active")
+            db.add(row)
+            db.commit()
+            db.refresh(row)
+            db.expunge(row)
+        return row
+
+    def list(self) -> List[TenantModel]:
+        with self.session_factory() as db:
+            rows = db.query(TenantModel).order_by(TenantModel.id).all()
+            db.expunge_all()
+        return rows
+
+    def move(self, tenant: str, node: str, drain_seconds: Optional[float] = None) -> dict:
+        """Копирует базу арендатора на другой узел и переключает его туда.
+
+        На время переноса запросы арендатора получают 503; начатые запросы этого
+        процесса перенос дожидается (не дольше drain_seconds), а запись других
+        процессов во время копирования блокируется. Исходная база остается
+        на старом узле без изменений.
+        """
+        drain_seconds = MOVE_DRAIN_SECONDS if drain_seconds is None else drain_seconds
+        source_node, status = self._record(tenant)
+        target_url = self.url(tenant, node)
+        if node == source_node:
+            raise ValueError("Tenant is already on this node")
+        if status != "active":
+            raise TenantUnavailable(tenant)
+
+        self._update(tenant, status="moving")
+        try:
+            # Другие процессы узнают о переносе через шину инвалидации
+            time.sleep(2 * bus.poll_interval)
+            self._drain(tenant, drain_seconds)
+            with self._lock:
+                self._evict(tenant)
+            rows = self._copy(self.url(tenant, source_node), target_url)
+        except Exception:
+            self._update(tenant, status="active")
+            raise
+        row = self._update(tenant, node=node, status="active")
+        self.moves += 1
+        return {"tenant": row, "from_node": source_node, "rows": rows}
+
+    def _copy(self, source_url: str, target_url: str) -> Dict[str, int]:
+        source, target = _create_engine(source_url), _create_engine(target_url)
+        try:
+            # Данные на целевом узле (например, от прошлого переноса) заменяются
+            Base.metadata.drop_all(bind=target)
+            Base.metadata.create_all(bind=target)
+            rows = {}
+            with source.connect() as src, target.begin() as dst:
+                # Все таблицы читаются из одного снимка; BEGIN IMMEDIATE не дает другим
+                # процессам записать в исходную базу, пока идет копирование
+                if source.dialect.name == "sqlite":
+                    src.exec_driver_sql("BEGIN IMMEDIATE")
+                else:
+                    src.execution_options(isolation_level="REPEATABLE READ")
+                for table in Base.metadata.sorted_tables:
+                    if table.name in REGISTRY_TABLES:
+                        continue
+                    rows[table.name] = 0
+                    result = src.execute(select(table)).mappings()
+                    while chunk := result.fetchmany(MOVE_CHUNK_SIZE):
+                        dst.execute(insert(table), [dict(row) for row in chunk])
+                        rows[table.name] += len(chunk)
+            return rows
+        finally:
+            source.dispose()
+            target.dispose()
+
+    def stats(self) -> dict:
+        return {
+            "open_engines": len(self._engines),
+            "created": self.created,
+            "evicted": self.evicted,
+            "moves": self.moves,
+        }
+
+
+class TenantMiddleware:
+    """Определяет арендатора по заголовку X-Tenant-ID или префиксу пути /t/{tenant}
+    и передает его обработчикам через request.state.tenant."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        tenant = None
+        match = TENANT_PATH.match(scope["path"])
+        if match:
+            tenant = match.group(1)
+            path = match.group(2) or "/"
+            scope = dict(scope, path=path, raw_path=path.encode())
+        else:
+            header = dict(scope["headers"]).get(TENANT_HEADER)
+            if header:
+                tenant = header.decode("latin-1")
+        if tenant is not None:
+            if not TENANT_ID.match(tenant):
+                await JSONResponse({"detail": "Invalid tenant id"}, status_code=400)(scope, receive, send)
+                return
+            scope = dict(scope, state={**scope.get("state", {}), "tenant": tenant})
+        await self.app(scope, receive, send)
+
+
+registry = TenantRegistry(SessionLocal, parse_nodes(TENANT_NODES))
+bus.subscribe(TENANTS_CACHE, lambda: registry.invalidate())
+metrics.register("tenants", lambda: registry.stats())
@@ -0,0 +1,65 @@
+import json
+from typing import Any, Dict, Optional, Set
+
+from fastapi import HTTPException, Response
+from sqlalchemy import select, update
+from sqlalchemy.engine import RowMapping
+from sqlalchemy.orm import Session
+
+# If-Match: * - достаточно существования записи
+ANY_VERSION = "*"
+
+
+def etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def parse_if_match(header: Optional[str]) -> Optional[Set[int]]:
+    """Допустимые версии из заголовка If-Match; None - заголовка нет или он равен "*".
+    Нераспознанные значения не совпадают ни с одной версией."""
+    if header is None:
+        return None
+    versions = set()
+    for value in header.split(","):
+        value = value.strip()
+        if value == ANY_VERSION:
+            return None
+        if value.startswith("W/"):
+            value = value[2:]
+        try:
+            versions.add(int(value.strip('"')))
+        except ValueError:
+            continue
+    return versions
+
+
+def conditional_update(db: Session, model, row_id: int, values: Dict[str, Any],
+                       versions: Optional[Set[int]] = None) -> Optional[RowMapping]:
+    """UPDATE ... WHERE id = ? [AND version IN (...)] RETURNING * с увеличением версии.
+
+    Возвращает новую строку или None, если записи нет или ее версия другая.
+    Блокировки не берутся: конкурирующее изменение между чтением клиента и записью
+    обнаруживается по версии.
+    """
+    table = model.__table__
+    statement = update(table).where(table.c.id == row_id)
+    if versions is not None:
+        statement = statement.where(table.c.version.in_(versions))
+    statement = statement.values(**values, version=table.c.version + 1).returning(*table.c)
+    return db.execute(statement).mappings().first()
+
+
+def raise_update_failed(db: Session, model, row_id: int, detail: str):
+    # Причину неудачного условного UPDATE выясняем только при ошибке
+    exists = db.scalar(select(model.__table__.c.id).where(model.__table__.c.id == row_id))
+    db.rollback()
+    if exists is None:
+        raise HTTPException(status_code=404, detail=detail)
+    raise HTTPException(status_code=412, detail="Precondition failed")
+
+
+def with_etag(response: Response) -> Response:
+    # Ответ одной записи (в том числе из кэша) содержит ее версию
+    if response.status_code == 200:
+        response.headers["ETag"] = etag(json.loads(response.body)["version"])
+    return response
@@ -0,0 +1,206 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+from typing import Any, Callable, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session, sessionmaker
+
+from app import metrics
+
+# Групповая фиксация включается явно: WRITE_BATCHING=1
+WRITE_BATCHING = os.getenv("WRITE_BATCHING", "0") == "1"
+WRITE_BATCH_WINDOW_MS = float(os.getenv("WRITE_BATCH_WINDOW_MS", "2"))
+WRITE_BATCH_MAX_SIZE = int(os.getenv("WRITE_BATCH_MAX_SIZE", "100"))
+# Сколько запрос ждет результата от потока записи, прежде чем получить 503
+WRITE_TIMEOUT_SECONDS = float(os.getenv("WRITE_TIMEOUT_SECONDS", "10"))
+# Как часто ожидающий запрос проверяет, что поток записи жив
+WRITE_ALIVE_CHECK_SECONDS = 0.5
+
+WriteOp = Callable[[Session], Any]
+
+
+class GroupCommitWriter:
+    """Выделенный поток записи: операции, пришедшие в пределах окна,
+    выполняются в одной транзакции с одной фиксацией.
+
+    Если какая-либо операция в пачке завершилась ошибкой, пачка откатывается
+    и операции выполняются по одной, чтобы каждая получила свой результат.
+    """
+
+    def __init__(self, session_factory: sessionmaker, window_ms: float = WRITE_BATCH_WINDOW_MS,
+                 max_batch: int = WRITE_BATCH_MAX_SIZE):
+        self.session_factory = session_factory
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.commits = 0
+        self.operations = 0
+        self.fallbacks = 0
+        self.timeouts = 0
+
+    def start(self) -> None:
+        with self._lock:
+            # Остановившийся из-за ошибки поток заменяется новым
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _unavailable(self, future: Future, detail: str) -> HTTPException:
+        # Операция, которую поток еще не начал, отменяется; начатая может быть зафиксирована
+        future.cancel()
+        self.timeouts += 1
+        return HTTPException(status_code=503, detail=detail, headers={"Retry-After": "1"})
+
+    def submit(self, op: WriteOp, timeout: Optional[float] = None) -> Any:
+        timeout = WRITE_TIMEOUT_SECONDS if timeout is None else timeout
+        self.start()
+        thread = self._thread
+        future = Future()
+        self._queue.put((op, future))
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                return future.result(timeout=max(0, min(remaining, WRITE_ALIVE_CHECK_SECONDS)))
+            except TimeoutError:
+                pass
+            if thread is None or not thread.is_alive():
+                raise self._unavailable(future, "Write pipeline stopped")
+            if remaining <= WRITE_ALIVE_CHECK_SECONDS:
+                raise self._unavailable(future, "Write pipeline is not responding")
+
+    def _run(self) -> None:
+        running = True
+        while running:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+            try:
+                self._execute(batch)
+            except Exception as exc:
+                # Сбой вне операций (например, соединения) не должен оставить запросы без ответа
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+
+    def _execute(self, batch) -> None:
+        # Операции, отмененные по таймауту ожидания, не выполняются
+        batch = [(op, future) for op, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        session = self.session_factory(expire_on_commit=False)
+        try:
+            results = [op(session) for op, _ in batch]
+            session.commit()
+        except Exception:
+            session.rollback()
+            results = None
+        finally:
+            session.close()
+
+        if results is None:
+            self.fallbacks += 1
+            for op, future in batch:
+                self._execute_one(op, future)
+            return
+
+        self.commits += 1
+        self.operations += len(batch)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _execute_one(self, op: WriteOp, future: Future) -> None:
+        session = self.session_factory(expire_on_commit=False)
+        try:
+            result = op(session)
+            session.commit()
+        except Exception as exc:
+            session.rollback()
+            future.set_exception(exc)
+        else:
+            self.commits += 1
+            self.operations += 1
+            future.set_result(result)
+        finally:
+            session.close()
+
+    def stats(self) -> dict:
+        return {
+            "commits": self.commits,
+            "operations": self.operations,
+            "fallbacks": self.fallbacks,
+            "timeouts": self.timeouts,
+            "queued": self._queue.qsize(),
+        }
+
+
+# Один поток записи на каждый движок базы данных
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(bind) -> GroupCommitWriter:
+    with _writers_lock:
+        writer = _writers.get(bind)
+        if writer is None:
+            writer = GroupCommitWriter(sessionmaker(autocommit=False, autoflush=False, bind=bind))
+            _writers[bind] = writer
+        return writer
+
+
+def stop_writer(bind) -> None:
+    with _writers_lock:
+        writer = _writers.pop(bind, None)
+    if writer is not None:
+        writer.stop()
+
+
+def _stop_writers() -> None:
+    for writer in list(_writers.values()):
+        writer.stop()
+
+
+atexit.register(_stop_writers)
+metrics.register("write_queue", lambda: {str(bind.url): w.stats() for bind, w in _writers.items()})
+
+
+def run_write(db: Session, op: WriteOp) -> Any:
+    """Выполняет операцию записи и фиксирует ее.
+
+    Без WRITE_BATCHING операция выполняется в сессии запроса; иначе она
+    передается потоку групповой фиксации. Операция получает сессию, должна
+    вызвать flush() для получения первичных ключей и не должна фиксировать
+    транзакцию сама.
+    """
+    if not WRITE_BATCHING:
+        result = op(db)
+        db.commit()
+        return result
+    return get_writer(db.get_bind()).submit(op)
@@ -0,0 +1,84 @@
+"""Списки заданий групп до и после переноса заданий прошлых периодов в архив.
+
+Запуск: python benchmarks/bench_archive.py [заданий]
+"""
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from app import archive, group_stats
+from app.database import Base
+from app.models import user, user_group  # noqa: F401 - регистрация моделей
+from app.models.attachment import AttachmentModel
+from app.models.file import FileModel
+from app.models.group import GroupModel
+from app.models.homework import HomeworkModel
+
+GROUPS = 200
+# Доля заданий прошлых периодов
+PAST_SHARE = 0.9
+
+
+def populate(engine, count):
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(insert(GroupModel), [{"id": i, "name": f"Группа {i}", "created_by": 1} for i in range(1, GROUPS + 1)])
+        connection.execute(insert(FileModel), [{"id": 1, "file_id": "file"}])
+        connection.execute(insert(HomeworkModel), [
+            {
+                "id": i,
+                "group_id": i % GROUPS + 1,
+                "assigned_by": 1,
+                "title": f"Задание {i}",
+                "description": "Решить задачи из учебника",
+                # Первые задания - прошлые периоды, последние - текущий
+                "deadline": now - timedelta(days=365) if i <= count * PAST_SHARE else now + timedelta(days=7),
+            }
+            for i in range(1, count + 1)
+        ])
+        connection.execute(insert(AttachmentModel), [
+            {"homework_id": i, "file_ref_id": 1, "file_type": "document", "file_name": "ws.pdf"}
+            for i in range(1, count + 1)
+        ])
+        group_stats.rebuild(connection)
+
+
+def group_list_latency(engine):
+    timings = []
+    with Session(engine) as session:
+        for group_id in range(1, GROUPS + 1):
+            started = time.perf_counter()
+            session.query(HomeworkModel).filter(HomeworkModel.group_id == group_id).all()
+            timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'archive.db'}")
+        populate(engine, count)
+        before = group_list_latency(engine)
+
+        started = time.perf_counter()
+        report = archive.archive(engine, older_than_days=180, pause_ms=0)
+        elapsed = time.perf_counter() - started
+
+        after = group_list_latency(engine)
+        engine.dispose()
+    print(f"перенос в архив: {report['homeworks']} заданий, {report['attachments']} вложений, "
+          f"{report['batches']} транзакций за {elapsed:.1f} с")
+    print(f"задания группы (медиана): до {before:.2f} мс, после {after:.2f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Экономия места и строк от реестра файлов на синтетических данных.
+
+Создает базу со старой схемой attachments (file_id в каждой строке),
+выполняет миграцию и сравнивает размер базы и число строк.
+
+Запуск: python benchmarks/bench_attachment_dedup.py [вложений] [уникальных файлов]
+"""
+import random
+import sqlite3
+import string
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from app.migrations import migrate
+
+LEGACY_SCHEMA = """
+CREATE TABLE attachments (
+    id INTEGER PRIMARY KEY,
+    homework_id INTEGER NOT NULL,
+    file_id VARCHAR(255) NOT NULL,
+    file_type VARCHAR(50) NOT NULL,
+    file_name VARCHAR(255) NOT NULL,
+    caption TEXT,
+    uploaded_at DATETIME
+);
+-- Для поиска по file_id старой схеме нужен такой же индекс
+CREATE INDEX ix_attachments_file_id ON attachments (file_id);
+"""
+
+
+def telegram_file_id(rng):
+    # Типичный file_id Telegram - около 70-90 символов base64url
+    return "".join(rng.choices(string.ascii_letters + string.digits + "-_", k=rng.randint(70, 90)))
+
+
+def database_size(path):
+    connection = sqlite3.connect(path)
+    connection.execute("VACUUM")
+    page_count = connection.execute("PRAGMA page_count").fetchone()[0]
+    page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+    connection.close()
+    return page_count * page_size
+
+
+def main():
+    attachments = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    unique_files = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000
+    rng = random.Random(42)
+    files = [telegram_file_id(rng) for _ in range(unique_files)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "legacy.db"
+        connection = sqlite3.connect(path)
+        connection.executescript(LEGACY_SCHEMA)
+        connection.executemany(
+            "INSERT INTO attachments (homework_id, file_id, file_type, file_name, uploaded_at) "
+            "VALUES (?, ?, 'document', 'worksheet.pdf', '2024-09-01 10:00:00')",
+            ((i // 3, rng.choice(files)) for i in range(attachments)),
+        )
+        connection.commit()
+        connection.close()
+        before = database_size(path)
+
+        report = migrate(f"sqlite:///{path}")["dedupe_attachment_files"]
+        after = database_size(path)
+
+    print(f"вложений: {report['attachments']}, строк files: {report['files']}")
+    print(f"строк с file_id: {attachments} -> {report['files']}")
+    print(f"размер базы: {before / 1e6:.1f} МБ -> {after / 1e6:.1f} МБ "
+          f"(экономия {(1 - after / before) * 100:.0f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Задержка запросов во время резервного копирования базы.
+
+Запуск: python benchmarks/bench_backup.py [заданий]
+"""
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import Session
+
+from app import backup
+from app.database import Base
+from app.models import attachment, file, user, user_group  # noqa: F401 - регистрация моделей
+from app.models.group import GroupModel
+from app.models.homework import HomeworkModel
+
+GROUPS = 200
+MEASURE_SECONDS = 3.0
+
+
+def populate(engine, count, journal_mode):
+    with engine.begin() as connection:
+        connection.execute(text(f"PRAGMA journal_mode={journal_mode}"))
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    with engine.begin() as connection:
+        connection.execute(insert(GroupModel), [{"id": i, "name": f"Группа {i}", "created_by": 1} for i in range(1, GROUPS + 1)])
+        connection.execute(insert(HomeworkModel), [
+            {
+                "group_id": i % GROUPS + 1,
+                "assigned_by": 1,
+                "title": f"Задание {i}",
+                "description": "Решить задачи из учебника " * 8,
+                "deadline": now + timedelta(days=7),
+            }
+            for i in range(1, count + 1)
+        ])
+
+
+def workload(engine, stop, reads, writes):
+    # Как обработчики API: короткие чтения списков групп и вставки заданий
+    group_id = 0
+    with Session(engine) as session:
+        while not stop.is_set():
+            group_id = group_id % GROUPS + 1
+            started = time.perf_counter()
+            session.query(HomeworkModel).filter(HomeworkModel.group_id == group_id).limit(50).all()
+            session.rollback()
+            reads.append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+            session.add(HomeworkModel(group_id=group_id, assigned_by=1, title="Новое", deadline=datetime.utcnow()))
+            session.commit()
+            writes.append((time.perf_counter() - started) * 1000)
+
+
+def measure(engine, action):
+    stop = threading.Event()
+    reads, writes = [], []
+    worker = threading.Thread(target=workload, args=(engine, stop, reads, writes))
+    worker.start()
+    started = time.perf_counter()
+    report = action()
+    elapsed = time.perf_counter() - started
+    time.sleep(max(0.0, MEASURE_SECONDS - elapsed))
+    stop.set()
+    worker.join()
+    return report, elapsed, reads, writes
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    for journal_mode in ("delete", "wal"):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"sqlite:///{Path(tmp) / 'school.db'}", connect_args={"timeout": 30})
+            populate(engine, count, journal_mode)
+            # Копия делается своим движком, как из отдельного процесса CLI
+            source = create_engine(f"sqlite:///{Path(tmp) / 'school.db'}", connect_args={"timeout": 30})
+            cases = [
+                ("без копирования", lambda: None),
+                ("копия за один шаг", lambda: backup.create_backup(
+                    source, tmp, name="full", compressed=False, check=False, pages=-1, sleep_ms=0)),
+                ("копия шагами", lambda: backup.create_backup(
+                    source, tmp, name="steps", compressed=False, check=False)),
+            ]
+            print(f"journal_mode={journal_mode}, {count} заданий")
+            for label, action in cases:
+                report, elapsed, reads, writes = measure(engine, action)
+                line = (f"  {label}: чтение p50 {statistics.median(reads):.2f} мс, p99 {percentile(reads, 0.99):.2f} мс; "
+                        f"запись p50 {statistics.median(writes):.2f} мс, p99 {percentile(writes, 0.99):.2f} мс, max {max(writes):.1f} мс")
+                if report:
+                    line += (f"; копия {report['seconds']:.2f} с, шагов {report['steps']}, "
+                             f"перезапусков {report['restarts']}, за один шаг: {report['single_step']}")
+                print(line)
+            source.dispose()
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
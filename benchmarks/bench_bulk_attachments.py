@@ -0,0 +1,59 @@
+"""Сравнение POST /attachments/bulk с поштучным POST /attachments/.
+
+Запуск: python benchmarks/bench_bulk_attachments.py
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+# Приложение пересоздает таблицы при импорте, поэтому используем временную базу
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(_tmp.name) / 'bench.db'}"
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def attachment(homework_id, i):
+    return {
+        "homework_id": homework_id,
+        "file_id": f"file-{i}",
+        "file_type": "photo",
+        "file_name": f"photo{i}.jpg",
+        "caption": None,
+    }
+
+
+def main():
+    client = TestClient(app)
+    group_id = client.post("/groups/", json={"name": "Bench", "created_by": 0}).json()["id"]
+    homework_id = client.post("/homeworks/", json={
+        "group_id": group_id,
+        "assigned_by": 0,
+        "title": "Bench",
+        "deadline": "2030-01-01T00:00:00",
+    }).json()["id"]
+
+    print(f"{'штук':>6} {'поштучно, мс':>14} {'bulk, мс':>10} {'ускорение':>10}")
+    for count in (10, 100, 1000):
+        items = [attachment(homework_id, i) for i in range(count)]
+
+        started = time.perf_counter()
+        for item in items:
+            client.post("/attachments/", json=item)
+        single = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        client.post("/attachments/bulk", json=items)
+        bulk = (time.perf_counter() - started) * 1000
+
+        print(f"{count:>6} {single:>14.1f} {bulk:>10.1f} {single / bulk:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Опрос календаря группы: генерация, ответ из кэша и 304.
+
+Запуск: python benchmarks/bench_calendar.py [заданий в группе]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+TMP = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(TMP.name) / 'calendar.db'}"
+os.environ.setdefault("MAINTENANCE_INTERVAL_SECONDS", "0")
+
+from fastapi.testclient import TestClient
+
+from app import cache
+from app.main import app
+
+REQUESTS = 300
+
+
+def median_ms(client, path, headers=None, before=None):
+    timings = []
+    for _ in range(REQUESTS):
+        if before:
+            before()
+        started = time.perf_counter()
+        response = client.get(path, headers=headers or {})
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), response
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    with TestClient(app) as client:
+        group_id = client.post("/groups/", json={"name": "Группа", "created_by": 1}).json()["id"]
+        deadline = datetime.utcnow() + timedelta(days=7)
+        client.post("/import/homeworks", content="group_id,assigned_by,title,description,deadline\n" + "".join(
+            f"{group_id},1,Задание {i},Решить задачи из учебника,{(deadline + timedelta(hours=i)).isoformat()}\n"
+            for i in range(count)
+        ), headers={"Content-Type": "text/csv"})
+        path = f"/groups/{group_id}/calendar.ics"
+
+        generated, response = median_ms(client, path, before=cache.cache.clear)
+        cached, response = median_ms(client, path)
+        size, etag = len(response.content), response.headers["etag"]
+        not_modified, response = median_ms(client, path, headers={"If-None-Match": etag})
+        assert response.status_code == 304
+    print(f"календарь группы: {count} заданий, {size} байт")
+    print(f"генерация: {generated:.2f} мс, из кэша: {cached:.2f} мс, 304: {not_modified:.2f} мс (медианы)")
+    TMP.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Каскадное удаление группы с 10k заданий: множественные DELETE против поштучного удаления ORM.
+
+Запуск: python benchmarks/bench_cascade_delete.py [заданий]
+"""
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session, selectinload
+
+from app import cascade
+from app.database import Base
+from app.models import user  # noqa: F401 - регистрация моделей
+from app.models.attachment import AttachmentModel
+from app.models.file import FileModel
+from app.models.group import GroupModel
+from app.models.group_stats import GroupStatsModel
+from app.models.homework import HomeworkModel
+from app.models.user_group import UserGroupModel
+
+
+def populate(engine, count):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(insert(GroupModel), [{"id": 1, "name": "Bench", "created_by": 1}])
+        connection.execute(insert(FileModel), [{"id": 1, "file_id": "file"}])
+        connection.execute(insert(UserGroupModel), [
+            {"user_id": i, "group_id": 1, "user_role": "member"} for i in range(1, 201)
+        ])
+        connection.execute(insert(HomeworkModel), [
+            {"id": i, "group_id": 1, "assigned_by": 1, "title": f"Задание {i}", "deadline": datetime(2030, 1, 1)}
+            for i in range(1, count + 1)
+        ])
+        connection.execute(insert(AttachmentModel), [
+            {"homework_id": i, "file_ref_id": 1, "file_type": "document", "file_name": "ws.pdf"}
+            for i in range(1, count + 1)
+        ])
+        connection.execute(insert(GroupStatsModel), [{"group_id": 1, "member_count": 200, "homework_count": count}])
+
+
+def orm_delete(session):
+    # Как раньше делал клиент: каждая запись удаляется отдельно
+    group = session.get(GroupModel, 1)
+    homeworks = session.scalars(
+        select(HomeworkModel).where(HomeworkModel.group_id == 1).options(selectinload(HomeworkModel.attachments))
+    ).all()
+    for homework in homeworks:
+        for attachment in homework.attachments:
+            session.delete(attachment)
+        session.delete(homework)
+    for user_group in session.scalars(select(UserGroupModel).where(UserGroupModel.group_id == 1)):
+        session.delete(user_group)
+    session.delete(group)
+    session.commit()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    with tempfile.TemporaryDirectory() as tmp:
+        timings = {}
+        for name, run in (("поштучно (ORM)", orm_delete), ("каскад", lambda s: cascade.delete_group(s, 1))):
+            engine = create_engine(f"sqlite:///{Path(tmp) / (str(len(timings)) + '.db')}")
+            populate(engine, count)
+            with Session(engine) as session:
+                started = time.perf_counter()
+                run(session)
+                timings[name] = time.perf_counter() - started
+            engine.dispose()
+        for name, seconds in timings.items():
+            print(f"{name:>16}: {seconds * 1000:8.1f} мс ({count} заданий, {count} вложений, 200 участников)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Копирование учебного плана из 500 заданий: POST /groups/{id}/clone против повторных POST.
+
+Запуск: python benchmarks/bench_clone_group.py [заданий]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+# Приложение пересоздает таблицы при импорте, поэтому используем временную базу
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(_tmp.name) / 'bench.db'}"
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+ATTACHMENTS_PER_HOMEWORK = 2
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    client = TestClient(app)
+    group_id = client.post("/groups/", json={"name": "Plan", "created_by": 0}).json()["id"]
+    for i in range(count):
+        homework_id = client.post("/homeworks/", json={
+            "group_id": group_id, "assigned_by": 0, "title": f"Задание {i}",
+            "description": "Описание", "deadline": "2030-01-01T00:00:00",
+        }).json()["id"]
+        client.post("/attachments/bulk", json=[
+            {"homework_id": homework_id, "file_id": f"file-{i}-{j}", "file_type": "document", "file_name": "ws.pdf"}
+            for j in range(ATTACHMENTS_PER_HOMEWORK)
+        ])
+
+    # Как раньше: чтение плана и повторное создание каждого задания и вложения
+    started = time.perf_counter()
+    new_group_id = client.post("/groups/", json={"name": "Copy", "created_by": 0}).json()["id"]
+    plan = client.get(f"/homeworks/group/{group_id}", params={"expand": "attachments"}).json()
+    for homework in plan:
+        copy_id = client.post("/homeworks/", json={
+            "group_id": new_group_id, "assigned_by": homework["assigned_by"], "title": homework["title"],
+            "description": homework["description"], "deadline": homework["deadline"],
+        }).json()["id"]
+        for attachment in homework["attachments"]:
+            client.post("/attachments/", json={
+                "homework_id": copy_id, "file_id": attachment["file_id"],
+                "file_type": attachment["file_type"], "file_name": attachment["file_name"],
+            })
+    client_side = time.perf_counter() - started
+
+    started = time.perf_counter()
+    result = client.post(f"/groups/{group_id}/clone", json={"name": "Clone", "deadline_offset_days": 365}).json()
+    server_side = time.perf_counter() - started
+
+    print(f"заданий: {result['homeworks']}, вложений: {result['attachments']}")
+    print(f"повторные POST: {client_side * 1000:8.1f} мс")
+    print(f"clone:          {server_side * 1000:8.1f} мс")
+
+
+if __name__ == "__main__":
+    main()
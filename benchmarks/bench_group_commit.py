@@ -0,0 +1,83 @@
+"""Сравнение числа фиксаций в секунду с групповой фиксацией и без нее.
+
+Запуск: python benchmarks/bench_group_commit.py [операций] [потоков]
+"""
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import attachment, group, homework, user_group  # noqa: F401 - регистрация моделей
+from app.models.user import UserModel
+from app.write_queue import GroupCommitWriter
+
+
+def make_engine(path):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def insert_user(telegram_id):
+    def op(session):
+        session.add(UserModel(telegram_id=telegram_id, full_name="Ученик", role="student"))
+        session.flush()
+    return op
+
+
+def run(submit, operations, threads):
+    per_thread = operations // threads
+
+    def worker(offset):
+        for i in range(per_thread):
+            submit(insert_user(offset * per_thread + i))
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return per_thread * threads / (time.perf_counter() - started)
+
+
+def main():
+    operations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(Path(tmp) / "direct.db")
+        Session = sessionmaker(bind=engine)
+        lock = threading.Lock()
+
+        def direct(op):
+            # SQLite допускает одного писателя: сериализуем, как это делает база
+            with lock:
+                session = Session()
+                try:
+                    op(session)
+                    session.commit()
+                finally:
+                    session.close()
+
+        rate = run(direct, operations, threads)
+        print(f"без группировки: {rate:8.0f} оп/с, {rate:8.0f} фиксаций/с")
+
+        engine = make_engine(Path(tmp) / "batched.db")
+        writer = GroupCommitWriter(sessionmaker(bind=engine))
+        rate = run(writer.submit, operations, threads)
+        stats = writer.stats()
+        writer.stop()
+        print(f"с группировкой:  {rate:8.0f} оп/с, {stats['commits']} фиксаций "
+              f"на {stats['operations']} операций")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Массовый импорт (POST /import/{entity}) против создания записей по одной.
+
+Запуск: python benchmarks/bench_import.py [строк]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+TMP = tempfile.TemporaryDirectory()
+# Приложение создает схему в своей базе при импорте
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(TMP.name) / 'import.db'}"
+os.environ.setdefault("MAINTENANCE_INTERVAL_SECONDS", "0")
+
+from fastapi.testclient import TestClient
+
+from app import imports
+from app.database import SessionLocal
+from app.main import app
+
+SINGLE_ROWS = 2000
+
+
+def users_csv(start, count):
+    yield b"telegram_id,username,full_name,role\n"
+    batch = []
+    for i in range(start, start + count):
+        batch.append(f"{i},user{i},Ученик {i},student\n")
+        if len(batch) == 1000:
+            yield "".join(batch).encode()
+            batch = []
+    if batch:
+        yield "".join(batch).encode()
+
+
+def homeworks_csv(count, groups):
+    yield b"group_id,assigned_by,title,description,deadline\n"
+    for start in range(0, count, 1000):
+        yield "".join(
+            f"{i % groups + 1},1,Задание {i},Решить задачи,2099-01-01T00:00:00\n"
+            for i in range(start, min(count, start + 1000))
+        ).encode()
+
+
+async def stream(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+def timed_import(client, entity, body):
+    started = time.perf_counter()
+    result = client.post(f"/import/{entity}", content=body, headers={"Content-Type": "text/csv"}).json()
+    return result, time.perf_counter() - started
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with TestClient(app) as client:
+        started = time.perf_counter()
+        for i in range(SINGLE_ROWS):
+            client.post("/users/", json={"telegram_id": -i - 1, "full_name": f"Ученик {i}", "role": "student"})
+        single = (time.perf_counter() - started) / SINGLE_ROWS
+
+        result, elapsed = timed_import(client, "users", users_csv(1, count))
+        print(f"POST /users/ по одному: {single * 1000:.2f} мс на строку "
+              f"(~{single * count:.0f} с на {count} строк)")
+        print(f"POST /import/users: {result['inserted']} строк за {elapsed:.1f} с "
+              f"({elapsed / count * 1e6:.1f} мкс на строку)")
+
+        client.post("/import/groups", content=(
+            "name,created_by\n" + "".join(f"Группа {i},1\n" for i in range(200))
+        ).encode(), headers={"Content-Type": "text/csv"})
+        result, elapsed = timed_import(client, "homeworks", homeworks_csv(count, 200))
+        print(f"POST /import/homeworks: {result['inserted']} строк за {elapsed:.1f} с")
+
+    # TestClient читает тело запроса целиком, поэтому память замеряется без HTTP
+    for rows in (count // 10, count):
+        with SessionLocal() as db:
+            tracemalloc.start()
+            asyncio.run(imports.import_stream(db, "users", "csv", stream(users_csv(10_000_000 + rows * 10, rows))))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        print(f"пиковая память при импорте {rows} строк: {peak / 2**20:.1f} МБ")
+    TMP.cleanup()
+
+
+if __name__ == "__main__":
+    main()
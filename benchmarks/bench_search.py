@@ -0,0 +1,85 @@
+"""Задержка полнотекстового поиска (FTS5) на большом числе заданий.
+
+Запуск: python benchmarks/bench_search.py [заданий]
+"""
+import itertools
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, insert
+
+from app import search
+from app.database import Base
+from app.models import archive, attachment, file, group, user, user_group  # noqa: F401 - регистрация моделей
+from app.models.homework import HomeworkModel
+
+SYLLABLES = ["ма", "те", "ки", "ро", "ва", "ни", "ло", "ду", "зе", "пи", "ка", "со", "ры", "ле", "го"]
+
+
+def vocabulary(rng, size):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    return sorted(words)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = random.Random(7)
+    words = vocabulary(rng, 20_000)
+    # Частоты слов по закону Ципфа, как в естественном тексте
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'search.db'}")
+        Base.metadata.create_all(bind=engine)
+
+        elapsed = 0.0
+        with engine.begin() as connection:
+            for offset in range(0, count, 10_000):
+                rows = [
+                    {
+                        "group_id": i % 500 + 1,
+                        "assigned_by": 1,
+                        "title": " ".join(rng.choices(words, cum_weights=cum_weights, k=4)),
+                        "description": " ".join(rng.choices(words, cum_weights=cum_weights, k=30)),
+                        "deadline": datetime(2025, 1, 1),
+                    }
+                    for i in range(offset, min(offset + 10_000, count))
+                ]
+                started = time.perf_counter()
+                connection.execute(insert(HomeworkModel), rows)
+                elapsed += time.perf_counter() - started
+        print(f"загрузка {count} заданий с индексацией: {elapsed:.1f} с")
+
+        queries = {
+            "редкое слово": [[w] for w in rng.sample(words[5000:], 50)],
+            "среднее слово": [[w] for w in rng.sample(words[500:5000], 50)],
+            "два слова": [rng.sample(words[100:5000], 2) for _ in range(50)],
+            "префикс": [[w[:5]] for w in rng.sample(words[1000:], 50)],
+        }
+        # Ранжирование всех совпадений и только окна самых новых (SEARCH_MAX_CANDIDATES)
+        for mode, max_candidates in (("все совпадения", 0), ("окно", search.SEARCH_MAX_CANDIDATES)):
+            print(f"{mode} (max_candidates={max_candidates}):")
+            with engine.connect() as connection:
+                for name, samples in queries.items():
+                    timings = []
+                    for sample in samples:
+                        started = time.perf_counter()
+                        search.search(connection, " ".join(sample), limit=20, max_candidates=max_candidates)
+                        timings.append((time.perf_counter() - started) * 1000)
+                    timings.sort()
+                    print(f"{name:>14}: p50 {statistics.median(timings):6.2f} мс, "
+                          f"p99 {timings[int(len(timings) * 0.99) - 1]:6.2f} мс")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
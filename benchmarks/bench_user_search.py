@@ -0,0 +1,71 @@
+"""Задержка поиска пользователей по префиксу (автодополнение).
+
+Запуск: python benchmarks/bench_user_search.py [пользователей]
+"""
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import attachment, file, group, homework, user_group  # noqa: F401 - регистрация моделей
+from app.models.user import UserModel
+from app.routes.users import search_users
+
+SURNAMES = ["Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов", "Михайлов",
+            "Новиков", "Фёдоров", "Морозов", "Волков", "Алексеев", "Лебедев", "Семёнов", "Егоров"]
+NAMES = ["Александр", "Мария", "Дмитрий", "Анна", "Артём", "Елена", "Иван", "Ольга", "Пётр", "Алёна"]
+LATIN = "abcdefghijklmnopqrstuvwxyz"
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(7)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'users.db'}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+
+        with Session() as db:
+            db.add_all(
+                UserModel(
+                    telegram_id=i,
+                    username="".join(rng.choices(LATIN, k=8)),
+                    full_name=f"{rng.choice(SURNAMES)}{rng.randint(1, 999)} {rng.choice(NAMES)}",
+                    role="student",
+                )
+                for i in range(count)
+            )
+            db.commit()
+
+        queries = {
+            "одна буква": [rng.choice("ИСКПВМНФЛЕ").lower() for _ in range(200)],
+            "фамилия": [rng.choice(SURNAMES)[:4].upper() for _ in range(200)],
+            "фамилия+номер": [f"{rng.choice(SURNAMES)}{rng.randint(1, 99)}" for _ in range(200)],
+            "ё/е": [rng.choice(["Федоров", "Семенов", "ФЁДОРОВ1"]) for _ in range(200)],
+            "юзернейм": ["@" + "".join(rng.choices(LATIN, k=3)) for _ in range(200)],
+        }
+        with Session() as db:
+            for name, prefixes in queries.items():
+                timings = []
+                for prefix in prefixes:
+                    started = time.perf_counter()
+                    search_users(prefix=prefix, limit=10, db=db)
+                    timings.append((time.perf_counter() - started) * 1000)
+                    db.expunge_all()
+                timings.sort()
+                print(f"{name:>14}: p50 {statistics.median(timings):5.2f} мс, "
+                      f"p99 {timings[int(len(timings) * 0.99) - 1]:5.2f} мс")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,11 @@ from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from app.main import app, Base
+from app import replicas
 from app.database import get_db
+from app.membership import membership
+from app import cache
+from app.singleflight import reads
 #from app.models import Base
 
 # Тестовая база данных в памяти
@@ -41,7 +45,13 @@ def client(db_session):
         finally:
             pass
     
+    # get_read_db и get_write_db берут сессию из get_db; реплики в тестах отключены
     app.dependency_overrides[get_db] = override_get_db
+    replicas.router = replicas.ReplicaRouter([])
+    reads.clear()
+    membership.invalidate()
+    cache.cache.clear()
+    cache.cache.reset_stats()
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
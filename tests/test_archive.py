@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+
+def test_archive_moves_past_homeworks(client, test_group_data, test_homework_data, test_attachment_data):
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    test_homework_data["group_id"] = group_id
+    old = datetime.utcnow() - timedelta(days=400)
+    future = datetime.utcnow() + timedelta(days=10)
+    ids = []
+    for index, deadline in enumerate([old, old, old, future]):
+        body = {**test_homework_data, "title": f"Дроби {index}", "deadline": deadline.isoformat()}
+        ids.append(client.post("/homeworks/", json=body).json()["id"])
+    test_attachment_data["homework_id"] = ids[0]
+    attachment_id = client.post("/attachments/", json=test_attachment_data).json()["id"]
+    test_attachment_data["homework_id"] = ids[3]
+    client.post("/attachments/", json=test_attachment_data)
+
+    # Кэшированный список группы должен обновиться после переноса
+    assert len(client.get(f"/homeworks/group/{group_id}").json()) == 4
+
+    result = client.post("/admin/archive", json={"older_than_days": 180, "batch_size": 2}).json()
+    assert result == {"homeworks": 3, "attachments": 1, "batches": 2}
+    assert client.post("/admin/archive", json={"older_than_days": 180}).json()["homeworks"] == 0
+
+    assert [h["id"] for h in client.get("/homeworks/").json()] == [ids[3]]
+    assert [h["id"] for h in client.get(f"/homeworks/group/{group_id}").json()] == [ids[3]]
+    archived = client.get(f"/homeworks/group/{group_id}", params={"include_archived": True}).json()
+    assert [(h["id"], h["archived"]) for h in archived] == [(ids[0], True), (ids[1], True), (ids[2], True), (ids[3], False)]
+    assert client.get(f"/homeworks/{ids[0]}").status_code == 404
+    assert client.get(f"/homeworks/{ids[0]}", params={"include_archived": True}).json()["title"] == "Дроби 0"
+
+    assert client.get(f"/attachments/{attachment_id}").status_code == 404
+    attachment = client.get(f"/attachments/{attachment_id}", params={"include_archived": True}).json()
+    assert attachment["archived"] is True and attachment["file_id"] == "string"
+    assert len(client.get(f"/attachments/homework/{ids[0]}", params={"include_archived": True}).json()) == 1
+    assert len(client.get("/attachments/", params={"include_archived": True}).json()) == 2
+
+    # Поиск по умолчанию не видит архивные задания
+    assert [r["id"] for r in client.get("/search", params={"q": "дроби"}).json()] == [ids[3]]
+    found = client.get("/search", params={"q": "дроби", "include_archived": True}).json()
+    assert sorted((r["id"], r["archived"]) for r in found) == [(ids[0], True), (ids[1], True), (ids[2], True), (ids[3], False)]
+
+    stats = client.get("/groups/", params={"with_stats": True}).json()[0]["stats"]
+    assert stats["homework_count"] == 1
+
+    deleted = client.delete(f"/groups/{group_id}").json()
+    assert deleted["homeworks"] == 4 and deleted["attachments"] == 2
+    assert client.get("/search", params={"q": "дроби", "include_archived": True}).json() == []
+
+
+def test_archived_ids_are_not_reused(client, test_group_data, test_homework_data, test_attachment_data):
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    old = datetime.utcnow() - timedelta(days=400)
+    ids = []
+    for deadline in (old, old, datetime.utcnow() + timedelta(days=10)):
+        ids.append(client.post("/homeworks/", json={
+            **test_homework_data, "group_id": group_id, "deadline": deadline.isoformat(),
+        }).json()["id"])
+    attachment_id = client.post("/attachments/", json={**test_attachment_data, "homework_id": ids[1]}).json()["id"]
+
+    assert client.post("/admin/archive", json={"older_than_days": 180}).json()["homeworks"] == 2
+    client.delete(f"/homeworks/{ids[2]}")
+
+    # Горячие таблицы пусты, но новые строки не получают id архивных
+    homework_id = client.post("/homeworks/", json={**test_homework_data, "group_id": group_id}).json()["id"]
+    assert homework_id not in ids
+    new_attachment = client.post("/attachments/", json={**test_attachment_data, "homework_id": homework_id}).json()
+    assert new_attachment["id"] != attachment_id
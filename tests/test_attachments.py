@@ -159,4 +159,54 @@ def test_create_attachment_without_homework_id(client, test_attachment_data):
     
     response = client.post("/attachments/", json=attachment_data)
     # Должна быть ошибка, так как нужно либо homework_id, либо answer_id
-    assert response.status_code in [400, 422]
\ No newline at end of file
+    assert response.status_code in [400, 422]
+
+def test_create_attachments_bulk(client, test_attachment_data, test_group_data, test_homework_data):
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    homework_data = test_homework_data.copy()
+    homework_data["group_id"] = group_id
+    homework_ids = [client.post("/homeworks/", json=homework_data).json()["id"] for _ in range(2)]
+
+    album = []
+    for i in range(10):
+        attachment_data = test_attachment_data.copy()
+        attachment_data["homework_id"] = homework_ids[i % 2]
+        attachment_data["file_name"] = f"photo{i}.jpg"
+        album.append(attachment_data)
+
+    response = client.post("/attachments/bulk", json=album)
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["file_name"] for item in data] == [f"photo{i}.jpg" for i in range(10)]
+    assert len({item["id"] for item in data}) == 10
+    assert len(client.get(f"/attachments/homework/{homework_ids[0]}").json()) == 5
+
+def test_create_attachments_bulk_unknown_homework(client, test_attachment_data):
+    attachment_data = test_attachment_data.copy()
+    attachment_data["homework_id"] = 999
+
+    response = client.post("/attachments/bulk", json=[attachment_data])
+    assert response.status_code == 404
+    assert client.get("/attachments/").json() == []
+
+def test_same_file_is_stored_once(client, db_session, test_attachment_data, test_group_data, test_homework_data):
+    from app.models.file import FileModel
+
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    homework_data = test_homework_data.copy()
+    homework_data["group_id"] = group_id
+    homework_ids = [client.post("/homeworks/", json=homework_data).json()["id"] for _ in range(3)]
+
+    for homework_id in homework_ids:
+        attachment_data = test_attachment_data.copy()
+        attachment_data["homework_id"] = homework_id
+        attachment_data["file_unique_id"] = "worksheet-unique"
+        assert client.post("/attachments/", json=attachment_data).status_code == 200
+
+    assert db_session.query(FileModel).count() == 1
+
+    response = client.get(f"/attachments/by-file/{test_attachment_data['file_id']}")
+    assert response.status_code == 200
+    assert sorted(item["homework_id"] for item in response.json()) == homework_ids
+    assert len(client.get("/attachments/by-file/worksheet-unique").json()) == 3
+    assert client.get("/attachments/by-file/unknown").json() == []
@@ -0,0 +1,69 @@
+import sqlite3
+import threading
+
+import pytest
+from sqlalchemy import create_engine, create_mock_engine, text
+
+from app import backup
+
+
+def test_backup_endpoint_creates_verified_copy(client, test_user_data, tmp_path, monkeypatch):
+    monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_path))
+    client.post("/users/", json=test_user_data)
+
+    result = client.post("/admin/backups", json={}).json()
+    assert result["file"].endswith(".db.gz")
+    assert result["verify"]["integrity"] == "ok"
+    assert result["verify"]["rows"]["users"] == 1
+
+    listed = client.get("/admin/backups").json()
+    assert [b["file"] for b in listed] == [result["file"]]
+    download = client.get(f"/admin/backups/{result['file']}")
+    assert download.status_code == 200 and len(download.content) == result["bytes"]
+    assert client.get("/admin/backups/..%2Fschool_bot.db").status_code == 404
+
+    restored = tmp_path / "restored.db"
+    assert backup.restore(tmp_path / result["file"], restored)["rows"]["users"] == 1
+    with pytest.raises(FileExistsError):
+        backup.restore(tmp_path / result["file"], restored)
+
+
+def test_online_backup_while_writing(tmp_path):
+    source = tmp_path / "source.db"
+    engine = create_engine(f"sqlite:///{source}")
+    with engine.begin() as connection:
+        connection.execute(text("PRAGMA journal_mode=WAL"))
+        connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, payload TEXT)"))
+        connection.execute(text("INSERT INTO items (payload) VALUES (:p)"), [{"p": "x" * 500}] * 2000)
+
+    stop = threading.Event()
+    written = []
+
+    def writer():
+        # Отдельное соединение пишет во время копирования и не ждет его окончания
+        connection = sqlite3.connect(source, timeout=1)
+        while not stop.is_set():
+            connection.execute("INSERT INTO items (payload) VALUES ('y')")
+            connection.commit()
+            written.append(1)
+        connection.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        report = backup.create_backup(engine, str(tmp_path / "out"), compressed=False, pages=16, sleep_ms=1)
+    finally:
+        stop.set()
+        thread.join()
+        engine.dispose()
+
+    assert written
+    assert report["steps"] > 1
+    assert report["verify"]["integrity"] == "ok"
+    assert report["verify"]["rows"]["items"] >= 2000
+
+
+def test_backup_requires_sqlite():
+    engine = create_mock_engine("postgresql://", executor=None)
+    with pytest.raises(backup.BackupUnsupported):
+        backup.create_backup(engine)
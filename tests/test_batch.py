@@ -0,0 +1,72 @@
+import pytest
+from app.routes import batch
+
+def test_batch_with_references(client, test_user_data, test_group_data):
+    operations = [
+        {"method": "POST", "path": "/users/", "body": test_user_data},
+        {"method": "POST", "path": "/groups/", "body": {**test_group_data, "created_by": "$0.id"}},
+        {"method": "POST", "path": "/user-groups/",
+         "body": {"user_id": "$0.id", "group_id": "$1.id", "user_role": "student"}},
+        {"method": "GET", "path": f"/users/telegram/{test_user_data['telegram_id']}"},
+        {"method": "GET", "path": "/user-groups/user/$3.id"},
+    ]
+    response = client.post("/batch/", json=operations)
+    assert response.status_code == 200
+    results = response.json()
+    assert [r["status"] for r in results] == [200, 200, 200, 200, 200]
+
+    user_id = results[0]["body"]["id"]
+    assert results[1]["body"]["created_by"] == user_id
+    assert results[4]["body"][0]["group_id"] == results[1]["body"]["id"]
+
+def test_batch_failed_dependency(client):
+    operations = [
+        {"method": "GET", "path": "/users/999"},
+        {"method": "GET", "path": "/user-groups/user/$0.id"},
+    ]
+    results = client.post("/batch/", json=operations).json()
+    assert results[0]["status"] == 404
+    assert results[1]["status"] == 424
+
+def test_batch_size_limit(client, monkeypatch):
+    monkeypatch.setattr(batch, "BATCH_MAX_SIZE", 2)
+    operations = [{"method": "GET", "path": "/users/"}] * 3
+    response = client.post("/batch/", json=operations)
+    assert response.status_code == 400
+
+def test_nested_batch_is_rejected(client):
+    operations = [
+        {"method": "POST", "path": "/batch/?x=1", "body": []},
+        {"method": "POST", "path": "/t/school/batch", "body": []},
+    ]
+    results = client.post("/batch/", json=operations).json()
+    assert [r["status"] for r in results] == [400, 400]
+
+def test_batch_forwards_if_match(client, test_group_data):
+    group = client.post("/groups/", json=test_group_data).json()
+    operations = [
+        {"method": "PUT", "path": f"/groups/{group['id']}", "body": {"name": "Renamed"},
+         "headers": {"If-Match": '"5"'}},
+        {"method": "PUT", "path": f"/groups/{group['id']}", "body": {"name": "Renamed"},
+         "headers": {"If-Match": '"1"'}},
+    ]
+    results = client.post("/batch/", json=operations).json()
+    assert [r["status"] for r in results] == [412, 200]
+
+    # If-Match самого пакета передается подзапросам без своего заголовка
+    operations = [{"method": "PUT", "path": f"/groups/{group['id']}", "body": {"name": "Again"}}]
+    results = client.post("/batch/", json=operations, headers={"If-Match": '"1"'}).json()
+    assert results[0]["status"] == 412
+
+def test_batch_keeps_dollar_in_text(client, test_user_data, test_group_data, test_homework_data):
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    text = "Задача $1 из учебника, $0.id и $5"
+    operations = [
+        {"method": "POST", "path": "/homeworks/", "body": {**test_homework_data, "group_id": group_id, "description": text}},
+        {"method": "GET", "path": "/homeworks/$0.id"},
+    ]
+    results = client.post("/batch/", json=operations).json()
+    assert [r["status"] for r in results] == [200, 200]
+    # Ссылки заменяются только целым значением, текст сохраняется без изменений
+    assert results[0]["body"]["description"] == text
+    assert results[1]["body"]["description"] == text
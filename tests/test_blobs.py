@@ -0,0 +1,90 @@
+import pytest
+from app.blobs import BlobCache, BlobNotFound, LocalDirectoryFetcher, get_blob_cache
+from app.main import app
+
+@pytest.fixture
+def source(tmp_path):
+    directory = tmp_path / "telegram"
+    directory.mkdir()
+    for name, size in (("a", 100), ("b", 100), ("c", 100)):
+        (directory / name).write_bytes(bytes(range(size)))
+    return directory
+
+def test_cache_hits_and_lru_eviction(tmp_path, source):
+    cache = BlobCache(tmp_path / "cache", max_bytes=250, fetcher=LocalDirectoryFetcher(source))
+
+    assert cache.get("a", "a").read_bytes() == bytes(range(100))
+    cache.get("b", "b")
+    cache.get("a", "a")
+    # Бюджет на два файла: вытесняется давно не использованный b
+    cache.get("c", "c")
+
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 3
+    assert cache.stats()["evictions"] == 1
+    assert cache.size == 200
+    cache.get("b", "b")
+    assert cache.stats()["misses"] == 4
+
+def test_cache_missing_file(tmp_path, source):
+    cache = BlobCache(tmp_path / "cache", max_bytes=250, fetcher=LocalDirectoryFetcher(source))
+    with pytest.raises(BlobNotFound):
+        cache.get("missing", "missing")
+    assert list((tmp_path / "cache").iterdir()) == []
+
+def test_cache_survives_restart(tmp_path, source):
+    cache = BlobCache(tmp_path / "cache", max_bytes=250, fetcher=LocalDirectoryFetcher(source))
+    cache.get("a", "a")
+
+    restarted = BlobCache(tmp_path / "cache", max_bytes=250, fetcher=LocalDirectoryFetcher(source))
+    restarted.get("a", "a")
+    assert restarted.stats()["hits"] == 1
+
+def test_fetcher_rejects_paths_outside_source(tmp_path, source):
+    (tmp_path / "secret").write_bytes(b"secret")
+    cache = BlobCache(tmp_path / "cache", max_bytes=250, fetcher=LocalDirectoryFetcher(source))
+    for file_id in ("../secret", str(tmp_path / "secret")):
+        with pytest.raises(BlobNotFound):
+            cache.get(file_id, file_id)
+
+def test_served_file_is_not_evicted(tmp_path, source):
+    cache = BlobCache(tmp_path / "cache", max_bytes=150, fetcher=LocalDirectoryFetcher(source))
+    served = cache.acquire("a", "a")
+    # Загрузка b превышает бюджет, но отдаваемый a остается на диске
+    cache.get("b", "b")
+    cache.get("c", "c")
+    assert served.exists()
+    assert cache.stats()["evictions"] == 1
+
+    # После отправки a вытесняется как давно не использованный
+    cache.release(served)
+    assert not served.exists()
+    assert cache.size == 100
+
+def test_attachment_content_range(client, tmp_path, source, test_attachment_data, test_group_data, test_homework_data):
+    cache = BlobCache(tmp_path / "cache", max_bytes=1000, fetcher=LocalDirectoryFetcher(source))
+    app.dependency_overrides[get_blob_cache] = lambda: cache
+
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    homework_data = test_homework_data.copy()
+    homework_data["group_id"] = group_id
+    homework_id = client.post("/homeworks/", json=homework_data).json()["id"]
+    attachment_data = test_attachment_data.copy()
+    attachment_data["homework_id"] = homework_id
+    attachment_data["file_id"] = "a"
+    attachment_id = client.post("/attachments/", json=attachment_data).json()["id"]
+
+    response = client.get(f"/attachments/{attachment_id}/content")
+    assert response.status_code == 200
+    assert response.content == bytes(range(100))
+    assert response.headers["content-type"].startswith("text/plain")
+
+    response = client.get(f"/attachments/{attachment_id}/content", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == bytes(range(10, 20))
+    assert cache.stats()["bytes_served"] == 110
+    assert cache.stats()["hits"] == 1
+
+def test_attachment_content_not_configured(client):
+    app.dependency_overrides[get_blob_cache] = lambda: None
+    assert client.get("/attachments/1/content").status_code == 503
@@ -0,0 +1,172 @@
+import socketserver
+import threading
+import time
+
+import pytest
+
+from app import cache as cache_module
+from app.cache import Cache, MemoryBackend, RedisBackend, SharedBackend
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    # Минимальный сервер с протоколом Redis: команды, которые использует RedisBackend
+
+    def read_command(self):
+        header = self.rfile.readline()
+        if not header:
+            return None
+        args = []
+        for _ in range(int(header[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def bulk(self, value):
+        return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            command = args[0].upper()
+            with self.server.lock:
+                now = time.monotonic()
+                for key in [k for k, (_, expires) in store.items() if expires is not None and expires <= now]:
+                    del store[key]
+                if command == b"GET":
+                    reply = self.bulk(store.get(args[1], (None, None))[0])
+                elif command == b"SET":
+                    expires = now + int(args[4]) / 1000 if len(args) > 4 else None
+                    store[args[1]] = (args[2], expires)
+                    reply = b"+OK\r\n"
+                elif command == b"MGET":
+                    values = [self.bulk(store.get(key, (None, None))[0]) for key in args[1:]]
+                    reply = b"*%d\r\n" % len(values) + b"".join(values)
+                elif command == b"INCR":
+                    value = int(store.get(args[1], (b"0", None))[0]) + 1
+                    store[args[1]] = (str(value).encode(), None)
+                    reply = b":%d\r\n" % value
+                else:
+                    reply = b"-ERR unknown command\r\n"
+            self.wfile.write(reply)
+
+
+@pytest.fixture
+def redis_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), RespHandler)
+    server.daemon_threads = True
+    server.store, server.lock = {}, threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"redis://127.0.0.1:{server.server_address[1]}/0"
+    server.shutdown()
+    server.server_close()
+
+
+class FakeSession:
+    info = {}
+
+
+def backends(tmp_path, redis_url):
+    return [MemoryBackend(), SharedBackend(str(tmp_path / "cache.db")), RedisBackend(redis_url)]
+
+
+def test_backends_ttl_and_tag_invalidation(tmp_path, redis_server):
+    for backend in backends(tmp_path, redis_server):
+        cache = Cache(backend, ttl=0.2)
+        loads = []
+
+        def load():
+            loads.append(1)
+            return b"value-%d" % len(loads)
+
+        assert cache.get_or_load("route", (1,), ["group:1"], load) == b"value-1"
+        assert cache.get_or_load("route", (1,), ["group:1"], load) == b"value-1"
+        # Инвалидация другого тега запись не затрагивает
+        cache.invalidate(FakeSession(), "group:2")
+        assert cache.get_or_load("route", (1,), ["group:1"], load) == b"value-1"
+
+        cache.invalidate(FakeSession(), "group:1")
+        assert cache.get_or_load("route", (1,), ["group:1"], load) == b"value-2"
+        time.sleep(0.25)
+        assert cache.get_or_load("route", (1,), ["group:1"], load) == b"value-3"
+
+        cache.clear()
+        assert cache.get_or_load("route", (1,), ["group:1"], load) == b"value-4"
+        stats = cache.stats()["routes"]["route"]
+        assert (stats["hits"], stats["misses"]) == (2, 4), backend.name
+
+
+def test_shared_backend_is_seen_by_other_processes(tmp_path):
+    # Два экземпляра на один файл изображают два рабочих процесса
+    first = Cache(SharedBackend(str(tmp_path / "cache.db")))
+    second = Cache(SharedBackend(str(tmp_path / "cache.db")))
+    assert first.get_or_load("route", (1,), ["users"], lambda: b"old") == b"old"
+    assert second.get_or_load("route", (1,), ["users"], lambda: b"new") == b"old"
+    second.invalidate(FakeSession(), "users")
+    assert first.get_or_load("route", (1,), ["users"], lambda: b"new") == b"new"
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_entries=2)
+    backend.set("a", b"1", 60)
+    backend.set("b", b"2", 60)
+    assert backend.get("a") == b"1"
+    backend.set("c", b"3", 60)
+    assert backend.get("b") is None
+    assert backend.get("a") == b"1" and backend.get("c") == b"3"
+
+
+def test_concurrent_misses_load_once():
+    cache = Cache(MemoryBackend())
+    started = threading.Event()
+    loads = []
+
+    def load():
+        loads.append(1)
+        started.set()
+        time.sleep(0.1)
+        return b"value"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_load("route", (1,), [], load)))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [b"value"] * 8
+    assert len(loads) == 1
+
+
+def test_unavailable_backend_falls_back_to_load():
+    cache = Cache(RedisBackend("redis://127.0.0.1:1/0", timeout=0.1))
+    assert cache.get_or_load("route", (1,), [], lambda: b"value") == b"value"
+    assert cache.stats()["errors"] == 1
+
+
+def test_routes_are_cached_and_invalidated_by_writes(client, test_group_data, test_homework_data):
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    test_homework_data["group_id"] = group_id
+    client.post("/homeworks/", json=test_homework_data)
+
+    assert len(client.get(f"/homeworks/group/{group_id}").json()) == 1
+    assert len(client.get(f"/homeworks/group/{group_id}").json()) == 1
+    client.post("/homeworks/", json=test_homework_data)
+    assert len(client.get(f"/homeworks/group/{group_id}").json()) == 2
+
+    assert client.get(f"/groups/{group_id}").json()["name"] == "Test Group"
+    client.put(f"/groups/{group_id}", json={"name": "Renamed"})
+    assert client.get(f"/groups/{group_id}").json()["name"] == "Renamed"
+    assert client.get("/groups/").json()[0]["name"] == "Renamed"
+
+    client.delete(f"/groups/{group_id}")
+    assert client.get(f"/groups/{group_id}").status_code == 404
+
+    routes = client.get("/metrics").json()["cache"]["routes"]
+    assert routes["homeworks.group"] == {"hits": 1, "misses": 2, "hit_ratio": 1 / 3}
+    assert routes["groups.id"]["misses"] == 3
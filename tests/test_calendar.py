@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+from email.utils import format_datetime, parsedate_to_datetime
+
+from sqlalchemy import event
+
+from tests.conftest import engine
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args):
+        self.count += 1
+
+
+def test_group_calendar_conditional_requests(client, test_group_data, test_homework_data):
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    test_homework_data["group_id"] = group_id
+    deadline = datetime.utcnow() + timedelta(days=3)
+    test_homework_data.update(title="Дроби; часть 1, задачи", deadline=deadline.replace(microsecond=0).isoformat())
+    homework_id = client.post("/homeworks/", json=test_homework_data).json()["id"]
+    test_homework_data.update(title="Старое", deadline=(datetime.utcnow() - timedelta(days=400)).isoformat())
+    client.post("/homeworks/", json=test_homework_data)
+
+    response = client.get(f"/groups/{group_id}/calendar.ics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/calendar")
+    body = response.text
+    assert body.startswith("BEGIN:VCALENDAR\r\n") and body.endswith("END:VCALENDAR\r\n")
+    assert body.count("BEGIN:VEVENT") == 1
+    assert f"UID:homework-{homework_id}@school-bot" in body
+    assert r"SUMMARY:Дроби\; часть 1\, задачи" in body
+    assert f"DTSTART:{deadline:%Y%m%dT%H%M%S}Z" in body
+    etag, last_modified = response.headers["etag"], response.headers["last-modified"]
+
+    # Повторный опрос: 304 из кэша, без запросов к базе
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        assert client.get(f"/groups/{group_id}/calendar.ics", headers={"If-None-Match": etag}).status_code == 304
+        assert client.get(
+            f"/groups/{group_id}/calendar.ics", headers={"If-Modified-Since": last_modified}
+        ).status_code == 304
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+    assert counter.count == 0
+
+    client.put(f"/homeworks/{homework_id}", json={"title": "Дроби, часть 2"})
+    response = client.get(f"/groups/{group_id}/calendar.ics", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+    assert "SEQUENCE:1" in response.text and "часть 2" in response.text
+
+    assert client.get("/groups/999/calendar.ics").status_code == 404
+
+
+def test_user_calendar_follows_memberships(client, test_user_data, test_group_data, test_homework_data):
+    user_id = client.post("/users/", json=test_user_data).json()["id"]
+    groups = [
+        client.post("/groups/", json={**test_group_data, "name": f"Группа {i}"}).json()["id"] for i in range(2)
+    ]
+    deadline = (datetime.utcnow() + timedelta(days=1)).isoformat()
+    for group_id in groups:
+        client.post("/homeworks/", json={**test_homework_data, "group_id": group_id, "deadline": deadline})
+
+    empty = client.get(f"/users/{user_id}/calendar.ics")
+    assert empty.status_code == 200 and "BEGIN:VEVENT" not in empty.text
+
+    client.post("/user-groups/", json={"user_id": user_id, "group_id": groups[0], "user_role": "student"})
+    response = client.get(f"/users/{user_id}/calendar.ics", headers={"If-None-Match": empty.headers["etag"]})
+    assert response.status_code == 200
+    assert response.text.count("BEGIN:VEVENT") == 1 and "CATEGORIES:Группа 0" in response.text
+    assert client.get(
+        f"/users/{user_id}/calendar.ics", headers={"If-None-Match": response.headers["etag"]}
+    ).status_code == 304
+
+    client.post("/homeworks/", json={**test_homework_data, "group_id": groups[0], "deadline": deadline})
+    assert client.get(f"/users/{user_id}/calendar.ics").text.count("BEGIN:VEVENT") == 2
+    assert client.get("/users/999/calendar.ics").status_code == 404
+
+
+def test_calendar_last_modified_follows_etag(client, test_user_data, test_group_data, test_homework_data):
+    user_id = client.post("/users/", json=test_user_data).json()["id"]
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    client.post("/user-groups/", json={"user_id": user_id, "group_id": group_id, "user_role": "student"})
+    deadline = (datetime.utcnow() + timedelta(days=1)).isoformat()
+    client.post("/homeworks/", json={**test_homework_data, "group_id": group_id, "deadline": deadline})
+
+    def headers(path):
+        response = client.get(path)
+        return response.headers["etag"], parsedate_to_datetime(response.headers["last-modified"])
+
+    group_etag, group_modified = headers(f"/groups/{group_id}/calendar.ics")
+    user_etag, user_modified = headers(f"/users/{user_id}/calendar.ics")
+
+    # Запись без изменения календаря: ETag и Last-Modified прежние
+    client.post("/homeworks/", json={**test_homework_data, "group_id": group_id, "deadline": "2000-01-01T00:00:00"})
+    assert headers(f"/groups/{group_id}/calendar.ics") == (group_etag, group_modified)
+
+    # Переименование группы меняет календарь, Last-Modified сдвигается вперед
+    client.put(f"/groups/{group_id}", json={"name": "Новое название"})
+    etag, modified = headers(f"/groups/{group_id}/calendar.ics")
+    assert etag != group_etag and modified > group_modified
+
+    # Выход из группы тоже, хотя активность группы не менялась
+    client.delete(f"/user-groups/{user_id}/{group_id}")
+    etag, modified = headers(f"/users/{user_id}/calendar.ics")
+    assert etag != user_etag and modified > user_modified
+    assert client.get(
+        f"/users/{user_id}/calendar.ics", headers={"If-Modified-Since": format_datetime(user_modified, usegmt=True)}
+    ).status_code == 200
@@ -68,4 +68,115 @@ def test_delete_group(client, test_group_data):
     
     # Проверяем, что группа удалена
     response = client.get(f"/groups/{group_id}")
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+def test_read_groups_with_stats(client, test_user_data, test_group_data, test_homework_data):
+    user_id = client.post("/users/", json=test_user_data).json()["id"]
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    client.post("/user-groups/", json={"user_id": user_id, "group_id": group_id, "user_role": "member"})
+
+    deadlines = ["2099-03-01T00:00:00", "2099-01-01T00:00:00", "2000-01-01T00:00:00"]
+    homework_ids = [
+        client.post("/homeworks/", json={**test_homework_data, "group_id": group_id, "deadline": deadline}).json()["id"]
+        for deadline in deadlines
+    ]
+
+    # Без параметра статистика в ответ не попадает
+    assert "stats" not in client.get("/groups/").json()[0]
+
+    stats = client.get("/groups/", params={"with_stats": True}).json()[0]["stats"]
+    assert stats["member_count"] == 1
+    assert stats["homework_count"] == 3
+    assert stats["next_deadline"] == "2099-01-01T00:00:00"
+    assert stats["last_activity"] is not None
+
+    # Удаление задания с ближайшим сроком пересчитывает срок
+    client.delete(f"/homeworks/{homework_ids[1]}")
+    client.delete(f"/user-groups/{user_id}/{group_id}")
+    stats = client.get("/groups/", params={"with_stats": True}).json()[0]["stats"]
+    assert stats["member_count"] == 0
+    assert stats["homework_count"] == 2
+    assert stats["next_deadline"] == "2099-03-01T00:00:00"
+
+    client.put(f"/homeworks/{homework_ids[2]}", json={"deadline": "2098-06-01T00:00:00"})
+    stats = client.get("/groups/", params={"with_stats": True}).json()[0]["stats"]
+    assert stats["next_deadline"] == "2098-06-01T00:00:00"
+
+def _group_with_content(client, test_user_data, test_group_data, test_homework_data, homeworks=2):
+    user_id = client.post("/users/", json=test_user_data).json()["id"]
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    client.post("/user-groups/", json={"user_id": user_id, "group_id": group_id, "user_role": "member"})
+    homework_ids = []
+    for _ in range(homeworks):
+        homework_id = client.post("/homeworks/", json={**test_homework_data, "group_id": group_id}).json()["id"]
+        client.post("/attachments/", json={
+            "homework_id": homework_id, "file_id": f"file-{homework_id}",
+            "file_type": "document", "file_name": "ws.pdf",
+        })
+        homework_ids.append(homework_id)
+    return user_id, group_id, homework_ids
+
+def test_delete_group_cascades(client, test_user_data, test_group_data, test_homework_data):
+    user_id, group_id, homework_ids = _group_with_content(client, test_user_data, test_group_data, test_homework_data)
+    # Ответ из кэша членства должен обновиться после удаления
+    assert client.get(f"/user-groups/{user_id}/{group_id}").status_code == 200
+
+    response = client.delete(f"/groups/{group_id}")
+    assert response.status_code == 200
+    assert response.json() == {
+        "message": "Group deleted successfully", "homeworks": 2, "attachments": 2, "memberships": 1,
+    }
+    assert client.get(f"/homeworks/{homework_ids[0]}").status_code == 404
+    assert client.get("/attachments/").json() == []
+    assert client.get(f"/user-groups/{user_id}/{group_id}").status_code == 404
+    assert client.get(f"/homeworks/group/{group_id}").json() == []
+
+def test_delete_large_group_in_background(client, test_user_data, test_group_data, test_homework_data, monkeypatch):
+    from app import cascade
+    monkeypatch.setattr(cascade, "CASCADE_BACKGROUND_THRESHOLD", 1)
+    _, group_id, _ = _group_with_content(client, test_user_data, test_group_data, test_homework_data)
+
+    response = client.delete(f"/groups/{group_id}")
+    assert response.status_code == 202
+    assert response.json() == {"message": "Group deletion scheduled", "homeworks": 2}
+    # TestClient выполняет фоновые задачи до возврата ответа
+    assert client.get(f"/groups/{group_id}").status_code == 404
+    assert client.get("/homeworks/").json() == []
+
+def test_clone_group(client, test_user_data, test_group_data, test_homework_data):
+    _, group_id, homework_ids = _group_with_content(client, test_user_data, test_group_data, test_homework_data)
+
+    response = client.post(f"/groups/{group_id}/clone", json={"name": "Next cohort", "deadline_offset_days": 7})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["homeworks"] == 2 and data["attachments"] == 2
+    new_group = data["group"]
+    assert new_group["name"] == "Next cohort"
+    assert new_group["description"] == test_group_data["description"]
+
+    copies = client.get(f"/homeworks/group/{new_group['id']}", params={"expand": "attachments"}).json()
+    assert [h["deadline"] for h in copies] == ["2025-01-07T23:59:59"] * 2
+    assert sorted(h["id"] for h in copies) != sorted(homework_ids)
+    # Вложения копии ссылаются на те же файлы Telegram
+    assert [h["attachments"][0]["file_id"] for h in copies] == [f"file-{i}" for i in homework_ids]
+
+    stats = {g["id"]: g["stats"] for g in client.get("/groups/", params={"with_stats": True}).json()}
+    assert stats[new_group["id"]]["homework_count"] == 2
+    assert stats[new_group["id"]]["member_count"] == 0
+
+    assert client.post(f"/groups/{group_id}/clone", json={"name": "Next cohort"}).status_code == 400
+    assert client.post("/groups/999/clone", json={"name": "Other"}).status_code == 404
+
+def test_delete_cloned_homework_updates_next_deadline(client, test_group_data, test_homework_data):
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    for deadline in ("2098-12-26T00:00:00", "2099-01-26T00:00:00"):
+        client.post("/homeworks/", json={**test_homework_data, "group_id": group_id, "deadline": deadline})
+    new_group = client.post(
+        f"/groups/{group_id}/clone", json={"name": "Next cohort", "deadline_offset_days": 7}
+    ).json()["group"]
+    copies = client.get(f"/homeworks/group/{new_group['id']}").json()
+    first = next(h for h in copies if h["deadline"] == "2099-01-02T00:00:00")
+
+    assert client.delete(f"/homeworks/{first['id']}").status_code == 200
+    # Срок копии хранится в том же формате, что и у исходного задания, поэтому ближайший срок пересчитывается
+    stats = {g["id"]: g["stats"] for g in client.get("/groups/", params={"with_stats": True}).json()}
+    assert stats[new_group["id"]]["next_deadline"] == "2099-02-02T00:00:00"
@@ -103,4 +103,72 @@ def test_delete_homework(client, test_homework_data, test_group_data):
     
     # Проверяем, что домашнее задание удалено
     response = client.get(f"/homeworks/{homework_id}")
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+def test_read_homework_full(client, test_homework_data, test_group_data, test_user_data, test_attachment_data):
+    user_id = client.post("/users/", json=test_user_data).json()["id"]
+    group_response = client.post("/groups/", json=test_group_data)
+    group_id = group_response.json()["id"]
+
+    homework_data = test_homework_data.copy()
+    homework_data["group_id"] = group_id
+    homework_data["assigned_by"] = user_id
+    homework_id = client.post("/homeworks/", json=homework_data).json()["id"]
+
+    attachment_data = test_attachment_data.copy()
+    attachment_data["homework_id"] = homework_id
+    client.post("/attachments/", json=attachment_data)
+
+    response = client.get(f"/homeworks/{homework_id}/full")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["group"]["name"] == test_group_data["name"]
+    assert data["assigner"]["id"] == user_id
+    assert len(data["attachments"]) == 1
+
+    assert client.get("/homeworks/999/full").status_code == 404
+
+def test_read_group_homeworks_expand(client, test_homework_data, test_group_data, test_attachment_data):
+    from sqlalchemy import event
+    from tests.conftest import engine
+
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    homework_data = test_homework_data.copy()
+    homework_data["group_id"] = group_id
+    for _ in range(5):
+        homework_id = client.post("/homeworks/", json=homework_data).json()["id"]
+        attachment_data = test_attachment_data.copy()
+        attachment_data["homework_id"] = homework_id
+        client.post("/attachments/", json=attachment_data)
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        response = client.get(f"/homeworks/group/{group_id}?expand=attachments,assigner")
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data) == 5
+    assert all(len(item["attachments"]) == 1 for item in data)
+    assert "group" not in data[0]
+    # Число запросов не зависит от числа заданий
+    assert len(statements) == 2
+
+    assert client.get(f"/homeworks/group/{group_id}?expand=unknown").status_code == 400
+
+    # Схема ответа в OpenAPI описывает и раскрытые поля
+    schema = client.get("/openapi.json").json()["paths"]["/homeworks/group/{group_id}"]["get"]
+    items = schema["responses"]["200"]["content"]["application/json"]["schema"]["items"]
+    assert {"$ref": "#/components/schemas/HomeworkFull"} in items["anyOf"]
+
+def test_delete_homework_removes_attachments(client, test_homework_data, test_group_data, test_attachment_data):
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    homework_id = client.post("/homeworks/", json={**test_homework_data, "group_id": group_id}).json()["id"]
+    client.post("/attachments/", json={**test_attachment_data, "homework_id": homework_id})
+    assert len(client.get(f"/attachments/homework/{homework_id}").json()) == 1
+
+    response = client.delete(f"/homeworks/{homework_id}")
+    assert response.json() == {"message": "Homework deleted successfully", "homeworks": 1, "attachments": 1}
+    assert client.get(f"/attachments/homework/{homework_id}").json() == []
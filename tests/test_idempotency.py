@@ -0,0 +1,124 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from app import idempotency
+from app.migrations import migrate
+from app.models.idempotency_key import IdempotencyKeyModel
+
+def test_retry_returns_stored_response(client, db_session, test_group_data, test_homework_data):
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    homework_data = test_homework_data.copy()
+    homework_data["group_id"] = group_id
+    headers = {"Idempotency-Key": "homework-1"}
+
+    first = client.post("/homeworks/", json=homework_data, headers=headers)
+    assert first.status_code == 200
+
+    retry = client.post("/homeworks/", json=homework_data, headers=headers)
+    assert retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+
+    # Обработчик не выполнялся повторно
+    assert len(client.get("/homeworks/").json()) == 1
+
+def test_error_responses_are_replayed(client, test_group_data):
+    client.post("/groups/", json=test_group_data)
+    headers = {"Idempotency-Key": "group-dup"}
+
+    first = client.post("/groups/", json=test_group_data, headers=headers)
+    assert first.status_code == 400
+    retry = client.post("/groups/", json=test_group_data, headers=headers)
+    assert retry.status_code == 400
+    assert retry.json() == first.json()
+
+def test_key_reused_for_another_path(client, test_user_data, test_group_data):
+    headers = {"Idempotency-Key": "shared"}
+    assert client.post("/users/", json=test_user_data, headers=headers).status_code == 200
+
+    response = client.post("/groups/", json=test_group_data, headers=headers)
+    assert response.status_code == 422
+
+def test_store_is_bounded(db_session, monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_MAX_KEYS", 3)
+    for i in range(5):
+        db_session.add(IdempotencyKeyModel(
+            key=f"k{i}", method="POST", path="/users/", status_code=200, body=b"{}",
+        ))
+    db_session.commit()
+
+    idempotency.evict(db_session)
+    db_session.commit()
+    assert db_session.query(IdempotencyKeyModel).count() == 3
+
+def test_expired_key_is_stored_again(client, db_session, test_group_data, test_homework_data):
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    homework_data = {**test_homework_data, "group_id": group_id}
+    headers = {"Idempotency-Key": "homework-expired"}
+    assert client.post("/homeworks/", json=homework_data, headers=headers).status_code == 200
+
+    # Срок ключа истек, но запись еще не удалена очисткой
+    row = db_session.get(IdempotencyKeyModel, "homework-expired")
+    row.created_at = datetime.utcnow() - timedelta(seconds=idempotency.IDEMPOTENCY_TTL_SECONDS + 60)
+    db_session.commit()
+
+    second = client.post("/homeworks/", json=homework_data, headers=headers)
+    assert "Idempotent-Replayed" not in second.headers
+    # Новый ответ сохранен: следующий повтор не выполняет запись еще раз
+    retry = client.post("/homeworks/", json=homework_data, headers=headers)
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == second.json()
+    assert len(client.get("/homeworks/").json()) == 2
+
+def test_key_reused_with_another_body(client, test_group_data):
+    headers = {"Idempotency-Key": "group-body"}
+    assert client.post("/groups/", json=test_group_data, headers=headers).status_code == 200
+
+    other = dict(test_group_data, name="Another Group")
+    response = client.post("/groups/", json=other, headers=headers)
+    assert response.status_code == 422
+    assert len(client.get("/groups/").json()) == 1
+
+def test_concurrent_duplicates_run_once(client, monkeypatch, test_group_data, test_homework_data):
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    homework_data = test_homework_data.copy()
+    homework_data["group_id"] = group_id
+    headers = {"Idempotency-Key": "homework-concurrent"}
+
+    # Обработчик первого запроса задерживается, чтобы дубликаты пришли во время его выполнения
+    load_response = idempotency.load_response
+    def slow_load(db, key):
+        time.sleep(0.05)
+        return load_response(db, key)
+    monkeypatch.setattr(idempotency, "load_response", slow_load)
+
+    responses = []
+    def post():
+        responses.append(client.post("/homeworks/", json=homework_data, headers=headers))
+    threads = [threading.Thread(target=post) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert [response.status_code for response in responses] == [200] * 5
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert sum(response.headers.get("Idempotent-Replayed") == "true" for response in responses) == 4
+    assert len(client.get(f"/homeworks/group/{group_id}").json()) == 1
+
+def test_add_idempotency_fingerprint(tmp_path):
+    path = tmp_path / "legacy.db"
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE idempotency_keys (key VARCHAR(255) PRIMARY KEY, method VARCHAR(10) NOT NULL, "
+        "path VARCHAR(255) NOT NULL, status_code INTEGER NOT NULL, content_type VARCHAR(100), "
+        "body BLOB NOT NULL, created_at DATETIME)"
+    )
+    connection.commit()
+    connection.close()
+
+    assert migrate(f"sqlite:///{path}")["add_idempotency_fingerprint"] == {"migrated": True}
+    assert migrate(f"sqlite:///{path}")["add_idempotency_fingerprint"] == {"migrated": False}
@@ -0,0 +1,80 @@
+import json
+
+from sqlalchemy import text
+
+from app import imports
+
+
+def test_import_users_csv(client, test_user_data):
+    client.post("/users/", json=test_user_data)
+    body = (
+        "telegram_id,username,full_name,role\r\n"
+        f"{test_user_data['telegram_id']},dup,Дубликат,student\r\n"
+        '1,ivan,"Иванов, Иван",student\r\n'
+        '2,,"Ёлкин\nПётр",teacher\r\n'
+        "2,again,Повтор,student\r\n"
+        "x,bad,Ошибка,student\r\n"
+        "3,short\r\n"
+    )
+    result = client.post("/import/users", content=body, headers={"Content-Type": "text/csv"}).json()
+    assert result["rows"] == 6 and result["inserted"] == 2
+    assert result["skipped"] == 2 and result["failed"] == 2
+    assert [(e["row"], e["error"]) for e in result["errors"] if e["row"] in (1, 4, 6)] == [
+        (1, "User already exists"), (4, "User already exists"), (6, "Expected 4 columns, got 2"),
+    ]
+    assert result["errors"][2]["row"] == 5 and result["errors"][2]["error"].startswith("telegram_id")
+
+    user = client.get("/users/telegram/2").json()
+    assert user["full_name"] == "Ёлкин\nПётр" and user["username"] is None and user["version"] == 1
+    assert [u["telegram_id"] for u in client.get("/users/search", params={"prefix": "елкин"}).json()] == [2]
+
+
+def test_import_groups_and_homeworks_ndjson(client, monkeypatch):
+    monkeypatch.setattr(imports, "IMPORT_CHUNK_SIZE", 2)
+    groups = "\n".join(json.dumps({"name": f"Группа {i}", "created_by": 1}) for i in range(3))
+    result = client.post("/import/groups?format=ndjson", content=groups + "\n[1]\n{oops\n").json()
+    assert (result["inserted"], result["failed"]) == (3, 2)
+    group_id = client.get("/groups/").json()[0]["id"]
+    # Список заданий группы закэширован до импорта
+    assert client.get(f"/homeworks/group/{group_id}").json() == []
+
+    rows = [
+        {"group_id": group_id, "assigned_by": 1, "title": f"Задание {i}", "deadline": "2099-01-01T00:00:00"}
+        for i in range(5)
+    ] + [{"group_id": 999, "assigned_by": 1, "title": "Нет группы", "deadline": "2099-01-01T00:00:00"}]
+    response = client.post(
+        "/import/homeworks",
+        content=iter(json.dumps(row).encode() + b"\n" for row in rows),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    result = response.json()
+    assert result["inserted"] == 5 and result["errors"] == [{"row": 6, "error": "Group not found"}]
+    assert len(client.get(f"/homeworks/group/{group_id}").json()) == 5
+    stats = client.get("/groups/", params={"with_stats": True}).json()[0]["stats"]
+    assert stats["homework_count"] == 5
+    assert client.get("/search", params={"q": "задание"}).json()
+
+
+def test_import_rejects_unknown_entity_and_format(client, monkeypatch):
+    assert client.post("/import/files", content="", headers={"Content-Type": "text/csv"}).status_code == 404
+    assert client.post("/import/users", content="{}", headers={"Content-Type": "application/json"}).status_code == 415
+
+    monkeypatch.setattr(imports, "IMPORT_MAX_ERRORS", 2)
+    result = client.post("/import/users?format=ndjson", content="1\n2\n3\n").json()
+    assert result["failed"] == 3 and len(result["errors"]) == 2 and result["errors_truncated"] is True
+
+
+def test_import_failing_row_does_not_fail_chunk(client, db_session):
+    db_session.execute(text(
+        "CREATE TRIGGER reject_group BEFORE INSERT ON groups WHEN NEW.name LIKE 'Плохая%' "
+        "BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+    ))
+    db_session.commit()
+    names = ["Группа 1", "Плохая 1", "Группа 2", "Группа 3", "Плохая 2", "Группа 4"]
+    body = "\n".join(json.dumps({"name": name, "created_by": 1}) for name in names)
+    result = client.post("/import/groups?format=ndjson", content=body).json()
+    assert (result["inserted"], result["failed"]) == (4, 2)
+    assert result["errors"] == [
+        {"row": 2, "error": "Insert failed: IntegrityError"}, {"row": 5, "error": "Insert failed: IntegrityError"},
+    ]
+    assert sorted(g["name"] for g in client.get("/groups/").json()) == ["Группа 1", "Группа 2", "Группа 3", "Группа 4"]
@@ -0,0 +1,43 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.invalidation import InvalidationBus
+
+
+def test_poll_sees_changes_from_other_processes(tmp_path):
+    # Два движка на один файл изображают два рабочих процесса
+    url = f"sqlite:///{tmp_path / 'bus.db'}"
+    writer_engine, reader_engine = create_engine(url), create_engine(url)
+    Base.metadata.create_all(bind=writer_engine)
+    writer, reader = InvalidationBus(), InvalidationBus()
+    invalidated = []
+    reader.subscribe("membership", lambda: invalidated.append("membership"))
+
+    with reader_engine.connect() as connection:
+        assert reader.poll(connection) == []
+        connection.rollback()
+
+        with Session(writer_engine) as session:
+            version = writer.publish(session, "membership")
+            session.commit()
+        assert version == 1
+
+        assert reader.poll(connection) == ["membership"]
+        connection.rollback()
+        assert invalidated == ["membership"]
+        # Без новых фиксаций таблица версий не читается повторно
+        assert reader.poll(connection) == []
+        connection.rollback()
+
+        # Собственное изменение, подтвержденное acknowledge, не вызывает инвалидацию
+        with Session(writer_engine) as session:
+            version = reader.publish(session, "membership")
+            session.commit()
+        reader.acknowledge("membership", version)
+        assert reader.poll(connection) == []
+        connection.rollback()
+    assert invalidated == ["membership"]
+
+    writer_engine.dispose()
+    reader_engine.dispose()
@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+from app import limits
+from app.limits import RouteLimiter
+
+def test_limiter_sheds_when_queue_is_full():
+    async def scenario():
+        limiter = RouteLimiter("test", concurrency=1, queue_size=0, queue_timeout_ms=1000)
+        assert await limiter.acquire()
+        assert not await limiter.acquire()
+        limiter.release()
+        assert await limiter.acquire()
+        return limiter.stats()
+
+    assert asyncio.run(scenario()) == {"active": 1, "queued": 0, "shed": 1, "timed_out": 0}
+
+def test_limiter_queue_timeout():
+    async def scenario():
+        limiter = RouteLimiter("test", concurrency=1, queue_size=1, queue_timeout_ms=20)
+        assert await limiter.acquire()
+        assert not await limiter.acquire()
+        return limiter.stats()
+
+    assert asyncio.run(scenario()) == {"active": 1, "queued": 0, "shed": 1, "timed_out": 1}
+
+def test_limiter_hands_slot_to_waiter():
+    async def scenario():
+        limiter = RouteLimiter("test", concurrency=1, queue_size=1, queue_timeout_ms=1000)
+        assert await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert limiter.stats()["queued"] == 1
+        limiter.release()
+        assert await waiter
+        limiter.release()
+        return limiter.stats()
+
+    assert asyncio.run(scenario()) == {"active": 0, "queued": 0, "shed": 0, "timed_out": 0}
+
+def test_overloaded_writes_get_503(client, monkeypatch, test_user_data):
+    monkeypatch.setitem(limits.limiters, "write", RouteLimiter("write", 0, 0, 0))
+
+    response = client.post("/users/", json=test_user_data)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == str(limits.RETRY_AFTER_SECONDS)
+
+    # Чтения ограничиваются отдельно и продолжают обслуживаться
+    response = client.get(f"/users/telegram/{test_user_data['telegram_id']}")
+    assert response.status_code == 404
+    assert client.get("/metrics").json()["limits"]["write"]["shed"] == 1
@@ -0,0 +1,76 @@
+from sqlalchemy import create_engine, text
+
+from app.database import configure_sqlite
+from app.maintenance import MaintenanceScheduler, parse_hours, scheduler
+
+
+def make_database(path):
+    engine = configure_sqlite(create_engine(f"sqlite:///{path}"))
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, group_id INTEGER, payload TEXT)"))
+        connection.execute(text("CREATE INDEX ix_items_group ON items (group_id)"))
+        connection.execute(
+            text("INSERT INTO items (group_id, payload) VALUES (:g, :p)"),
+            [{"g": i % 10, "p": "x" * 1000} for i in range(2000)],
+        )
+    with engine.begin() as connection:
+        connection.execute(text("DELETE FROM items WHERE id > 200"))
+    return engine
+
+
+def test_maintenance_run_reports_each_step(tmp_path):
+    engine = make_database(tmp_path / "school.db")
+    maintenance = MaintenanceScheduler(load=lambda: 0)
+    maintenance.watch("main", engine)
+
+    report = maintenance.run()
+    result = report["databases"]["main"]
+    assert report["completed"] is True
+    assert result["analyze"]["mode"] == "analyze"
+    assert result["incremental_vacuum"]["free_pages"] > 0
+    assert result["incremental_vacuum"]["released"] == result["incremental_vacuum"]["free_pages"]
+    assert result["wal_checkpoint"]["busy"] is False
+    assert (tmp_path / "school.db-wal").stat().st_size == 0
+
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT COUNT(*) FROM sqlite_stat1")).scalar() > 0
+        assert connection.execute(text("PRAGMA freelist_count")).scalar() == 0
+    assert maintenance.run()["databases"]["main"]["analyze"]["mode"] == "optimize"
+    assert maintenance.stats()["runs"] == 2
+    engine.dispose()
+
+
+def test_maintenance_yields_to_load(tmp_path):
+    engine = make_database(tmp_path / "school.db")
+    load = [10]
+    maintenance = MaintenanceScheduler(interval_seconds=3600, load=lambda: load[0])
+    maintenance.watch("main", engine)
+
+    assert maintenance.tick() is None
+    assert maintenance.deferred == 1
+    report = maintenance.run("schedule", force=False)
+    assert report["completed"] is False
+    assert report["databases"]["main"] == {"deferred": "load"}
+
+    load[0] = 0
+    assert maintenance.tick()["completed"] is True
+    # Следующий обход - через интервал
+    assert maintenance.tick() is None
+    engine.dispose()
+
+
+def test_parse_hours():
+    assert parse_hours("") is None
+    assert parse_hours("1-3") == {1, 2, 3}
+    assert parse_hours("22-1") == {22, 23, 0, 1}
+
+
+def test_maintenance_endpoint(client, tmp_path, monkeypatch):
+    engine = make_database(tmp_path / "school.db")
+    monkeypatch.setattr(scheduler, "_engines", {"main": engine})
+
+    report = client.post("/admin/maintenance").json()
+    assert report["trigger"] == "manual"
+    assert set(report["databases"]["main"]) == {"analyze", "incremental_vacuum", "wal_checkpoint"}
+    assert client.get("/admin/maintenance").json()[0]["started_at"] == report["started_at"]
+    engine.dispose()
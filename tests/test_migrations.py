@@ -0,0 +1,127 @@
+import sqlite3
+
+import pytest
+from app.migrations import migrate
+
+LEGACY_ATTACHMENTS = """
+CREATE TABLE attachments (
+    id INTEGER PRIMARY KEY,
+    homework_id INTEGER NOT NULL,
+    file_id VARCHAR(255) NOT NULL,
+    file_type VARCHAR(50) NOT NULL,
+    file_name VARCHAR(255) NOT NULL,
+    caption TEXT,
+    uploaded_at DATETIME
+)
+"""
+
+def test_dedupe_attachment_files(tmp_path):
+    path = tmp_path / "legacy.db"
+    connection = sqlite3.connect(path)
+    connection.execute(LEGACY_ATTACHMENTS)
+    connection.execute("CREATE INDEX ix_attachments_file_id ON attachments (file_id)")
+    connection.executemany(
+        "INSERT INTO attachments (homework_id, file_id, file_type, file_name) VALUES (?, ?, 'document', 'ws.pdf')",
+        [(homework_id, f"file-{homework_id % 3}") for homework_id in range(1, 10)],
+    )
+    connection.commit()
+    connection.close()
+
+    report = migrate(f"sqlite:///{path}")["dedupe_attachment_files"]
+    assert report == {"migrated": True, "attachments": 9, "files": 3}
+
+    connection = sqlite3.connect(path)
+    rows = connection.execute(
+        "SELECT attachments.homework_id, files.file_id FROM attachments "
+        "JOIN files ON files.id = attachments.file_ref_id ORDER BY attachments.homework_id"
+    ).fetchall()
+    connection.close()
+    assert rows == [(homework_id, f"file-{homework_id % 3}") for homework_id in range(1, 10)]
+
+    # Схема совпадает с новой базой: file_ref_id NOT NULL, столбца file_id нет
+    connection = sqlite3.connect(path)
+    columns = {row[1]: row[3] for row in connection.execute("PRAGMA table_info(attachments)")}
+    indexes = {row[1] for row in connection.execute("PRAGMA index_list(attachments)")}
+    connection.close()
+    assert columns["file_ref_id"] == 1
+    assert "file_id" not in columns
+    assert "ix_attachments_file_ref_id" in indexes
+
+    # Повторный запуск ничего не меняет
+    assert migrate(f"sqlite:///{path}")["dedupe_attachment_files"] == {"migrated": False}
+
+def test_add_user_search_columns(tmp_path):
+    path = tmp_path / "legacy.db"
+    connection = sqlite3.connect(path)
+    connection.execute(LEGACY_ATTACHMENTS)
+    connection.execute(
+        "CREATE TABLE users (id INTEGER PRIMARY KEY, telegram_id BIGINT NOT NULL, "
+        "username VARCHAR(100), full_name VARCHAR(200) NOT NULL, role VARCHAR(20) NOT NULL, created_at DATETIME)"
+    )
+    connection.execute("INSERT INTO users (telegram_id, username, full_name, role) VALUES (1, 'Petr', 'Ёлкин Пётр', 'student')")
+    connection.commit()
+    connection.close()
+
+    assert migrate(f"sqlite:///{path}")["add_user_search_columns"] == {"migrated": True, "users": 1}
+
+    connection = sqlite3.connect(path)
+    row = connection.execute("SELECT username_folded, full_name_folded FROM users").fetchone()
+    connection.close()
+    assert row == ("petr", "елкин петр")
+
+def test_create_group_stats(tmp_path):
+    from sqlalchemy import create_engine, text
+    from app.database import Base
+
+    url = f"sqlite:///{tmp_path / 'stats.db'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE group_stats"))
+        connection.execute(text("INSERT INTO groups (id, name, created_by) VALUES (1, 'A', 1), (2, 'B', 1)"))
+        connection.execute(text("INSERT INTO user_groups (user_id, group_id, user_role) VALUES (1, 1, 'member'), (2, 1, 'admin')"))
+        connection.execute(text(
+            "INSERT INTO homeworks (group_id, assigned_by, title, deadline) VALUES "
+            "(1, 1, 'old', '2000-01-01 00:00:00'), (1, 1, 'next', '2099-01-01 00:00:00')"
+        ))
+    engine.dispose()
+
+    assert migrate(url)["create_group_stats"] == {"migrated": True, "groups": 2}
+
+    connection = sqlite3.connect(tmp_path / "stats.db")
+    rows = connection.execute(
+        "SELECT group_id, member_count, homework_count, next_deadline FROM group_stats ORDER BY group_id"
+    ).fetchall()
+    connection.close()
+    assert rows == [(1, 2, 2, "2099-01-01 00:00:00"), (2, 0, 0, None)]
+
+def test_autoincrement_homework_ids(tmp_path):
+    path = tmp_path / "legacy.db"
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE homeworks (id INTEGER PRIMARY KEY, group_id INTEGER NOT NULL, assigned_by BIGINT NOT NULL, "
+        "title VARCHAR(200) NOT NULL, description TEXT, deadline DATETIME NOT NULL, created_at DATETIME, "
+        "version INTEGER DEFAULT 1 NOT NULL)"
+    )
+    connection.execute(
+        "CREATE TABLE homeworks_archive (id INTEGER PRIMARY KEY, group_id INTEGER NOT NULL, "
+        "assigned_by BIGINT NOT NULL, title VARCHAR(200) NOT NULL, description TEXT, "
+        "deadline DATETIME NOT NULL, created_at DATETIME, version INTEGER DEFAULT 1 NOT NULL, archived_at DATETIME)"
+    )
+    connection.execute("INSERT INTO homeworks (id, group_id, assigned_by, title, deadline) VALUES (2, 1, 1, 'A', '2030-01-01')")
+    connection.execute(
+        "INSERT INTO homeworks_archive (id, group_id, assigned_by, title, deadline) VALUES (5, 1, 1, 'B', '2020-01-01')"
+    )
+    connection.commit()
+    connection.close()
+
+    report = migrate(f"sqlite:///{path}")["autoincrement_homework_ids"]
+    assert report == {"migrated": True, "tables": ["homeworks"]}
+
+    connection = sqlite3.connect(path)
+    connection.execute("INSERT INTO homeworks (group_id, assigned_by, title, deadline) VALUES (1, 1, 'C', '2030-01-01')")
+    ids = [row[0] for row in connection.execute("SELECT id FROM homeworks ORDER BY id")]
+    connection.close()
+    # Новое задание получает id после архивных
+    assert ids == [2, 6]
+    assert migrate(f"sqlite:///{path}")["autoincrement_homework_ids"] == {"migrated": False, "tables": []}
@@ -0,0 +1,111 @@
+import shutil
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import replicas
+from app.database import Base, get_db
+from app.main import app
+from app.membership import membership
+from app.singleflight import reads
+
+
+def user(telegram_id):
+    return {"telegram_id": telegram_id, "username": None, "full_name": f"User {telegram_id}", "role": "student"}
+
+
+@pytest.fixture
+def primary(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'primary.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    reads.clear()
+    membership.invalidate()
+    yield tmp_path
+    app.dependency_overrides.clear()
+    replicas.router.dispose()
+    replicas.router = replicas.ReplicaRouter([])
+    engine.dispose()
+
+
+def test_reads_go_to_replica_except_for_recent_writers(primary):
+    client = TestClient(app)
+    client.post("/users/", json=user(1))
+    # Копия файла базы изображает реплику с отставанием
+    shutil.copy(primary / "primary.db", primary / "replica.db")
+    replicas.router = replicas.ReplicaRouter([f"sqlite:///{primary / 'replica.db'}"], sticky_seconds=60)
+
+    client.post("/users/", json=user(2), headers={"X-Client-ID": "writer"})
+
+    # У другого клиента нет cookie со временем записи
+    reader = TestClient(app)
+    assert len(reader.get("/users/", headers={"X-Client-ID": "reader"}).json()) == 1
+    # Клиент, который только что писал, читает из основной базы
+    assert len(client.get("/users/", headers={"X-Client-ID": "writer"}).json()) == 2
+
+    stats = replicas.router.stats()
+    assert stats["sticky_reads"] == 1
+    assert stats["replicas"][f"sqlite:///{primary / 'replica.db'}"]["reads"] == 1
+
+
+def test_unavailable_replica_falls_back_to_primary(primary):
+    client = TestClient(app)
+    client.post("/users/", json=user(1))
+    url = f"sqlite:///{primary / 'missing' / 'replica.db'}"
+    replicas.router = replicas.ReplicaRouter([url], retry_seconds=0)
+    replicas.router.mark_failed(replicas.router.replicas[0])
+
+    # Повторная проверка реплики не проходит, чтение выполняется из основной базы
+    assert len(client.get("/users/").json()) == 1
+    stats = replicas.router.stats()
+    assert stats["primary_reads"] == 1
+    assert stats["replicas"][url] == {"healthy": False, "reads": 0, "failures": 2}
+
+
+def test_read_only_batch_is_not_sticky(primary):
+    client = TestClient(app)
+    client.post("/users/", json=user(1))
+    shutil.copy(primary / "primary.db", primary / "replica.db")
+    replicas.router = replicas.ReplicaRouter([f"sqlite:///{primary / 'replica.db'}"], sticky_seconds=60)
+    client.post("/users/", json=user(2), headers={"X-Client-ID": "other"})
+    client.cookies.clear()
+
+    response = client.post("/batch/", json=[{"method": "GET", "path": "/users/"}], headers={"X-Client-ID": "reader"})
+    assert "x-last-write" not in response.headers
+    assert len(client.get("/users/", headers={"X-Client-ID": "reader"}).json()) == 1
+
+    # Пакет с записью делает клиента «липким», как обычная запись
+    response = client.post("/batch/", json=[{"method": "POST", "path": "/users/", "body": user(3)}],
+                           headers={"X-Client-ID": "reader"})
+    assert "x-last-write" in response.headers
+    assert len(client.get("/users/", headers={"X-Client-ID": "reader"}).json()) == 3
+
+
+def test_write_time_is_honored_by_other_workers(primary):
+    client = TestClient(app)
+    client.post("/users/", json=user(1))
+    shutil.copy(primary / "primary.db", primary / "replica.db")
+    url = f"sqlite:///{primary / 'replica.db'}"
+    replicas.router = replicas.ReplicaRouter([url], sticky_seconds=60)
+
+    response = client.post("/users/", json=user(2))
+    written_at = response.headers["x-last-write"]
+    assert client.cookies[replicas.STICKY_COOKIE] == written_at
+
+    # Другой рабочий процесс не знает о записи, но видит время в cookie или заголовке
+    replicas.router = replicas.ReplicaRouter([url], sticky_seconds=60)
+    assert len(client.get("/users/").json()) == 2
+    client.cookies.clear()
+    assert len(client.get("/users/", headers={"X-Last-Write": written_at}).json()) == 2
+    assert len(client.get("/users/").json()) == 1
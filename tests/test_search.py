@@ -0,0 +1,103 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app import search
+from app.migrations import migrate
+
+def create_homework(client, group_id, test_homework_data, title, description):
+    homework_data = test_homework_data.copy()
+    homework_data.update(group_id=group_id, title=title, description=description)
+    return client.post("/homeworks/", json=homework_data).json()["id"]
+
+def test_search_homeworks_and_groups(client, test_group_data, test_homework_data):
+    group = {**test_group_data, "name": "Python для начинающих", "description": "Циклы и функции"}
+    group_id = client.post("/groups/", json=group).json()["id"]
+    loops_id = create_homework(client, group_id, test_homework_data, "Циклы", "Решить задачи на циклы for")
+    create_homework(client, group_id, test_homework_data, "Списки", "Срезы и методы списков")
+
+    response = client.get("/search", params={"q": "циклы"})
+    assert response.status_code == 200
+    results = response.json()
+    assert [(r["type"], r["id"]) for r in results] == [("homework", loops_id), ("group", group_id)]
+    assert results[0]["title"] == "<b>Циклы</b>"
+    assert "<b>циклы</b>" in results[0]["snippet"]
+
+    # Последнее слово ищется как префикс
+    assert [r["id"] for r in client.get("/search", params={"q": "спис"}).json()] == [loops_id + 1]
+
+def test_search_index_follows_writes(client, test_group_data, test_homework_data):
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    homework_id = create_homework(client, group_id, test_homework_data, "Дроби", None)
+
+    client.put(f"/homeworks/{homework_id}", json={"title": "Уравнения"})
+    assert client.get("/search", params={"q": "дроби"}).json() == []
+    assert len(client.get("/search", params={"q": "уравнения"}).json()) == 1
+
+    client.delete(f"/homeworks/{homework_id}")
+    assert client.get("/search", params={"q": "уравнения"}).json() == []
+
+def test_search_pagination_and_syntax(client, test_group_data, test_homework_data):
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    for i in range(5):
+        create_homework(client, group_id, test_homework_data, f"Контрольная {i}", None)
+
+    assert len(client.get("/search", params={"q": "контрольная", "limit": 2}).json()) == 2
+    assert len(client.get("/search", params={"q": "контрольная", "skip": 4}).json()) == 1
+    # Операторы FTS5 в запросе не интерпретируются
+    assert client.get("/search", params={"q": 'контрольная" OR "*'}).status_code == 200
+    assert client.get("/search", params={"q": "!!!"}).json() == []
+
+def test_search_index_ignores_unindexed_updates(client, db_session, test_group_data, test_homework_data):
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    homework_id = create_homework(client, group_id, test_homework_data, "Дроби", None)
+
+    connection = db_session.connection().connection.driver_connection
+    changes = connection.total_changes
+    db_session.execute(text("UPDATE homeworks SET version = version + 1, deadline = '2031-01-01' WHERE id = :id"),
+                       {"id": homework_id})
+    # Изменена только строка задания: триггер индекса не сработал
+    assert connection.total_changes - changes == 1
+    db_session.execute(text("UPDATE homeworks SET description = 'Сложение' WHERE id = :id"), {"id": homework_id})
+    assert connection.total_changes - changes > 2
+    db_session.commit()
+
+def test_search_ranks_newest_candidates(client, db_session, test_group_data, test_homework_data):
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    oldest = create_homework(client, group_id, test_homework_data, "Геометрия", None)
+    for _ in range(3):
+        create_homework(client, group_id, test_homework_data, "Задачи", "Геометрия")
+
+    exact = search.search(db_session, "геометрия", limit=2, max_candidates=0)
+    assert exact[0]["id"] == oldest
+    # Ранжируются только два самых новых совпадения
+    windowed = search.search(db_session, "геометрия", limit=2, max_candidates=2)
+    assert sorted(r["id"] for r in windowed) == [oldest + 2, oldest + 3]
+    # Окно не меньше skip + limit: следующие страницы доступны
+    assert len(search.search(db_session, "геометрия", skip=2, limit=2, max_candidates=2)) == 2
+
+def test_add_search_prefix_index(tmp_path):
+    path = tmp_path / "legacy.db"
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE groups (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, description TEXT)")
+    connection.execute(
+        "CREATE TABLE homeworks (id INTEGER PRIMARY KEY, group_id INTEGER NOT NULL, assigned_by BIGINT NOT NULL, "
+        "title VARCHAR(200) NOT NULL, description TEXT, deadline DATETIME NOT NULL)"
+    )
+    connection.execute(
+        "CREATE VIRTUAL TABLE search_index USING fts5(title, body, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    connection.execute("INSERT INTO groups (name) VALUES ('Алгебра')")
+    connection.execute(
+        "INSERT INTO homeworks (group_id, assigned_by, title, deadline) VALUES (1, 1, 'Дроби', '2030-01-01')"
+    )
+    connection.commit()
+    connection.close()
+
+    assert migrate(f"sqlite:///{path}")["add_search_prefix_index"] == {"migrated": True, "rows": 2}
+    assert migrate(f"sqlite:///{path}")["add_search_prefix_index"] == {"migrated": False}
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.connect() as connection:
+        assert [r["type"] for r in search.search(connection, "др")] == ["homework"]
+    engine.dispose()
@@ -0,0 +1,58 @@
+import os
+import signal
+import socket
+import time
+
+from app.server import Supervisor, bind_socket
+
+
+def serve_pid(sock):
+    # Простейший рабочий процесс: отвечает своим pid и завершается по SIGTERM
+    signal.signal(signal.SIGTERM, lambda *args: os._exit(0))
+    while True:
+        connection, _ = sock.accept()
+        with connection:
+            connection.sendall(str(os.getpid()).encode())
+
+
+def ask(port):
+    with socket.create_connection(("127.0.0.1", port), timeout=5) as connection:
+        return int(connection.recv(32))
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+def test_supervisor_restarts_and_reloads_workers():
+    sock = bind_socket("127.0.0.1", 0)
+    port = sock.getsockname()[1]
+    supervisor = Supervisor(sock, workers=2, target=serve_pid, graceful_timeout=5)
+    supervisor.start()
+    try:
+        first = set(supervisor.active)
+        assert len(first) == 2
+        assert ask(port) in first
+
+        # Упавший процесс заменяется новым
+        crashed = next(iter(first))
+        os.kill(crashed, signal.SIGKILL)
+        wait_for(lambda: (supervisor.tick(), crashed not in supervisor.active)[1])
+        assert len(supervisor.active) == 2
+        assert supervisor.restarts == 1
+
+        # Плавный перезапуск заменяет все процессы, сокет продолжает обслуживаться
+        before = set(supervisor.active)
+        supervisor.reload()
+        assert len(supervisor.active) == 2
+        assert not before & set(supervisor.active)
+        wait_for(lambda: (supervisor.tick(), not supervisor.retiring)[1])
+        assert supervisor.restarts == 1
+        assert {ask(port) for _ in range(10)} <= set(supervisor.active)
+    finally:
+        supervisor.stop()
+        sock.close()
+    assert supervisor.active == {} and supervisor.retiring == {}
@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+from app import cache
+from app.singleflight import SingleFlight, reads
+
+def test_concurrent_calls_are_coalesced():
+    flight = SingleFlight(grace_ms=0)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return b"[]"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do(("route", 1), load)))
+    leader.start()
+    started.wait(5)
+
+    followers = [
+        threading.Thread(target=lambda: results.append(flight.do(("route", 1), load)))
+        for _ in range(5)
+    ]
+    for thread in followers:
+        thread.start()
+    # Ждем, пока все последователи присоединятся к текущему вызову
+    while flight.coalesced < 5:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [b"[]"] * 6
+    assert flight.stats() == {"executed": 1, "coalesced": 5, "in_flight": 0}
+
+def test_grace_window_and_forget():
+    flight = SingleFlight(grace_ms=60000)
+    assert flight.do(("route", 1), lambda: 1) == 1
+    assert flight.do(("route", 1), lambda: 2) == 1
+    assert flight.do(("route", 1, "expanded"), lambda: 4) == 4
+
+    # Сброс по префиксу удаляет и варианты ключа с дополнительными параметрами
+    flight.forget(("route", 1))
+    assert flight.do(("route", 1), lambda: 3) == 3
+    assert flight.do(("route", 1, "expanded"), lambda: 5) == 5
+
+def test_errors_are_not_cached():
+    flight = SingleFlight(grace_ms=60000)
+
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do(("key",), fail)
+    assert flight.do(("key",), lambda: "ok") == "ok"
+
+def test_group_homeworks_refreshed_after_write(client, test_group_data, test_homework_data, monkeypatch):
+    # С кэшем ответов список заданий группы читается через кэш; объединение запросов
+    # на этом маршруте работает только при CACHE_BACKEND=none
+    monkeypatch.setattr(cache, "cache", None)
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    homework_data = test_homework_data.copy()
+    homework_data["group_id"] = group_id
+    executed = reads.executed
+
+    client.post("/homeworks/", json=homework_data)
+    assert len(client.get(f"/homeworks/group/{group_id}").json()) == 1
+
+    # Запись сбрасывает результат, сохраненный на время окна объединения
+    client.post("/homeworks/", json=homework_data)
+    assert len(client.get(f"/homeworks/group/{group_id}").json()) == 2
+    assert reads.executed - executed == 2
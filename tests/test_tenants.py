@@ -0,0 +1,144 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import backup, tenants
+from app.database import Base
+from app.main import app
+from app.singleflight import reads
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'main.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    registry = tenants.TenantRegistry(
+        sessionmaker(bind=engine),
+        {"a": f"sqlite:///{tmp_path}/a/{{tenant}}.db", "b": f"sqlite:///{tmp_path}/b/{{tenant}}.db"},
+    )
+    monkeypatch.setattr(tenants, "registry", registry)
+    reads.clear()
+    with TestClient(app) as test_client:
+        for tenant in ("school-1", "school-2"):
+            assert test_client.post("/admin/tenants", json={"id": tenant, "node": "a"}).status_code == 200
+        yield test_client
+    registry.close()
+    engine.dispose()
+
+
+def user(telegram_id, name):
+    return {"telegram_id": telegram_id, "username": None, "full_name": name, "role": "teacher"}
+
+
+def test_tenants_are_isolated(client, tmp_path):
+    client.post("/users/", json=user(1, "Анна"), headers={"X-Tenant-ID": "school-1"})
+    client.post("/t/school-2/users/", json=user(1, "Борис"))
+
+    assert [u["full_name"] for u in client.get("/t/school-1/users/").json()] == ["Анна"]
+    assert [u["full_name"] for u in client.get("/users/", headers={"X-Tenant-ID": "school-2"}).json()] == ["Борис"]
+    assert (tmp_path / "a" / "school-1.db").exists()
+
+    # Индекс членства и объединение запросов тоже разделены по школам
+    group_id = client.post("/t/school-1/groups/", json={"name": "G", "created_by": 1}).json()["id"]
+    client.post("/t/school-1/user-groups/", json={"user_id": 1, "group_id": group_id, "user_role": "admin"})
+    check = [{"user_id": 1, "group_id": group_id, "required_role": "admin"}]
+    assert client.post("/t/school-1/user-groups/check", json=check).json()[0]["allowed"] is True
+    assert client.post("/t/school-2/user-groups/check", json=check).json()[0]["member"] is False
+
+    assert client.get("/t/unknown/users/").status_code == 404
+    assert client.get("/users/", headers={"X-Tenant-ID": "../etc"}).status_code == 400
+
+
+def test_batch_stays_in_tenant(client):
+    operations = [
+        {"method": "POST", "path": "/users/", "body": user(1, "Анна")},
+        {"method": "GET", "path": "/users/"},
+    ]
+    for response in (
+        client.post("/t/school-1/batch/", json=operations),
+        client.post("/batch/", json=operations, headers={"X-Tenant-ID": "school-2"}),
+    ):
+        results = response.json()
+        assert [r["status"] for r in results] == [200, 200]
+        assert [u["full_name"] for u in results[1]["body"]] == ["Анна"]
+
+    assert len(client.get("/t/school-1/users/").json()) == 1
+    assert len(client.get("/t/school-2/users/").json()) == 1
+    assert client.get("/users/").json() == []
+
+def test_move_tenant(client, tmp_path):
+    client.post("/t/school-1/users/", json=user(1, "Анна"))
+    group_id = client.post("/t/school-1/groups/", json={"name": "Алгебра", "created_by": 1}).json()["id"]
+    client.post("/t/school-1/homeworks/", json={
+        "group_id": group_id, "assigned_by": 1, "title": "Квадратные уравнения", "deadline": "2030-01-01T00:00:00",
+    })
+
+    response = client.post("/admin/tenants/school-1/move", json={"node": "b"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["from_node"] == "a"
+    assert data["tenant"]["node"] == "b" and data["tenant"]["status"] == "active"
+    assert data["rows"]["users"] == 1 and data["rows"]["homeworks"] == 1
+
+    assert (tmp_path / "b" / "school-1.db").exists()
+    assert [u["full_name"] for u in client.get("/t/school-1/users/").json()] == ["Анна"]
+    # Поисковый индекс на новом узле заполнен триггерами при копировании
+    assert client.get("/t/school-1/search", params={"q": "квадратн"}).json()[0]["type"] == "homework"
+
+    assert client.post("/admin/tenants/school-1/move", json={"node": "b"}).status_code == 400
+    assert client.post("/admin/tenants/school-1/move", json={"node": "c"}).status_code == 400
+    assert client.post("/admin/tenants/nobody/move", json={"node": "b"}).status_code == 404
+
+
+def test_move_waits_for_open_sessions(client):
+    client.post("/t/school-1/users/", json=user(1, "Анна"))
+    session = tenants.registry.session("school-1")
+    result = {}
+    mover = threading.Thread(target=lambda: result.update(tenants.registry.move("school-1", "b")))
+    mover.start()
+    mover.join(0.2)
+    # Перенос ждет начатый запрос, новые запросы школы получают 503
+    assert mover.is_alive()
+    assert client.get("/t/school-1/users/").status_code == 503
+
+    tenants.registry.release(session)
+    mover.join(5)
+    assert result["tenant"].node == "b"
+    assert [u["full_name"] for u in client.get("/t/school-1/users/").json()] == ["Анна"]
+
+
+def test_move_gives_up_when_sessions_stay_open(client, monkeypatch):
+    monkeypatch.setattr(tenants, "MOVE_DRAIN_SECONDS", 0.1)
+    session = tenants.registry.session("school-1")
+    try:
+        assert client.post("/admin/tenants/school-1/move", json={"node": "b"}).status_code == 409
+    finally:
+        tenants.registry.release(session)
+    assert client.get("/t/school-1/users/").status_code == 200
+    assert client.get("/admin/tenants").json()[0]["node"] == "a"
+
+
+def test_backups_are_scoped_to_tenant(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_path / "backups"))
+    client.post("/t/school-1/users/", json=user(1, "Анна"))
+    created = client.post("/t/school-1/admin/backups", json={"verify": False}).json()["file"]
+
+    assert [b["file"] for b in client.get("/t/school-1/admin/backups").json()] == [created]
+    assert client.get(f"/t/school-1/admin/backups/{created}").status_code == 200
+    # Другая школа и основная база не видят копию
+    assert client.get("/t/school-2/admin/backups").json() == []
+    assert client.get("/admin/backups").json() == []
+    assert client.get(f"/t/school-2/admin/backups/{created}").status_code == 404
+    assert client.get(f"/admin/backups/{created}").status_code == 404
+
+
+def test_idle_engines_are_evicted(client):
+    tenants.registry.idle_seconds = 0
+    client.get("/t/school-1/users/")
+    client.get("/t/school-2/users/")
+    stats = tenants.registry.stats()
+    assert stats["created"] == 2
+    assert stats["evicted"] >= 1
@@ -177,4 +177,36 @@ def test_remove_user_from_group(client, test_user_data, test_group_data):
     
     # Проверяем, что связь удалена
     response = client.get(f"/user-groups/{user_id}/{group_id}")
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+def test_check_memberships(client, test_user_data, test_group_data):
+    user_id = client.post("/users/", json=test_user_data).json()["id"]
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    client.post("/user-groups/", json={"user_id": user_id, "group_id": group_id, "user_role": "member"})
+
+    checks = [
+        {"user_id": user_id, "group_id": group_id},
+        {"user_id": user_id, "group_id": group_id, "required_role": "admin"},
+        {"user_id": user_id + 1, "group_id": group_id},
+    ]
+    response = client.post("/user-groups/check", json=checks)
+    assert response.status_code == 200
+    assert [(r["member"], r["role"], r["allowed"]) for r in response.json()] == [
+        (True, "member", True),
+        (True, "member", False),
+        (False, None, False),
+    ]
+
+    # Изменения ролей и удаление сразу видны в индексе
+    client.put(f"/user-groups/{user_id}/{group_id}", params={"user_role": "admin"})
+    response = client.post("/user-groups/check", json=checks[1:2])
+    assert response.json()[0]["allowed"] is True
+    assert client.get(f"/user-groups/{user_id}/{group_id}").json()["user_role"] == "admin"
+
+    client.delete(f"/user-groups/{user_id}/{group_id}")
+    response = client.post("/user-groups/check", json=checks[:1])
+    assert response.json()[0]["member"] is False
+    assert client.get(f"/user-groups/{user_id}/{group_id}").status_code == 404
+
+def test_check_memberships_limit(client):
+    checks = [{"user_id": 1, "group_id": 1}] * 1001
+    assert client.post("/user-groups/check", json=checks).status_code == 400
@@ -77,4 +77,50 @@ def test_delete_user(client, test_user_data):
     
     # Проверяем, что пользователь удален
     response = client.get(f"/users/{user_id}")
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+
+def test_delete_user_in_group(client, test_user_data, test_group_data):
+    user_id = client.post("/users/", json=test_user_data).json()["id"]
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    client.post("/user-groups/", json={"user_id": user_id, "group_id": group_id, "user_role": "student"})
+    check = [{"user_id": user_id, "group_id": group_id}]
+    assert client.post("/user-groups/check", json=check).json()[0]["member"] is True
+
+    assert client.delete(f"/users/{user_id}").status_code == 200
+    # Членство удалено из базы, индекса членства и статистики группы
+    assert client.get(f"/user-groups/group/{group_id}").json() == []
+    assert client.post("/user-groups/check", json=check).json()[0]["member"] is False
+    stats = client.get("/groups/", params={"with_stats": True}).json()[0]["stats"]
+    assert stats["member_count"] == 0
+
+def test_search_users(client):
+    for telegram_id, full_name, username in [
+        (1, "Ёлкин Пётр", "petr"),
+        (2, "Елисеева Анна", "anna_e"),
+        (3, "Иванов Иван", "elka"),
+        (4, "Smith John", None),
+    ]:
+        client.post("/users/", json={
+            "telegram_id": telegram_id, "username": username,
+            "full_name": full_name, "role": "student",
+        })
+
+    response = client.get("/users/search", params={"prefix": "ел"})
+    assert response.status_code == 200
+    # ё и е не различаются
+    assert [user["telegram_id"] for user in response.json()] == [2, 1]
+
+    # Совпадение по юзернейму
+    response = client.get("/users/search", params={"prefix": "EL"})
+    assert [user["telegram_id"] for user in response.json()] == [3]
+
+    response = client.get("/users/search", params={"prefix": "SMI"})
+    assert [user["full_name"] for user in response.json()] == ["Smith John"]
+
+    response = client.get("/users/search", params={"prefix": "@pe", "limit": 1})
+    assert [user["telegram_id"] for user in response.json()] == [1]
+
+    # Изменение имени сразу отражается в поиске
+    client.put("/users/3", json={"full_name": "Петров Иван"})
+    response = client.get("/users/search", params={"prefix": "пет"})
+    assert [user["telegram_id"] for user in response.json()] == [3]
@@ -0,0 +1,67 @@
+import sqlite3
+
+from app.migrations import migrate
+
+
+def test_put_with_if_match_detects_lost_update(client, test_user_data):
+    user_id = client.post("/users/", json=test_user_data).json()["id"]
+    response = client.get(f"/users/{user_id}")
+    assert response.headers["etag"] == '"1"'
+    assert response.json()["version"] == 1
+
+    # Первый клиент обновляет запись по своей версии
+    first = client.put(f"/users/{user_id}", json={"full_name": "Ёлкин Пётр"}, headers={"If-Match": '"1"'})
+    assert first.status_code == 200
+    assert first.headers["etag"] == '"2"'
+    assert first.json()["full_name"] == "Ёлкин Пётр"
+
+    # Второй клиент с той же прочитанной версией получает 412, его изменение не применяется
+    second = client.put(f"/users/{user_id}", json={"full_name": "Other"}, headers={"If-Match": '"1"'})
+    assert second.status_code == 412
+    assert client.get(f"/users/{user_id}").json()["full_name"] == "Ёлкин Пётр"
+    assert client.get(f"/users/{user_id}").headers["etag"] == '"2"'
+
+    # Нормализованные столбцы обновлены без ORM: поиск находит новое имя
+    assert [user["id"] for user in client.get("/users/search", params={"prefix": "елкин"}).json()] == [user_id]
+
+    # Без If-Match (или с "*") обновление выполняется как раньше
+    assert client.put(f"/users/{user_id}", json={"role": "admin"}, headers={"If-Match": "*"}).json()["version"] == 3
+    assert client.put(f"/users/{user_id}", json={"role": "student"}).json()["version"] == 4
+
+    assert client.put("/users/999", json={"role": "admin"}, headers={"If-Match": '"1"'}).status_code == 404
+
+
+def test_homework_deadline_update_checks_version(client, test_group_data, test_homework_data):
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+    test_homework_data["group_id"] = group_id
+    homework_id = client.post("/homeworks/", json=test_homework_data).json()["id"]
+    etag = client.get(f"/homeworks/{homework_id}").headers["etag"]
+
+    response = client.put(f"/homeworks/{homework_id}", json={"deadline": "2099-01-01T00:00:00"}, headers={"If-Match": etag})
+    assert response.status_code == 200
+    stale = client.put(f"/homeworks/{homework_id}", json={"deadline": "2098-01-01T00:00:00"}, headers={"If-Match": etag})
+    assert stale.status_code == 412
+
+    stats = client.get("/groups/", params={"with_stats": True}).json()[0]["stats"]
+    assert stats["next_deadline"] == "2099-01-01T00:00:00"
+
+    group = client.get(f"/groups/{group_id}")
+    renamed = client.put(f"/groups/{group_id}", json={"name": "Renamed"}, headers={"If-Match": group.headers["etag"]})
+    assert renamed.headers["etag"] == '"2"'
+    assert client.put(f"/groups/{group_id}", json={"name": "Again"}, headers={"If-Match": group.headers["etag"]}).status_code == 412
+
+
+def test_add_version_columns(tmp_path):
+    path = tmp_path / "legacy.db"
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE groups (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL)")
+    connection.execute("INSERT INTO groups (name) VALUES ('A')")
+    connection.commit()
+    connection.close()
+
+    report = migrate(f"sqlite:///{path}")["add_version_columns"]
+    assert report == {"migrated": True, "tables": ["groups"]}
+    connection = sqlite3.connect(path)
+    assert connection.execute("SELECT version FROM groups").fetchall() == [(1,)]
+    connection.close()
+    assert migrate(f"sqlite:///{path}")["add_version_columns"] == {"migrated": False, "tables": []}
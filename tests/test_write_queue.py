@@ -0,0 +1,103 @@
+import threading
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import write_queue
+from app.database import Base
+from app.models.user import UserModel
+from app.write_queue import GroupCommitWriter
+
+@pytest.fixture
+def writer(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'writes.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    writer = GroupCommitWriter(sessionmaker(bind=engine), window_ms=50, max_batch=100)
+    yield writer
+    writer.stop()
+    engine.dispose()
+
+def insert_user(telegram_id):
+    def op(session):
+        if telegram_id < 0:
+            raise HTTPException(status_code=400, detail="Invalid telegram_id")
+        user = UserModel(telegram_id=telegram_id, full_name="Ученик", role="student")
+        session.add(user)
+        session.flush()
+        return user
+    return op
+
+def run_concurrently(writer, telegram_ids):
+    results = {}
+
+    def submit(telegram_id):
+        try:
+            results[telegram_id] = writer.submit(insert_user(telegram_id))
+        except HTTPException as exc:
+            results[telegram_id] = exc
+
+    threads = [threading.Thread(target=submit, args=(i,)) for i in telegram_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return results
+
+def test_writes_are_group_committed(writer):
+    results = run_concurrently(writer, range(1, 21))
+
+    assert sorted(user.telegram_id for user in results.values()) == list(range(1, 21))
+    assert len({user.id for user in results.values()}) == 20
+    stats = writer.stats()
+    assert stats["operations"] == 20
+    assert stats["commits"] < 20
+
+def test_failed_operation_does_not_affect_others(writer):
+    results = run_concurrently(writer, [1, 2, -1, 3])
+
+    assert isinstance(results[-1], HTTPException)
+    assert all(results[i].id for i in (1, 2, 3))
+
+def test_batched_endpoint(client, monkeypatch, test_group_data, test_homework_data):
+    monkeypatch.setattr(write_queue, "WRITE_BATCHING", True)
+    group_id = client.post("/groups/", json=test_group_data).json()["id"]
+
+    homework_data = test_homework_data.copy()
+    homework_data["group_id"] = group_id
+    response = client.post("/homeworks/", json=homework_data)
+    assert response.status_code == 200
+    assert response.json()["title"] == homework_data["title"]
+    assert len(client.get(f"/homeworks/group/{group_id}").json()) == 1
+
+def test_stalled_writer_returns_503(writer):
+    started = threading.Event()
+    release = threading.Event()
+
+    def stall(session):
+        started.set()
+        release.wait(5)
+
+    blocked = threading.Thread(target=lambda: writer.submit(stall))
+    blocked.start()
+    started.wait(5)
+    with pytest.raises(HTTPException) as error:
+        writer.submit(insert_user(1), timeout=0.2)
+    assert error.value.status_code == 503
+    release.set()
+    blocked.join(5)
+
+    # Отмененная по таймауту операция не выполняется
+    assert writer.stats()["operations"] == 1
+    assert writer.submit(insert_user(2)).telegram_id == 2
+
+def test_dead_writer_thread_is_detected(writer, monkeypatch):
+    writer.start()
+    writer._queue.put(None)
+    writer._thread.join(5)
+    # Поток мертв, а submit не успевает его перезапустить
+    monkeypatch.setattr(writer, "start", lambda: None)
+    with pytest.raises(HTTPException) as error:
+        writer.submit(insert_user(1), timeout=5)
+    assert error.value.status_code == 503